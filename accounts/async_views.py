@@ -0,0 +1,259 @@
+"""
+ASGI-native variants of the accounts views.
+
+Reads use the async ORM so a worker can wait on many slow clients and queries from a
+single event loop. Writes go through serializer validation, password hashing and
+transactions, which are sync only, so they run the sync implementation in a worker thread.
+"""
+
+import asyncio
+import math
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from task_manager.renderers import EventStreamRenderer, FastJSONRenderer
+from .authentication import CachedJWTAuthentication
+from .changes import changes_since
+from .models import MembershipChange, Team
+from .pagination import TeamPagination, MembershipPagination
+from .permissions import IsInTeam, aget_team_role, aget_team_or_404
+from .purge import soft_delete
+from .serializers import UserSerializer, TeamSerializer, TeamRowSerializer, TeamMemberRowSerializer, MembershipChangeRowSerializer
+from .views import UserDetail, TeamList, TeamDetail, get_requested_fields, get_members_rows, get_workspace_members
+
+User = get_user_model()
+
+# Seconds without changes after which a Server-Sent Events stream sends a comment
+CHANGES_KEEP_ALIVE = 15
+
+
+class AsyncAPIView( APIView ):
+    """APIView with coroutine handlers"""
+
+    async def dispatch( self, request, *args, **kwargs ):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request( request, *args, **kwargs )
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication, permissions and throttles are sync DRF hooks
+            await sync_to_async( self.initial )( request, *args, **kwargs )
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr( self, request.method.lower(), self.http_method_not_allowed )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler( request, *args, **kwargs )
+            if asyncio.iscoroutine( response ):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception( exc )
+
+        self.response = self.finalize_response( request, response, *args, **kwargs )
+        return self.response
+
+    async def acheck_object_permissions( self, request, obj ):
+        """
+        Async check_object_permissions.
+        On team routes the role is loaded with the async ORM first, then the team permission
+        classes answer from the request memo without blocking. Other checks run in a thread.
+        """
+        team_pk = self.kwargs.get( 'pk' )
+        if team_pk is None:
+            return await sync_to_async( self.check_object_permissions )( request, obj )
+
+        await aget_team_role( request, team_pk )
+        self.check_object_permissions( request, obj )
+
+
+# ========== USER VIEWS ==========
+
+
+class AsyncUserDetail( AsyncAPIView, UserDetail ):
+
+    async def get( self, request, username ):
+        """Get user data"""
+
+        user = await aget_object_or_404( User, username=username )
+        await self.acheck_object_permissions( request, user )
+
+        return Response( UserSerializer( user ).data, status=status.HTTP_200_OK )
+
+    async def put( self, request, username ):
+        """Edit user information"""
+
+        return await sync_to_async( super().put )( request, username )
+
+    async def post( self, request, username ):
+        """Redefine user password"""
+
+        return await sync_to_async( super().post )( request, username )
+
+    async def delete( self, request, username ):
+        """Delete user"""
+
+        user = await aget_object_or_404( User, username=username )
+        await self.acheck_object_permissions( request, user )
+
+        serialized = UserSerializer( user ).data
+        job = await sync_to_async( soft_delete )( user, requested_by=request.user )
+        return Response( serialized, status=status.HTTP_202_ACCEPTED, headers={ 'Location': reverse( 'purge_job', args=[job.pk] ) } )
+
+
+# ========== TEAM VIEWS ==========
+
+
+class AsyncTeamList( AsyncAPIView, TeamList ):
+
+    async def get( self, request ):
+        """
+        Shows the teams the user is on, paginated by cursor ( ?cursor=, ?limit= ).
+        Up to WORKSPACE_MEMBERS_PER_TEAM members per team, `members_next` links to the rest.
+        Optional: ?fields=id,name,created to get team summaries without members
+        """
+
+        fields = get_requested_fields( request )
+        serializer = TeamRowSerializer( fields )
+
+        paginator = TeamPagination()
+        page = await paginator.apaginate_queryset( Team.objects.for_user( request.user.id ).values( *serializer.columns ), request, self )
+
+        members = members_next = None
+        if fields is None or 'members' in fields:
+            member_serializer = TeamMemberRowSerializer()
+            rows = get_members_rows( [ team['id'] for team in page ], member_serializer )
+            members, members_next = get_workspace_members( request, page, [ row async for row in rows ], member_serializer )
+        return paginator.get_paginated_response( serializer.many( page, members, members_next ) )
+
+    async def post( self, request ):
+        """Create a team"""
+
+        return await sync_to_async( super().post )( request )
+
+
+class AsyncTeamDetail( AsyncAPIView, TeamDetail ):
+
+    async def get( self, request, pk, slug ):
+        """
+        Get information about a team and the first page of its members.
+        Optional: ?fields=id,name,created to leave members out
+        """
+
+        team = await aget_team_or_404( request, pk, Team.objects.select_related( 'captain' ) )
+        await self.acheck_object_permissions( request, team )
+
+        fields = get_requested_fields( request )
+        team_fields = [ field for field in ( fields or TeamSerializer.Meta.fields ) if field != 'members' ]
+        team_serialized = TeamSerializer( team, fields=team_fields ).data
+
+        if fields is None or 'members' in fields:
+            member_serializer = TeamMemberRowSerializer()
+            paginator = MembershipPagination()
+            page = await paginator.apaginate_queryset( team.teammembership_set.active().values( *member_serializer.columns ), request, self )
+            team_serialized['members'] = member_serializer.many( page )
+            team_serialized['members_next'] = paginator.get_next_link( reverse( 'team_members', args=( pk, slug ) ) )
+        return Response( team_serialized, status=status.HTTP_200_OK )
+
+    async def post( self, request, pk, slug ):
+        """Add a member to the team ( must be captain or first mate )"""
+
+        return await sync_to_async( super().post )( request, pk, slug )
+
+    async def patch( self, request, pk, slug ):
+        """Remove a member or leave a team"""
+
+        return await sync_to_async( super().patch )( request, pk, slug )
+
+    async def delete( self, request, pk, slug ):
+        """Delete a team"""
+
+        return await sync_to_async( super().delete )( request, pk, slug )
+
+
+class AsyncTeamChanges( AsyncAPIView ):
+    """
+    Membership changes of a team after ?since=, the team's change_sequence when it was loaded
+    ( see accounts.changes ). Entries are { sequence, kind ( added, removed or role ), member,
+    username, role, created }, oldest first.
+    Long poll by default: answers as soon as there are changes, or with none after ?timeout=
+    seconds ( CHANGES_LONG_POLL_TIMEOUT at most ). `next` is the `since` of the following request.
+    With Accept: text/event-stream the changes are streamed as Server-Sent Events for
+    CHANGES_STREAM_TIMEOUT seconds, EventSource then reconnects with the Last-Event-ID header.
+    The stream ends when the user leaves the team.
+    """
+
+    authentication_classes = ( CachedJWTAuthentication, )
+    permission_classes = ( IsAuthenticated, IsInTeam )
+    renderer_classes = ( FastJSONRenderer, EventStreamRenderer )
+
+    async def get( self, request, pk, slug ):
+        team = await aget_team_or_404( request, pk )
+        await self.acheck_object_permissions( request, team )
+
+        since = request.query_params.get( 'since', request.headers.get( 'Last-Event-ID', '0' ) )
+        if not since.isdigit():
+            raise ValidationError( { 'since': 'must be a change sequence number' } )
+        since = int( since )
+
+        if isinstance( request.accepted_renderer, EventStreamRenderer ):
+            return StreamingHttpResponse(
+                self.stream( team.pk, since, str( request.user.pk ) ),
+                content_type=EventStreamRenderer.media_type,
+                # Proxies must pass the events on as they come
+                headers={ 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' },
+            )
+
+        try:
+            timeout = float( request.query_params.get( 'timeout', settings.CHANGES_LONG_POLL_TIMEOUT ) )
+        except ValueError:
+            timeout = math.nan
+        if math.isnan( timeout ):
+            raise ValidationError( { 'timeout': 'must be a number of seconds' } )
+        timeout = min( max( timeout, 0 ), settings.CHANGES_LONG_POLL_TIMEOUT )
+
+        serializer = MembershipChangeRowSerializer()
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = [ row async for row in changes_since( team.pk, since, serializer.columns ) ]
+            remaining = deadline - time.monotonic()
+            if rows or remaining <= 0:
+                break
+            await asyncio.sleep( min( settings.CHANGES_POLL_INTERVAL, remaining ) )
+
+        changes = serializer.many( rows )
+        return Response( { 'changes': changes, 'next': changes[-1]['sequence'] if changes else since }, status=status.HTTP_200_OK )
+
+    async def stream( self, team_pk, since, user_pk ):
+        serializer = MembershipChangeRowSerializer()
+        renderer = FastJSONRenderer()
+        deadline = time.monotonic() + settings.CHANGES_STREAM_TIMEOUT
+        idle = 0
+
+        while time.monotonic() < deadline:
+            rows = [ row async for row in changes_since( team_pk, since, serializer.columns ) ]
+            for change in serializer.many( rows ):
+                since = change['sequence']
+                yield b'id: %d\nevent: membership\ndata: %s\n\n' % ( since, renderer.render( change ) )
+                if change['kind'] == MembershipChange.Kinds.REMOVED and change['member'] == user_pk:
+                    return
+
+            idle = 0 if rows else idle + settings.CHANGES_POLL_INTERVAL
+            if idle >= CHANGES_KEEP_ALIVE:
+                # A comment, keeps proxies from closing a quiet connection
+                idle = 0
+                yield b': keep-alive\n\n'
+            if not rows:
+                await asyncio.sleep( settings.CHANGES_POLL_INTERVAL )
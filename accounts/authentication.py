@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from task_manager.db_router import primary
+from .permissions import remember_claimed_roles
+from .tokens import claimed_roles
+
+
+def user_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def user_cache_key( user_id ):
+    return f'jwt-user:{user_id}'
+
+
+def invalidate_cached_user( user_id ):
+    user_cache().delete( user_cache_key( user_id ) )
+
+
+def invalidate_cached_users( user_ids ):
+    user_cache().delete_many( [ user_cache_key( user_id ) for user_id in user_ids ] )
+
+
+class CachedJWTAuthentication( JWTAuthentication ):
+    """
+    JWTAuthentication that serves the user from the cache set by AUTH_USER_CACHE_ALIAS
+    instead of loading it from the database on every request.
+    A local memory cache keeps users per process, a shared one ( e.g. Redis ) across workers.
+    Cached users are dropped whenever the user is saved or deleted ( see accounts.signals ).
+    Up to date team claims of the token are handed to the team permission classes ( see accounts.tokens ).
+    """
+
+    def authenticate( self, request ):
+        authenticated = super().authenticate( request )
+        if authenticated is not None:
+            user, token = authenticated
+            roles = claimed_roles( token, user )
+            if roles is not None:
+                remember_claimed_roles( request, roles )
+        return authenticated
+
+    def get_user( self, validated_token ):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken( _( 'Token contained no recognizable user identification' ) )
+
+        key = user_cache_key( user_id )
+        user = user_cache().get( key )
+        if user is None:
+            # Read from the primary, a user from a lagging replica ( e.g. its old password ) would stay cached
+            with primary():
+                user = super().get_user( validated_token )
+            user_cache().set( key, user, settings.AUTH_USER_CACHE_TIMEOUT )
+            return user
+
+        # Same checks as JWTAuthentication, only users that were active when cached are stored
+        if not user.is_active:
+            raise AuthenticationFailed( _( 'User is inactive' ), code='user_inactive' )
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get( api_settings.REVOKE_TOKEN_CLAIM ) != get_md5_hash_password( user.password ):
+            raise AuthenticationFailed( _( "The user's password has been changed." ), code='password_changed' )
+        return user
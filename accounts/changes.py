@@ -0,0 +1,64 @@
+"""
+Per-team membership change logs.
+
+Every membership added, removed or given another role appends a MembershipChange to its team's
+log, numbered 1, 2, 3... per team. Team.change_sequence holds the last number and comes with the
+team's representation, so a client that loaded a team asks for the changes after that number
+( AsyncTeamChanges, `async/team_detail/<pk>/<slug>/changes` ) and applies them instead of loading
+the team again.
+
+Numbers are taken with an F() update of the team row, which stays locked until the transaction
+commits. Writers of a team queue behind each other there, so entries become visible in order and
+a reader never sees an entry while an earlier number is still uncommitted.
+Changes are recorded by accounts.signals, in the transaction that writes the memberships.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from .models import MEMBERSHIP_BATCH_SIZE, MembershipChange, Team
+
+# Entries per response or per SSE batch
+CHANGES_PAGE_SIZE = 500
+
+def record_changes( team, kind, memberships ):
+    """
+    Append an entry of `kind` per ( member id, username, role ) to the team's log, removals get no role.
+    `team` is a Team, whose change_sequence in memory follows, or a team id.
+    """
+    memberships = list( memberships )
+    if not memberships:
+        return
+
+    team_pk = team.pk if isinstance( team, Team ) else team
+    with transaction.atomic():
+        teams = Team._base_manager.filter( pk=team_pk )
+        teams.update( change_sequence=F( 'change_sequence' ) + len( memberships ) )
+        last = teams.values_list( 'change_sequence', flat=True ).get()
+        MembershipChange.objects.bulk_create(
+            [
+                MembershipChange(
+                    team_id=team_pk, sequence=sequence, kind=kind, member_id=member_id, username=username,
+                    role='' if kind == MembershipChange.Kinds.REMOVED else role,
+                )
+                for sequence, ( member_id, username, role ) in enumerate( memberships, start=last - len( memberships ) + 1 )
+            ],
+            batch_size=MEMBERSHIP_BATCH_SIZE,
+        )
+    if isinstance( team, Team ):
+        team.change_sequence = last
+
+
+def record_memberships( kind, memberships ):
+    """Record the changes of TeamMembership values_list( 'team_id', 'member_id', 'member__username', 'role' ) rows, by team"""
+
+    by_team = {}
+    for team_id, member_id, username, role in memberships:
+        by_team.setdefault( team_id, [] ).append( ( member_id, username, role ) )
+    for team_id, rows in by_team.items():
+        record_changes( team_id, kind, rows )
+
+
+def changes_since( team_pk, since, columns, limit=CHANGES_PAGE_SIZE ):
+    """The `columns` of the entries of the team's log after `since`, oldest first"""
+
+    return MembershipChange.objects.filter( team=team_pk, sequence__gt=since ).order_by( 'sequence' ).values( *columns )[:limit]
@@ -0,0 +1,38 @@
+"""
+Export of a team's data as newline delimited JSON, streamed to the client.
+
+The first line describes the team, then one line per member with their role and profile:
+
+    {"type": "team", "id": 1, "name": "Straw Hat Pirates", "slug": "straw-hat-pirates", "created": "..."}
+    {"type": "member", "role": "C", "id": "...", "username": "luffy", "first_name": "", ...}
+
+Members are read with iterator( chunk_size ), a server-side cursor on PostgreSQL and fetchmany()
+on SQLite, as plain value tuples, and each line is encoded as it is sent. Only one chunk is held
+in memory whatever the size of the team.
+"""
+
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import TeamMembership
+
+# Members fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+TEAM_FIELDS = ( 'id', 'name', 'slug', 'created' )
+MEMBER_FIELDS = ( 'id', 'username', 'first_name', 'last_name', 'email', 'date_joined' )
+
+_encoder = DjangoJSONEncoder( separators=( ',', ':' ) )
+
+
+def _line( data ):
+    return ( _encoder.encode( data ) + '\n' ).encode()
+
+
+def export_team( team ):
+    """Yield the lines of the export of `team`, as bytes"""
+
+    yield _line( { 'type': 'team', **{ field: getattr( team, field ) for field in TEAM_FIELDS } } )
+
+    columns = ( 'role', *( f'member__{field}' for field in MEMBER_FIELDS ) )
+    memberships = TeamMembership.objects.filter( team=team.pk ).active().order_by( 'pk' ).values_list( *columns )
+    for role, *values in memberships.iterator( chunk_size=EXPORT_CHUNK_SIZE ):
+        yield _line( { 'type': 'member', 'role': role, **dict( zip( MEMBER_FIELDS, values ) ) } )
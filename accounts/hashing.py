@@ -0,0 +1,68 @@
+"""
+Password hashing outside the request thread.
+
+With PASSWORD_HASHING_WORKERS > 0 passwords are hashed in a process pool of that size,
+so a burst of signups or password resets uses at most that many cores and the request
+threads only wait on a future. At most twice that many hashes are queued, further
+callers block until a slot frees up. With 0 ( the default ) hashing runs inline.
+"""
+
+import multiprocessing
+import threading
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.utils.module_loading import import_string
+
+_lock = threading.Lock()
+_pool = None
+_pool_workers = 0
+_slots = None
+
+
+def _encode( hasher_path, password, salt ):
+    # Runs in the worker processes, hashers only need their own class attributes
+    return import_string( hasher_path )().encode( password, salt )
+
+
+def _get_pool( workers ):
+    global _pool, _pool_workers, _slots
+    with _lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown( wait=False )
+            # spawn: forking a process that runs request threads isn't safe
+            _pool = ProcessPoolExecutor( max_workers=workers, mp_context=multiprocessing.get_context( 'spawn' ) )
+            _pool_workers = workers
+            _slots = threading.BoundedSemaphore( workers * 2 )
+        return _pool, _slots
+
+
+def hash_password( password ):
+    """make_password(), in the hashing pool when PASSWORD_HASHING_WORKERS is set"""
+
+    workers = settings.PASSWORD_HASHING_WORKERS
+    if not workers or password is None:
+        return make_password( password )
+
+    hasher = get_hasher()
+    hasher_path = f'{type( hasher ).__module__}.{type( hasher ).__qualname__}'
+    pool, slots = _get_pool( workers )
+    with slots:
+        return pool.submit( _encode, hasher_path, password, hasher.salt() ).result()
+
+
+def hash_passwords( passwords, workers ):
+    """make_password() for a batch of passwords, spread over a pool of `workers` processes ( 0 hashes inline )"""
+
+    passwords = list( passwords )
+    if not workers:
+        return [ make_password( password ) for password in passwords ]
+
+    hasher = get_hasher()
+    hasher_path = f'{type( hasher ).__module__}.{type( hasher ).__qualname__}'
+    salts = [ hasher.salt() for _ in passwords ]
+    pool, _ = _get_pool( workers )
+    chunksize = max( len( passwords ) // ( workers * 4 ), 1 )
+    return list( pool.map( _encode, repeat( hasher_path ), passwords, salts, chunksize=chunksize ) )
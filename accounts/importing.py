@@ -0,0 +1,179 @@
+"""
+Bulk import of users and team memberships, see `manage.py import_accounts`.
+
+Rows are read one at a time from a CSV file with a header line or from JSON lines, with the keys
+username, email, first_name, last_name, password or password_hash, team ( the id of an existing
+team ) and role ( FM or M, M by default ). A user may appear on several rows, one per team, the
+first row creates it. Users that already exist are not changed, only added to the team.
+
+Rows are handled in batches: one query validates the teams of a batch, one finds the users that
+already exist, passwords are hashed over a process pool and users then memberships are written
+with bulk_create in a single transaction per batch. Writes ignore conflicts, so a batch imported
+twice adds nothing the second time.
+"""
+
+import csv
+import json
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from .hashing import hash_passwords
+from .models import Team, TeamMembership, memberships_changed
+
+User = get_user_model()
+
+FIELDS = ( 'username', 'email', 'first_name', 'last_name', 'password', 'password_hash', 'team', 'role' )
+IMPORTED_ROLES = ( TeamMembership.Roles.FIRST_MATE, TeamMembership.Roles.MEMBER )
+
+
+class RowError( ValueError ):
+    pass
+
+
+def read_rows( file, format ):
+    """Yield the rows of a CSV or JSON lines file as dicts, or a RowError for lines that can't be parsed"""
+
+    if format == 'csv':
+        yield from csv.DictReader( file )
+        return
+
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads( line )
+        except ValueError as error:
+            yield RowError( f'invalid JSON: {error}' )
+            continue
+        yield row if isinstance( row, dict ) else RowError( 'expected a JSON object' )
+
+
+def clean_row( row ):
+    """Normalized copy of a row, raises RowError when a field is invalid"""
+
+    if isinstance( row, RowError ):
+        raise row
+
+    unknown = set( row ) - set( FIELDS )
+    if unknown:
+        raise RowError( f'unknown fields {sorted( unknown )}' )
+    row = { field: str( value ).strip() for field, value in row.items() if value not in ( None, '' ) }
+
+    username = User.normalize_username( row.get( 'username', '' ) )
+    if not username:
+        raise RowError( 'username is required' )
+    for field in ( 'username', 'first_name', 'last_name', 'email' ):
+        max_length = User._meta.get_field( field ).max_length
+        if len( row.get( field, '' ) ) > max_length:
+            raise RowError( f'{field} is longer than {max_length} characters' )
+
+    try:
+        User.username_validator( username )
+        if 'email' in row:
+            validate_email( row['email'] )
+    except ValidationError as error:
+        raise RowError( ' '.join( error.messages ) )
+
+    if 'password' in row and 'password_hash' in row:
+        raise RowError( 'give either password or password_hash' )
+    if 'password_hash' in row:
+        try:
+            identify_hasher( row['password_hash'] )
+        except ValueError:
+            raise RowError( 'password_hash is not a hash of a configured hasher' )
+
+    team = None
+    if 'team' in row:
+        try:
+            team = int( row['team'] )
+        except ValueError:
+            raise RowError( 'team must be a team id' )
+    elif 'role' in row:
+        raise RowError( 'role without a team' )
+    role = row.get( 'role', TeamMembership.Roles.MEMBER )
+    if role not in IMPORTED_ROLES:
+        raise RowError( f'role must be one of {", ".join( IMPORTED_ROLES )}' )
+
+    return {
+        **row,
+        'username': username,
+        'email': User.objects.normalize_email( row.get( 'email', '' ) ),
+        'team': team,
+        'role': role,
+    }
+
+
+def import_batch( rows, chunk_size, workers ):
+    """
+    Import a batch of ( number, row ) pairs.
+    Returns ( users created, memberships created, [ ( number, error ) ] )
+    """
+
+    cleaned = []
+    errors = []
+    for number, row in rows:
+        try:
+            cleaned.append( ( number, clean_row( row ) ) )
+        except RowError as error:
+            errors.append( ( number, str( error ) ) )
+
+    team_ids = { row['team'] for _, row in cleaned if row['team'] is not None }
+    existing_teams = set( Team.objects.filter( pk__in=team_ids ).values_list( 'pk', flat=True ) )
+    for number, row in cleaned:
+        if row['team'] is not None and row['team'] not in existing_teams:
+            errors.append( ( number, f'team {row["team"]} does not exist' ) )
+    cleaned = [ ( number, row ) for number, row in cleaned if row['team'] is None or row['team'] in existing_teams ]
+
+    # The first row of each username creates the user, deleted users included as their names are taken
+    first_rows = {}
+    for _, row in cleaned:
+        first_rows.setdefault( row['username'], row )
+    existing_users = set( User._base_manager.filter( username__in=first_rows ).values_list( 'username', flat=True ) )
+    new_rows = [ row for username, row in first_rows.items() if username not in existing_users ]
+
+    # Hashing is by far the slowest part, it happens before the transaction is opened
+    plain = [ row for row in new_rows if 'password' in row ]
+    for row, hashed in zip( plain, hash_passwords( [ row['password'] for row in plain ], workers ) ):
+        row['password_hash'] = hashed
+    unusable = make_password( None )
+
+    users = [
+        User(
+            username=row['username'], email=row['email'], first_name=row.get( 'first_name', '' ),
+            last_name=row.get( 'last_name', '' ), password=row.get( 'password_hash', unusable ),
+        )
+        for row in new_rows
+    ]
+
+    with transaction.atomic():
+        User.objects.bulk_create( users, batch_size=chunk_size, ignore_conflicts=True )
+
+        member_rows = [ ( number, row ) for number, row in cleaned if row['team'] is not None ]
+        user_ids = dict( User.objects.filter( username__in={ row['username'] for _, row in member_rows } ).values_list( 'username', 'pk' ) )
+        existing_memberships = set(
+            TeamMembership.objects.filter( team__in={ row['team'] for _, row in member_rows }, member__in=user_ids.values() )
+            .values_list( 'team_id', 'member_id' )
+        )
+
+        memberships = {}
+        for number, row in member_rows:
+            member_id = user_ids.get( row['username'] )
+            if member_id is None:
+                errors.append( ( number, f'user {row["username"]} is deleted' ) )
+            elif ( row['team'], member_id ) not in existing_memberships:
+                memberships.setdefault( ( row['team'], member_id ), TeamMembership( team_id=row['team'], member_id=member_id, role=row['role'] ) )
+        TeamMembership.objects.bulk_create( memberships.values(), batch_size=chunk_size, ignore_conflicts=True )
+
+        usernames = { user_id: username for username, user_id in user_ids.items() }
+        added = {}
+        for ( team_id, member_id ), membership in memberships.items():
+            added.setdefault( team_id, [] ).append( ( User( pk=member_id, username=usernames[member_id] ), membership.role ) )
+        for team_id, members in added.items():
+            # bulk_create sends no signals, counters and cached teams are updated like in TeamManager.add_members
+            Team.objects.count_members( team_id, added=[ role for _, role in members ] )
+            memberships_changed.send( sender=Team, team=Team( pk=team_id ), members=[ member for member, _ in members ], action='add' )
+
+    errors.sort()
+    return len( users ), len( memberships ), errors
@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+from accounts.importing import import_batch, read_rows
+
+
+class Command( BaseCommand ):
+    help = (
+        'Import users and team memberships from a CSV or JSON lines file, see accounts.importing. '
+        'The file is streamed batch by batch and progress is saved to a checkpoint file after each one, '
+        'so an import that stopped is resumed by running the same command again'
+    )
+
+    def add_arguments( self, parser ):
+        parser.add_argument( 'path', help='file to import, - for the standard input' )
+        parser.add_argument( '--format', choices=( 'csv', 'jsonl' ), help='defaults to the file extension' )
+        parser.add_argument( '--batch-size', type=int, default=1000, help='rows validated and committed together' )
+        parser.add_argument( '--chunk-size', type=int, default=500, help='rows per INSERT statement' )
+        parser.add_argument( '--workers', type=int, default=os.cpu_count() or 1, help='password hashing processes, 0 hashes inline' )
+        parser.add_argument( '--checkpoint', help='progress file, defaults to the path with .checkpoint appended' )
+        parser.add_argument( '--restart', action='store_true', help='ignore the checkpoint and start from the first row' )
+
+    def handle( self, *args, **options ):
+        path = options['path']
+        format = options['format'] or ( 'jsonl' if path.endswith( ( '.jsonl', '.ndjson' ) ) else 'csv' )
+        if options['batch_size'] < 1 or options['chunk_size'] < 1:
+            raise CommandError( '--batch-size and --chunk-size must be positive' )
+        checkpoint = options['checkpoint'] or ( None if path == '-' else f'{path}.checkpoint' )
+
+        done = 0
+        if checkpoint and not options['restart'] and os.path.exists( checkpoint ):
+            with open( checkpoint ) as file:
+                done = json.load( file )['rows']
+            self.stdout.write( f'Resuming after row {done}' )
+
+        file = sys.stdin if path == '-' else open( path, newline='', encoding='utf-8' )
+        users = memberships = invalid = 0
+        try:
+            rows = islice( enumerate( read_rows( file, format ), start=1 ), done, None )
+            while batch := list( islice( rows, options['batch_size'] ) ):
+                created_users, created_memberships, errors = import_batch( batch, options['chunk_size'], options['workers'] )
+                users += created_users
+                memberships += created_memberships
+                invalid += len( errors )
+                for number, error in errors:
+                    self.stderr.write( f'row {number}: {error}' )
+
+                # With DEBUG on, every INSERT would stay in the query log
+                reset_queries()
+                done = batch[-1][0]
+                if checkpoint:
+                    self.save_checkpoint( checkpoint, done )
+                self.stdout.write( f'{done} rows: {users} users and {memberships} memberships created, {invalid} rows skipped' )
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        if checkpoint and os.path.exists( checkpoint ):
+            os.remove( checkpoint )
+        self.stdout.write( self.style.SUCCESS( f'Imported {done} rows: {users} users and {memberships} memberships created, {invalid} rows skipped' ) )
+
+    def save_checkpoint( self, checkpoint, rows ):
+        # Written aside then renamed, a crash never leaves a half written checkpoint
+        with open( f'{checkpoint}.tmp', 'w' ) as file:
+            json.dump( { 'rows': rows }, file )
+        os.replace( f'{checkpoint}.tmp', checkpoint )
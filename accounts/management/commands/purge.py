@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from accounts.models import PurgeJob
+from accounts.purge import run
+
+
+class Command( BaseCommand ):
+    help = 'Run the purge jobs of deleted teams and users that did not finish, e.g. because of a restart'
+
+    def add_arguments( self, parser ):
+        parser.add_argument( '--job', type=int, action='append', help='run only these jobs, can be repeated' )
+
+    def handle( self, *args, **options ):
+        jobs = PurgeJob.objects.exclude( status=PurgeJob.Status.DONE ).order_by( 'id' )
+        if options['job']:
+            jobs = PurgeJob.objects.filter( pk__in=options['job'] ).order_by( 'id' )
+
+        for job_pk in jobs.values_list( 'pk', flat=True ):
+            job = run( job_pk )
+            self.stdout.write( f'{job.model} {job.object_id}: {job.get_status_display().lower()}, {job.deleted_rows} rows deleted' )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import Team
+
+
+class Command( BaseCommand ):
+    help = 'Recompute the member counts, first mate counts and captain of teams from their memberships'
+
+    def add_arguments( self, parser ):
+        parser.add_argument( '--team', type=int, action='append', help='recount only these teams, can be repeated' )
+        parser.add_argument( '--batch-size', type=int, default=1000, help='teams updated per transaction' )
+
+    def handle( self, *args, **options ):
+        teams = Team.objects.order_by( 'pk' )
+        if options['team']:
+            teams = teams.filter( pk__in=options['team'] )
+
+        # By primary key ranges, so the table is never locked by one long UPDATE
+        recounted = 0
+        last_pk = 0
+        while pks := list( teams.filter( pk__gt=last_pk ).values_list( 'pk', flat=True )[:options['batch_size']] ):
+            with transaction.atomic():
+                recounted += Team.objects.filter( pk__in=pks ).recount()
+            last_pk = pks[-1]
+        self.stdout.write( f'{recounted} teams recounted' )
@@ -0,0 +1,58 @@
+# Generated by Django 5.0 on 2026-10-18 03:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+ROLE_PRECEDENCE = ( 'C', 'FM', 'M' )
+
+
+def remove_duplicate_memberships( apps, schema_editor ):
+    """Keep a single membership per ( team, member ), the one with the highest role"""
+
+    TeamMembership = apps.get_model( 'accounts', 'TeamMembership' )
+    duplicated = (
+        TeamMembership.objects.values( 'team', 'member' )
+        .annotate( rows=models.Count( 'id' ) )
+        .filter( rows__gt=1 )
+    )
+    for pair in duplicated.iterator():
+        memberships = sorted(
+            TeamMembership.objects.filter( team=pair['team'], member=pair['member'] ),
+            key=lambda membership: ( ROLE_PRECEDENCE.index( membership.role ), membership.id )
+        )
+        TeamMembership.objects.filter( id__in=[ membership.id for membership in memberships[1:] ] ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_memberships, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='teammembership',
+            index=models.Index(fields=['team', 'id'], name='membership_team_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teammembership',
+            index=models.Index(fields=['member', 'team'], name='membership_member_team_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='teammembership',
+            constraint=models.UniqueConstraint(fields=('team', 'member'), name='unique_team_member'),
+        ),
+        migrations.AlterField(
+            model_name='teammembership',
+            name='member',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='teammembership',
+            name='team',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='accounts.team'),
+        ),
+    ]
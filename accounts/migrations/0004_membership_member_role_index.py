@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_manager'),
+    ]
+
+    # The new index is built before the old one is dropped, so lookups by member always have one
+    operations = [
+        migrations.AddIndex(
+            model_name='teammembership',
+            index=models.Index(fields=['member', 'team', 'role'], name='membership_member_role_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='teammembership',
+            name='membership_member_team_idx',
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0 on 2026-10-18 04:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_members( apps, schema_editor ):
+    """Fill the counters of existing teams, same as TeamQuerySet.recount()"""
+
+    Team = apps.get_model( 'accounts', 'Team' )
+    TeamMembership = apps.get_model( 'accounts', 'TeamMembership' )
+    memberships = TeamMembership.objects.filter( team=models.OuterRef( 'pk' ), member__deleted_at__isnull=True ).order_by().values( 'team' )
+
+    def count( rows ):
+        return Coalesce( models.Subquery( rows.annotate( count=models.Count( 'pk' ) ).values( 'count' ) ), 0 )
+
+    Team.objects.update(
+        member_count=count( memberships ),
+        first_mate_count=count( memberships.filter( role='FM' ) ),
+        captain=models.Subquery( memberships.filter( role='C' ).values( 'member' )[:1] ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_soft_delete_purge_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='captain',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='first_mate_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_members, migrations.RunPython.noop),
+    ]
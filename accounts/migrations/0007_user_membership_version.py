@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_team_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='membership_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
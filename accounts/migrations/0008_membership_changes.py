@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-18 05:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_membership_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='change_sequence',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='MembershipChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('kind', models.CharField(choices=[('added', 'Added'), ('removed', 'Removed'), ('role', 'Role changed')], max_length=7)),
+                ('member_id', models.UUIDField()),
+                ('username', models.CharField(max_length=150)),
+                ('role', models.CharField(blank=True, choices=[('C', 'Captain'), ('FM', 'First mate'), ('M', 'Member')], max_length=2)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('team', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='membership_changes', to='accounts.team')),
+            ],
+            options={
+                'db_table': 'membership_changes',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='membershipchange',
+            constraint=models.UniqueConstraint(fields=('team', 'sequence'), name='unique_team_change_sequence'),
+        ),
+    ]
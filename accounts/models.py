@@ -1,19 +1,193 @@
 import uuid
-from django.contrib.auth.models import AbstractUser
+from django.apps import apps
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.db import models
 from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from .hashing import hash_password
 
-class TeamManager( models.Manager ):
+# Rows per INSERT statement when adding members in bulk
+MEMBERSHIP_BATCH_SIZE = 500
+
+# Sent by the bulk membership writes of TeamManager, which bypass model and m2m signals.
+# Arguments: team, members ( the users added or removed ), action ( 'add' or 'remove' ).
+memberships_changed = Signal()
+
+
+def members_prefetch():
+    """Prefetch a team's memberships together with their users, so members are loaded in one query"""
+    return models.Prefetch( 'teammembership_set', queryset=TeamMembership.objects.active().select_related( 'member' ).order_by( 'pk' ) )
+
+
+class TeamQuerySet( models.QuerySet ):
+
+    def with_members( self ):
+        return self.prefetch_related( members_prefetch() )
+
+    def with_role( self, user ):
+        """
+        Annotate `role` with the user's role in each team, None where the user is not a member.
+        One LEFT JOIN on teams_membership, so a single row tells both whether the team exists
+        and whether the user may see it.
+        """
+        return self.annotate(
+            user_membership=models.FilteredRelation( 'teammembership', condition=models.Q( teammembership__member=user ) ),
+            role=models.F( 'user_membership__role' ),
+        )
+
+    def for_user( self, user ):
+        """Only the teams the user is a member of, annotated with the user's role"""
+        return self.with_role( user ).filter( role__isnull=False )
+
+    def recount( self ):
+        """Recompute member_count, first_mate_count and captain of these teams from their active memberships, in one UPDATE"""
+
+        memberships = TeamMembership.objects.filter( team=models.OuterRef( 'pk' ) ).active().order_by().values( 'team' )
+
+        def count( rows ):
+            return Coalesce( models.Subquery( rows.annotate( count=models.Count( 'pk' ) ).values( 'count' ) ), 0 )
+
+        return self.update(
+            member_count=count( memberships ),
+            first_mate_count=count( memberships.filter( role=TeamMembership.Roles.FIRST_MATE ) ),
+            captain=models.Subquery( memberships.filter( role=TeamMembership.Roles.CAPTAIN ).values( 'member' )[:1] ),
+        )
+
+
+class TeamManager( models.Manager.from_queryset( TeamQuerySet ) ):
+
+    def get_queryset( self ):
+        # Soft deleted teams are hidden until accounts.purge removes them
+        return super().get_queryset().filter( deleted_at__isnull=True )
 
     @transaction.atomic
     def create_team( self, team_name, captain ):
-        team = Team.objects.create( name=team_name )
+        team = Team.objects.create( name=team_name, captain=captain, member_count=1 )
         TeamMembership.objects.create( team=team, member=captain, role=TeamMembership.Roles.CAPTAIN )
         return team       
 
+    def count_members( self, team, added=(), removed=() ):
+        """
+        Apply the roles of memberships just created ( `added` ) or deleted ( `removed` ) to the
+        team's counters with one UPDATE of F() expressions, so concurrent writes never lose a change.
+        `team` is a Team, whose counters in memory are adjusted too, or a team id.
+        Must run in the transaction that wrote the memberships.
+        """
+        Roles = TeamMembership.Roles
+        members = len( added ) - len( removed )
+        first_mates = list( added ).count( Roles.FIRST_MATE ) - list( removed ).count( Roles.FIRST_MATE )
+        captain_removed = Roles.CAPTAIN in removed
+
+        changes = {}
+        if members:
+            changes['member_count'] = models.F( 'member_count' ) + members
+        if first_mates:
+            changes['first_mate_count'] = models.F( 'first_mate_count' ) + first_mates
+        if captain_removed:
+            changes['captain'] = None
+        if not changes:
+            return
+
+        team_pk = team.pk if isinstance( team, Team ) else team
+        Team._base_manager.filter( pk=team_pk ).update( **changes )
+        if isinstance( team, Team ):
+            team.member_count += members
+            team.first_mate_count += first_mates
+            if captain_removed:
+                team.captain = None
+
+    def uncount_member( self, user ):
+        """Take a deleted user out of the counters of all their teams, with one UPDATE per counter"""
+
+        memberships = TeamMembership.objects.filter( member=user )
+        Team._base_manager.filter( pk__in=memberships.values( 'team' ) ).update( member_count=models.F( 'member_count' ) - 1 )
+        Team._base_manager.filter( pk__in=memberships.filter( role=TeamMembership.Roles.FIRST_MATE ).values( 'team' ) ).update(
+            first_mate_count=models.F( 'first_mate_count' ) - 1
+        )
+        Team._base_manager.filter( captain=user ).update( captain=None )
+
+    @transaction.atomic
+    def add_members( self, team, members ):
+        """
+        Add users to a team with batched inserts.
+        `members` maps each user to its role. Users already in the team are left untouched.
+        Returns the created memberships.
+        """
+        existing = set( TeamMembership.objects.filter( team=team, member__in=members ).values_list( 'member_id', flat=True ) )
+        memberships = [
+            TeamMembership( team=team, member=user, role=role )
+            for user, role in members.items() if user.pk not in existing
+        ]
+        created = TeamMembership.objects.bulk_create( memberships, batch_size=MEMBERSHIP_BATCH_SIZE )
+        self.count_members( team, added=[ membership.role for membership in created ] )
+        if created:
+            memberships_changed.send( sender=Team, team=team, members=[ membership.member for membership in created ], action='add' )
+        return created
+
+    @transaction.atomic
+    def remove_members( self, team, members ):
+        """Remove users from a team with a single delete. The captain is never removed. Returns the removed usernames"""
+
+        members = list( members )
+        memberships = TeamMembership.objects.filter( team=team, member__in=members ).exclude( role=TeamMembership.Roles.CAPTAIN )
+        removed_roles = dict( memberships.values_list( 'member_id', 'role' ) )
+        removed_ids = set( removed_roles )
+        memberships.delete()
+        self.count_members( team, removed=list( removed_roles.values() ) )
+
+        removed = [ member for member in members if member.pk in removed_ids ]
+        if removed:
+            memberships_changed.send( sender=Team, team=team, members=removed, action='remove' )
+        return [ member.username for member in removed ]
+
+
+class TeamMembershipQuerySet( models.QuerySet ):
+
+    def active( self ):
+        """Memberships of users who are not soft deleted"""
+        return self.filter( member__deleted_at__isnull=True )
+
+    def shared_with( self, user ):
+        """
+        Memberships in teams `user` is also in, annotated with `shared_role`, the role of `user` in the team.
+        Joins teams_membership to itself through the team's primary key, every row is matched with one
+        lookup on the ( team, member ) unique index.
+        """
+        return self.annotate(
+            shared_membership=models.FilteredRelation( 'team__teammembership', condition=models.Q( team__teammembership__member=user ) ),
+            shared_role=models.F( 'shared_membership__role' ),
+        ).filter( shared_role__isnull=False, team__deleted_at__isnull=True )
+
+
+class UserManager( BaseUserManager ):
+
+    def get_queryset( self ):
+        # Soft deleted users are hidden until accounts.purge removes them
+        return super().get_queryset().filter( deleted_at__isnull=True )
+
+    def _create_user( self, username, email, password, **extra_fields ):
+        """Same as Django's, with the password hashed by accounts.hashing before the single INSERT"""
+
+        if not username:
+            raise ValueError( 'The given username must be set' )
+        email = self.normalize_email( email )
+        GlobalUserModel = apps.get_model( self.model._meta.app_label, self.model._meta.object_name )
+        username = GlobalUserModel.normalize_username( username )
+        user = self.model( username=username, email=email, **extra_fields )
+        user.password = hash_password( password )
+        user.save( using=self._db )
+        return user
+
 
 class User( AbstractUser ):
     id = models.UUIDField( primary_key=True, default=uuid.uuid4, editable=False )
+    # Set when the user is deleted, see accounts.purge
+    deleted_at = models.DateTimeField( null=True, blank=True, editable=False )
+    # Goes up whenever the user's memberships change, access tokens with older team claims are not trusted ( see accounts.tokens )
+    membership_version = models.PositiveIntegerField( default=0, editable=False )
+
+    objects = UserManager()
 
     class Meta:
         db_table = 'users'
@@ -27,6 +201,15 @@ class Team( models.Model ):
     slug = models.SlugField()
     members = models.ManyToManyField( User, related_name='teams', through='TeamMembership' )
     created = models.DateTimeField( auto_now_add=True )
+    # Denormalized from the active memberships by the TeamManager methods and accounts.signals,
+    # `manage.py recount_teams` recomputes them
+    member_count = models.PositiveIntegerField( default=0, editable=False )
+    first_mate_count = models.PositiveIntegerField( default=0, editable=False )
+    captain = models.ForeignKey( User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+', editable=False )
+    # Number of the last entry of the team's membership change log, see accounts.changes
+    change_sequence = models.PositiveBigIntegerField( default=0, editable=False )
+    # Set when the team is deleted, see accounts.purge
+    deleted_at = models.DateTimeField( null=True, blank=True, editable=False )
 
     objects = TeamManager()
 
@@ -43,13 +226,83 @@ class TeamMembership( models.Model ):
         FIRST_MATE = 'FM', 'First mate'
         MEMBER = 'M', 'Member'
         
-    team = models.ForeignKey( Team, on_delete=models.CASCADE )
-    member = models.ForeignKey( User, on_delete=models.CASCADE )
+    # The single column indexes are left out, the indexes below cover them
+    team = models.ForeignKey( Team, on_delete=models.CASCADE, db_index=False )
+    member = models.ForeignKey( User, on_delete=models.CASCADE, db_index=False )
     role = models.CharField(
         max_length=2,
         choices=Roles.choices,
         default=Roles.MEMBER
     )
 
+    objects = TeamMembershipQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'teams_membership'
+        constraints = [
+            # Also serves role lookups by ( team, member )
+            models.UniqueConstraint( fields=( 'team', 'member' ), name='unique_team_member' ),
+        ]
+        indexes = [
+            # Members of a team in membership order, read page by page without sorting the whole team
+            models.Index( fields=( 'team', 'id' ), name='membership_team_id_idx' ),
+            # Teams of a user ( user.teams ) and their role in each, joined to teams or to other
+            # memberships by team_id without touching the table
+            models.Index( fields=( 'member', 'team', 'role' ), name='membership_member_role_idx' ),
+        ] 
+
+
+class MembershipChange( models.Model ):
+    """Entry of a team's append-only membership change log, numbered from 1 per team, see accounts.changes"""
+
+    class Kinds( models.TextChoices ):
+        ADDED = 'added', 'Added'
+        REMOVED = 'removed', 'Removed'
+        ROLE = 'role', 'Role changed'
+
+    # The unique constraint below covers the team
+    team = models.ForeignKey( Team, on_delete=models.CASCADE, db_index=False, related_name='membership_changes' )
+    sequence = models.PositiveBigIntegerField()
+    kind = models.CharField( max_length=7, choices=Kinds.choices )
+    # Not a foreign key, entries outlive the users they are about
+    member_id = models.UUIDField()
+    username = models.CharField( max_length=150 )
+    # The new role, empty for removals
+    role = models.CharField( max_length=2, choices=TeamMembership.Roles.choices, blank=True )
+    created = models.DateTimeField( auto_now_add=True )
+
+    class Meta:
+        db_table = 'membership_changes'
+        constraints = [
+            # Entries after a sequence number are read in order from the index
+            models.UniqueConstraint( fields=( 'team', 'sequence' ), name='unique_team_change_sequence' ),
+        ]
+
+
+class PurgeJob( models.Model ):
+    """Removal of a soft deleted team or user and the rows depending on it, see accounts.purge"""
+
+    class Status( models.TextChoices ):
+        PENDING = 'P', 'Pending'
+        RUNNING = 'R', 'Running'
+        DONE = 'D', 'Done'
+        FAILED = 'F', 'Failed'
+
+    # Model label ( e.g. accounts.team ) and primary key of what is purged
+    model = models.CharField( max_length=100 )
+    object_id = models.CharField( max_length=64 )
+    requested_by = models.ForeignKey( User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+' )
+    status = models.CharField( max_length=1, choices=Status.choices, default=Status.PENDING )
+    # Progress: rows deleted so far, the purged row and its dependents
+    deleted_rows = models.PositiveBigIntegerField( default=0 )
+    error = models.TextField( blank=True )
+    created = models.DateTimeField( auto_now_add=True )
+    started = models.DateTimeField( null=True, blank=True )
+    finished = models.DateTimeField( null=True, blank=True )
+
     class Meta:
-        db_table = 'teams_membership' 
\ No newline at end of file
+        db_table = 'purge_jobs'
+        indexes = [
+            # Unfinished jobs, picked up again by `manage.py purge`
+            models.Index( fields=( 'status', 'id' ), name='purge_job_status_idx' ),
+        ]
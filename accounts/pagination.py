@@ -0,0 +1,104 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination( BasePagination ):
+    """
+    Keyset ( cursor ) pagination over a queryset ordered by `ordering`, all ascending.
+    The cursor holds the ordering values of the last row of the page, so every page is
+    an indexed range scan no matter how deep the client goes.
+    The last field of `ordering` must be unique.
+    """
+
+    ordering = ( 'id', )
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset( self, queryset, request, view=None ):
+        return self.set_page( list( self.get_page_queryset( queryset, request ) ) )
+
+    async def apaginate_queryset( self, queryset, request, view=None ):
+        return self.set_page( [ instance async for instance in self.get_page_queryset( queryset, request ) ] )
+
+    def get_page_queryset( self, queryset, request ):
+        self.request = request
+        self.page_size_requested = self.get_page_size( request )
+
+        queryset = queryset.order_by( *self.ordering )
+        cursor = self.decode_cursor( request, queryset.model )
+        if cursor is not None:
+            queryset = queryset.filter( self.after( cursor ) )
+
+        # One extra row tells whether there is a next page without a COUNT query
+        return queryset[:self.page_size_requested + 1]
+
+    def set_page( self, rows ):
+        self.has_next = len( rows ) > self.page_size_requested
+        self.page = rows[:self.page_size_requested]
+        return self.page
+
+    def get_page_size( self, request ):
+        try:
+            page_size = int( request.query_params[self.page_size_query_param] )
+        except ( KeyError, ValueError ):
+            return self.page_size
+        return min( max( page_size, 1 ), self.max_page_size )
+
+    def after( self, values ):
+        """( a, b ) > ( x, y ) expanded as a > x OR ( a = x AND b > y ), which every database can use with an index"""
+
+        condition = Q()
+        for position, field in enumerate( self.ordering ):
+            equal = dict( zip( self.ordering[:position], values[:position] ) )
+            condition |= Q( **equal, **{ f'{field}__gt': values[position] } )
+        return condition
+
+    def encode_cursor( self, instance ):
+        # Model instances or .values() rows
+        values = [ instance[field] if isinstance( instance, dict ) else getattr( instance, field ) for field in self.ordering ]
+        # Datetimes and UUIDs go through str() to keep full precision, Django parses them back on filtering
+        values = [ value if isinstance( value, ( int, float ) ) else str( value ) for value in values ]
+        return urlsafe_b64encode( json.dumps( values ).encode() ).decode()
+
+    def decode_cursor( self, request, model ):
+        """The ordering values of the cursor, as the Python values of `model`'s fields"""
+
+        encoded = request.query_params.get( self.cursor_query_param )
+        if not encoded:
+            return None
+        try:
+            values = json.loads( urlsafe_b64decode( encoded.encode() ) )
+            if not isinstance( values, list ) or len( values ) != len( self.ordering ) or None in values:
+                raise ValueError( self.invalid_cursor_message )
+            # Checked here, a value of the wrong type would only fail in the query
+            return [ model._meta.get_field( field ).to_python( value ) for field, value in zip( self.ordering, values ) ]
+        except ( TypeError, ValueError, ValidationError ):
+            raise NotFound( self.invalid_cursor_message )
+
+    def get_next_link( self, url=None ):
+        """Link to the next page, optionally on another endpoint paginating the same rows"""
+
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri( url )
+        return replace_query_param( url, self.cursor_query_param, self.encode_cursor( self.page[-1] ) )
+
+    def get_paginated_response( self, data ):
+        return Response( { 'next': self.get_next_link(), 'results': data } )
+
+
+class TeamPagination( KeysetPagination ):
+    ordering = ( 'created', 'id' )
+
+
+class MembershipPagination( KeysetPagination ):
+    ordering = ( 'id', )
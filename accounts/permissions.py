@@ -1,5 +1,82 @@
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from rest_framework import permissions
-from .models import TeamMembership
+from .models import Team, TeamMembership
+
+
+def _request_roles( request ):
+    try:
+        return request._team_roles
+    except AttributeError:
+        request._team_roles = {}
+        return request._team_roles
+
+
+def _membership_roles( request, team_pk ):
+    return TeamMembership.objects.filter( team=team_pk, member=request.user.id ).values_list( 'role', flat=True )
+
+
+def get_team_role( request, team_pk ):
+    """
+    Role of the requesting user in the team, or None if the user is not a member.
+    The result is memoized on the request, so any combination of permission classes
+    costs at most one query per team, none when the access token carries the roles.
+    """
+    roles = _request_roles( request )
+    team_pk = int( team_pk )
+    if team_pk not in roles:
+        roles[team_pk] = None if _roles_claimed( request ) else _membership_roles( request, team_pk ).first()
+    return roles[team_pk]
+
+
+async def aget_team_role( request, team_pk ):
+    """Async get_team_role(), sharing the same memo so sync permission classes can read it afterwards"""
+
+    roles = _request_roles( request )
+    team_pk = int( team_pk )
+    if team_pk not in roles:
+        roles[team_pk] = None if _roles_claimed( request ) else await _membership_roles( request, team_pk ).afirst()
+    return roles[team_pk]
+
+
+def _roles_claimed( request ):
+    return getattr( request, '_team_roles_claimed', False )
+
+
+def remember_claimed_roles( request, roles ):
+    """
+    Store all of the user's roles, as read from the access token claims ( see accounts.tokens ).
+    Teams missing from `roles` are then teams the user is not in, without querying.
+    """
+    _request_roles( request ).update( roles )
+    request._team_roles_claimed = True
+
+
+def remember_team_role( request, team_pk, role ):
+    """Store a role loaded along with other rows, the permission classes then answer without querying"""
+
+    _request_roles( request )[int( team_pk )] = role
+
+
+def get_team_or_404( request, pk, queryset=None ):
+    """
+    Fetch a team together with the requesting user's role in a single query.
+    Raises Http404 if the team doesn't exist. Otherwise the role is remembered, so the
+    team permission classes decide 403 from the same row.
+    """
+    queryset = Team.objects.all() if queryset is None else queryset
+    team = get_object_or_404( queryset.with_role( request.user.id ), pk=pk )
+    remember_team_role( request, team.pk, team.role )
+    return team
+
+
+async def aget_team_or_404( request, pk, queryset=None ):
+    """Async get_team_or_404()"""
+
+    queryset = Team.objects.all() if queryset is None else queryset
+    team = await aget_object_or_404( queryset.with_role( request.user.id ), pk=pk )
+    remember_team_role( request, team.pk, team.role )
+    return team
+
 
 class IsOwnerOrReadOnly( permissions.BasePermission ):
     """
@@ -42,34 +119,32 @@ class IsUser( permissions.BasePermission ):
 class IsInCommonTeam( permissions.BasePermission ):
     message = 'Must be in a common team to perform action'
     def has_object_permission( self, request, view, obj ): 
-        my_teams = request.user.teams.all()
-        requested_user_teams = obj.teams.all()
-
-        return bool( my_teams.filter( pk__in=requested_user_teams.values_list( 'pk', flat=True ) ).exists() )
+        # One query: the memberships of obj, each matched against the user's through the ( team, member ) index
+        return TeamMembership.objects.filter( member=obj.pk ).shared_with( request.user.id ).exists()
     
 
 class IsInTeam( permissions.BasePermission ):
     message = 'Must be in team to perform action'
     def has_object_permission( self, request, view, team ): 
-        return bool( request.user.teams.filter( name=team ).exists() )
+        return get_team_role( request, team.id ) is not None
     
 
 class IsCaptain( permissions.BasePermission ):
     message = 'Must be captain to perform action'
     def has_object_permission( self, request, view, team ): 
-        return bool( TeamMembership.objects.filter( team=team.id, member=request.user.id, role='C' ).exists() )
+        return get_team_role( request, team.id ) == TeamMembership.Roles.CAPTAIN
 
 
 class IsFirstMate( permissions.BasePermission ):
     message = 'Must be First mate to perform action'
     def has_object_permission( self, request, view, team ): 
-        return bool( TeamMembership.objects.filter( team=team.id, member=request.user.id, role='FM' ).exists() )
+        return get_team_role( request, team.id ) == TeamMembership.Roles.FIRST_MATE
 
 class IsInTeamAndIsUserOrIsCaptainOrIsFirstMate( permissions.BasePermission ):
     message = 'must be captain or first mate to remove a member or be the member itself'
     def has_object_permission( self, request, view, user ): 
-        team_pk = view.kwargs.get( 'pk' )
-        if not request.user.teams.filter( pk=team_pk ).exists():
+        role = get_team_role( request, view.kwargs.get( 'pk' ) )
+        if role is None:
             self.message = 'must be in team to perform action'
             return False
         if not user:
@@ -77,5 +152,5 @@ class IsInTeamAndIsUserOrIsCaptainOrIsFirstMate( permissions.BasePermission ):
             return False
         return bool( 
             request.user == user 
-            or TeamMembership.objects.filter( team=team_pk, member=request.user.id, role__in=('C', 'FM') ).exists()
-        )
\ No newline at end of file
+            or role in ( TeamMembership.Roles.CAPTAIN, TeamMembership.Roles.FIRST_MATE )
+        )
@@ -0,0 +1,126 @@
+"""
+Deletion of teams and users in the background.
+
+soft_delete() marks the row deleted, which hides it from the default managers, and records a
+PurgeJob. Once the transaction commits, a worker thread purges the row and everything depending
+on it, children first, in batches of PURGE_BATCH_SIZE primary keys: dependents are found from the
+model relations like Django's collector does, but instead of loading every related instance they
+are removed with raw DELETE ( and UPDATE for SET_NULL ) statements. Each batch is a transaction of
+its own and adds to the job's progress, so the request returns right away, memory stays bounded
+however large the team is, and a purge that stopped halfway can simply be run again.
+
+Raw deletes send no delete signals. Caches and team counters are updated when the row is soft deleted.
+Jobs left unfinished by a restart are run again by `manage.py purge`.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import CASCADE, DO_NOTHING, SET_NULL, F, Q
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+from .changes import record_memberships
+from .models import MembershipChange, PurgeJob, Team, TeamMembership, User
+
+logger = logging.getLogger( __name__ )
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@transaction.atomic
+def soft_delete( instance, requested_by=None ):
+    """Mark a team or user deleted and schedule its purge. Returns the PurgeJob"""
+
+    instance.deleted_at = timezone.now()
+    instance.save( update_fields=[ 'deleted_at' ] )
+    if isinstance( instance, User ):
+        # Memberships of deleted users are hidden right away too
+        Team.objects.uncount_member( instance )
+        record_memberships(
+            MembershipChange.Kinds.REMOVED,
+            TeamMembership.objects.filter( member=instance ).order_by( 'pk' ).values_list( 'team_id', 'member_id', 'member__username', 'role' ),
+        )
+
+    job = PurgeJob.objects.create( model=instance._meta.label_lower, object_id=str( instance.pk ), requested_by=requested_by )
+    transaction.on_commit( lambda: submit( job.pk ) )
+    return job
+
+
+def submit( job_pk ):
+    """Run the job in the worker pool, or right away with PURGE_INLINE ( tests )"""
+
+    if settings.PURGE_INLINE:
+        run( job_pk )
+    else:
+        get_executor().submit( _run_in_worker, job_pk )
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor( max_workers=settings.PURGE_WORKERS, thread_name_prefix='purge' )
+        return _executor
+
+
+def _run_in_worker( job_pk ):
+    try:
+        run( job_pk )
+    finally:
+        # The thread's connections would stay open otherwise
+        connections.close_all()
+
+
+def run( job_pk ):
+    """Purge what the job points to. Failures are recorded on the job"""
+
+    jobs = PurgeJob.objects.filter( pk=job_pk )
+    job = jobs.get()
+    if job.status == PurgeJob.Status.DONE:
+        return job
+
+    jobs.update( status=PurgeJob.Status.RUNNING, started=timezone.now(), error='' )
+    model = apps.get_model( job.model )
+    try:
+        purge( model, Q( pk=model._meta.pk.to_python( job.object_id ) ), job )
+    except Exception as error:
+        logger.exception( 'Purge job %s failed', job.pk )
+        jobs.update( status=PurgeJob.Status.FAILED, error=repr( error ), finished=timezone.now() )
+    else:
+        jobs.update( status=PurgeJob.Status.DONE, finished=timezone.now() )
+    job.refresh_from_db()
+    return job
+
+
+def purge( model, condition, job ):
+    """Delete the rows of `model` matching `condition` and their dependents, batch by batch"""
+
+    using = router.db_for_write( model )
+    rows = model._base_manager.using( using ).filter( condition )
+    relations = list( get_candidate_relations_to_delete( model._meta ) )
+
+    while True:
+        pks = list( rows.values_list( 'pk', flat=True )[:settings.PURGE_BATCH_SIZE] )
+        if not pks:
+            return
+
+        for relation in relations:
+            field = relation.field
+            on_delete = field.remote_field.on_delete
+            dependents = Q( **{ f'{field.name}__in': pks } )
+            if on_delete is CASCADE:
+                purge( relation.related_model, dependents, job )
+            elif on_delete is SET_NULL:
+                with transaction.atomic( using=using ):
+                    relation.related_model._base_manager.using( using ).filter( dependents ).update( **{ field.name: None } )
+            elif on_delete is not DO_NOTHING:
+                raise ValueError( f'{relation.related_model._meta.label}.{field.name}: purge only handles CASCADE, SET_NULL and DO_NOTHING' )
+
+        with transaction.atomic( using=using ):
+            # Private API, the one the collector uses for its fast deletes
+            deleted = model._base_manager.using( using ).filter( pk__in=pks )._raw_delete( using )
+            PurgeJob.objects.filter( pk=job.pk ).update( deleted_rows=F( 'deleted_rows' ) + deleted )
@@ -1,10 +1,13 @@
 from rest_framework import serializers
-from accounts.models import Team
+from rest_framework.validators import UniqueValidator
+from accounts.models import PurgeJob, Team, TeamMembership
 from django.contrib.auth import get_user_model
+from accounts.hashing import hash_password
+from task_manager.instrumentation import InstrumentedSerializerMixin, timed
 
 User = get_user_model()
 
-class UserSerializer( serializers.ModelSerializer ):
+class UserSerializer( InstrumentedSerializerMixin, serializers.ModelSerializer ):
     class Meta:
         model = User
         fields = ( 'id', 'username', 'password', 'first_name', 'last_name', 'email' )
@@ -12,6 +15,11 @@ class UserSerializer( serializers.ModelSerializer ):
         # Make sure that the password field is never sent back to the client.
         extra_kwargs = {
             'password': { 'write_only': True },
+            # Soft deleted users keep their username until they are purged
+            'username': { 'validators': [
+                User.username_validator,
+                UniqueValidator( queryset=User._base_manager.all(), message=User._meta.get_field( 'username' ).error_messages['unique'] ),
+            ] },
         }
     
     def to_representation( self, instance ):
@@ -22,36 +30,221 @@ class UserSerializer( serializers.ModelSerializer ):
         return User.objects.create_user( **validated_data )
     
     def update( self, instance, validated_data ):
-        updated = super().update( instance, validated_data )
-    
-        # We save again the user if the password was specified to make sure it's properly hashed.
+        # Hash the password before saving so a password change is a single UPDATE.
         if 'password' in validated_data:
-            updated.set_password( validated_data['password'] )
-            updated.save()
-        return updated  
+            password = validated_data.pop( 'password' )
+            instance.password = hash_password( password )
+            # Lets the password validators know about the change after save, like set_password() does
+            instance._password = password
+        return super().update( instance, validated_data )
         
 
-class TeamSerializer( serializers.ModelSerializer ):
-    members = UserSerializer( many=True, read_only=True )
+class TeamMemberSerializer( UserSerializer ):
+    """Serializes a TeamMembership as the member's user data plus the member's role in the team"""
+
+    def to_representation( self, membership ):
+        representation = super().to_representation( membership.member )
+        representation['role'] = membership.role
+        return representation
+
+
+class SharedTeamSerializer( InstrumentedSerializerMixin, serializers.ModelSerializer ):
+    """A team two users share: the other user's role and the requesting user's ( `my_role` )"""
+
+    id = serializers.IntegerField( source='team.id' )
+    name = serializers.CharField( source='team.name' )
+    my_role = serializers.CharField( source='shared_role' )
+
+    class Meta:
+        model = TeamMembership
+        fields = ( 'id', 'name', 'role', 'my_role' )
+
+
+class PurgeJobSerializer( serializers.ModelSerializer ):
+    class Meta:
+        model = PurgeJob
+        fields = ( 'id', 'model', 'object_id', 'status', 'deleted_rows', 'error', 'created', 'started', 'finished' )
+
+
+class DynamicFieldsModelSerializer( InstrumentedSerializerMixin, serializers.ModelSerializer ):
+    """A ModelSerializer taking an optional `fields` argument that restricts which fields are serialized"""
+
+    def __init__( self, *args, **kwargs ):
+        fields = kwargs.pop( 'fields', None )
+        super().__init__( *args, **kwargs )
+
+        if fields is not None:
+            for field_name in set( self.fields ) - set( fields ):
+                self.fields.pop( field_name )
+
+
+class TeamSerializer( DynamicFieldsModelSerializer ):
+    # Reads the memberships rather than the users so the role comes along without extra queries
+    # when the teams were loaded with `Team.objects.with_members()`.
+    members = TeamMemberSerializer( source='teammembership_set', many=True, read_only=True )
+    captain = serializers.CharField( source='captain.username', read_only=True, allow_null=True )
 
     class Meta:
         model = Team
-        fields = ( 'id', 'name', 'members', 'created' )
+        fields = ( 'id', 'name', 'captain', 'member_count', 'first_mate_count', 'change_sequence', 'members', 'created' )
+        read_only_fields = ( 'member_count', 'first_mate_count', 'change_sequence' )
 
     def create( self, validated_data ):
         team = Team.objects.create_team( validated_data['name'], self.context['captain'] )
         team.slug = team.name.replace( ' ', '-' ).lower()
-        team.save()
+        # Only the slug, a full save would write back counters other requests may have changed
+        team.save( update_fields=[ 'slug' ] )
 
         if self.context.get( 'members' ):
-            members = validated_data['members']
-            for member in members:
-                team.members.add( User.objects.get( username = member ) )
+            Team.objects.add_members( team, { member: TeamMembership.Roles.MEMBER for member in validated_data['members'] } )
         
         return team
     
     def update( self, instance, validated_data ):
-        new_members = validated_data['new_members']
+        new_members = get_users_by_username( validated_data['new_members'] )
+        Team.objects.add_members( instance, { member: TeamMembership.Roles.MEMBER for member in new_members.values() } )
+        return instance
+
+
+# ========== READ ONLY ROW SERIALIZERS ==========
+# The same output as UserSerializer, TeamMemberSerializer and TeamSerializer, built from .values()
+# rows for the read endpoints. No model instances are created and the fields, columns and
+# conversions are worked out once per serializer instead of once per row by DRF's fields.
+
+
+class RowSerializer:
+    """
+    Read only serializer of .values() rows. `columns` are the values to select, `sources` maps a
+    field to its column when it isn't the field name, `converters` maps a field to the function
+    giving its representation from the column value.
+    With `skip_empty`, empty values are left out like UserSerializer does.
+    """
+
+    fields = ()
+    prefix = ''
+    sources = {}
+    converters = {}
+    skip_empty = False
+
+    def __init__( self, fields=None ):
+        self.fields = tuple( field for field in self.fields if fields is None or field in fields )
+        self.plan = tuple( ( field, self.sources.get( field, self.prefix + field ), self.converters.get( field ) ) for field in self.fields )
+        self.columns = tuple( column for _, column, _ in self.plan )
+
+    def to_representation( self, row ):
+        representation = {}
+        for field, column, convert in self.plan:
+            value = row[column]
+            if self.skip_empty and not value:
+                continue
+            representation[field] = value if convert is None or value is None else convert( value )
+        return representation
+
+    def many( self, rows ):
+        with timed( 'serialization' ):
+            return [ self.to_representation( row ) for row in rows ]
+
+
+class UserRowSerializer( RowSerializer ):
+    fields = ( 'id', 'username', 'first_name', 'last_name', 'email' )
+    converters = { 'id': str }
+    skip_empty = True
+
+
+class TeamMemberRowSerializer( UserRowSerializer ):
+    """Membership rows: the member's user data and the role. The membership `id` is selected for pagination"""
+
+    prefix = 'member__'
+
+    def __init__( self, fields=None ):
+        super().__init__( fields )
+        self.columns = ( 'id', 'team_id', 'role', *self.columns )
+
+    def to_representation( self, row ):
+        representation = super().to_representation( row )
+        representation['role'] = row['role']
+        return representation
+
+
+class TeamRowSerializer( RowSerializer ):
+    """
+    Team rows. The members are given to many() along with their `members_next` links, both by
+    team id as accounts.views.get_workspace_members() returns them.
+    """
+
+    fields = ( 'id', 'name', 'captain', 'member_count', 'first_mate_count', 'change_sequence', 'members', 'members_next', 'created' )
+    sources = { 'captain': 'captain__username' }
+    converters = { 'created': serializers.DateTimeField().to_representation }
+
+    def __init__( self, fields=None ):
+        if fields is not None and 'members' in fields:
+            fields = ( *fields, 'members_next' )
+        super().__init__( fields )
+        # id and created are always selected, TeamPagination's cursor is made of them. slug for the members_next links
+        self.columns = tuple( dict.fromkeys( ( 'id', 'created', 'slug', *( column for column in self.columns if column not in ( 'members', 'members_next' ) ) ) ) )
+
+    def many( self, rows, members=None, members_next=None ):
+        members, members_next = members or {}, members_next or {}
+        with timed( 'serialization' ):
+            return [
+                self.to_representation( { **row, 'members': members.get( row['id'], [] ), 'members_next': members_next.get( row['id'] ) } )
+                for row in rows
+            ]
+
+
+class MembershipChangeRowSerializer( RowSerializer ):
+    """Entries of a team's membership change log, see accounts.changes"""
+
+    fields = ( 'sequence', 'kind', 'member', 'username', 'role', 'created' )
+    sources = { 'member': 'member_id' }
+    converters = { 'member': str, 'created': serializers.DateTimeField().to_representation }
+
+
+class MemberEntrySerializer( serializers.Serializer ):
+    """A member to add, given either as a plain username or as {"username", "role"}"""
+
+    username = serializers.CharField()
+    role = serializers.ChoiceField(
+        choices=( TeamMembership.Roles.FIRST_MATE, TeamMembership.Roles.MEMBER ),
+        default=TeamMembership.Roles.MEMBER
+    )
+
+    def to_internal_value( self, data ):
+        if isinstance( data, str ):
+            data = { 'username': data }
+        return super().to_internal_value( data )
+
+
+class BulkMembersSerializer( serializers.Serializer ):
+    """
+    Validates a batch of members and resolves all usernames with a single query.
+    Validated `members` maps each user to its role.
+    """
+
+    members = MemberEntrySerializer( many=True, allow_empty=False )
+
+    def validate_members( self, entries ):
+        roles = { entry['username']: entry['role'] for entry in entries }
+        users = get_users_by_username( roles )
+        return { user: roles[username] for username, user in users.items() }
+
+
+class BulkRemoveMembersSerializer( serializers.Serializer ):
+    """Validates a batch of usernames and resolves them with a single query. Validated `members` maps usernames to users"""
+
+    members = serializers.ListField( child=serializers.CharField(), allow_empty=False )
+
+    def validate_members( self, usernames ):
+        return get_users_by_username( usernames )
+
 
-        for new_member in new_members:
-            instance.members.add( User.objects.get( username=new_member ) )
\ No newline at end of file
+def get_users_by_username( usernames ):
+    """
+    Fetch users by username with one query.
+    Raises a ValidationError listing every username that doesn't exist.
+    """
+    users = User.objects.in_bulk( list( usernames ), field_name='username' )
+    missing = [ username for username in usernames if username not in users ]
+    if missing:
+        raise serializers.ValidationError( { 'missing': missing } )
+    return users
\ No newline at end of file
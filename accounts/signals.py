@@ -0,0 +1,174 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models import F
+from .authentication import invalidate_cached_user, invalidate_cached_users
+from .changes import record_changes, record_memberships
+from .models import MembershipChange, Team, TeamMembership, memberships_changed
+from .team_cache import invalidate_teams
+
+User = get_user_model()
+
+
+@receiver( post_save, sender=User )
+@receiver( post_delete, sender=User )
+def drop_cached_user( sender, instance, **kwargs ):
+    invalidate_cached_user( instance.pk )
+
+
+# ========== CACHED TEAMS ==========
+# There is deliberately no post_delete receiver on TeamMembership: it would stop Django from
+# deleting memberships in bulk. Membership deletes all come from the m2m manager, the bulk
+# TeamManager methods or a cascade from a team or user, which are handled below.
+
+
+@receiver( post_save, sender=Team )
+@receiver( post_delete, sender=Team )
+def drop_cached_team( sender, instance, **kwargs ):
+    invalidate_teams( [ instance.pk ] )
+
+
+@receiver( post_save, sender=TeamMembership )
+def drop_cached_membership_team( sender, instance, **kwargs ):
+    invalidate_teams( [ instance.team_id ] )
+
+
+@receiver( m2m_changed, sender=Team.members.through )
+def drop_cached_teams_on_members_change( sender, instance, action, reverse, pk_set, **kwargs ):
+    if action not in ( 'post_add', 'post_remove', 'post_clear' ):
+        return
+    if reverse:
+        # instance is a user, pk_set its teams ( None when cleared )
+        invalidate_teams( pk_set or [] )
+    else:
+        invalidate_teams( [ instance.pk ] )
+
+
+@receiver( memberships_changed, sender=Team )
+def drop_cached_team_on_bulk_change( sender, team, **kwargs ):
+    invalidate_teams( [ team.pk ] )
+
+
+@receiver( post_save, sender=User )
+@receiver( pre_delete, sender=User )
+def drop_cached_teams_of_user( sender, instance, **kwargs ):
+    # Member data is embedded in team representations. pre_delete: memberships are gone by post_delete
+    invalidate_teams( TeamMembership.objects.filter( member=instance.pk ).values_list( 'team_id', flat=True ) )
+
+
+# ========== TEAM COUNTERS ==========
+# The TeamManager methods keep the counters of the memberships they write, this covers
+# team.members and user.teams add(), remove() and clear(). Removals are counted before the
+# delete, in the same transaction.
+
+
+@receiver( m2m_changed, sender=Team.members.through )
+def count_members_on_members_change( sender, instance, action, reverse, pk_set, **kwargs ):
+    if action not in ( 'post_add', 'pre_remove', 'pre_clear' ):
+        return
+
+    if reverse:
+        memberships = TeamMembership.objects.filter( member=instance.pk )
+        if pk_set is not None:
+            memberships = memberships.filter( team__in=pk_set )
+    else:
+        memberships = TeamMembership.objects.filter( team=instance.pk )
+        if pk_set is not None:
+            memberships = memberships.filter( member__in=pk_set )
+
+    roles_by_team = {}
+    for team_id, role in memberships.active().values_list( 'team_id', 'role' ):
+        roles_by_team.setdefault( team_id, [] ).append( role )
+
+    for team_id, roles in roles_by_team.items():
+        team = team_id if reverse else instance
+        if action == 'post_add':
+            Team.objects.count_members( team, added=roles )
+        else:
+            Team.objects.count_members( team, removed=roles )
+
+
+# ========== TOKEN TEAM CLAIMS ==========
+# Any change to a user's memberships outdates the team roles in their access tokens ( see accounts.tokens )
+
+
+def bump_membership_versions( user_ids ):
+    user_ids = list( user_ids )
+    if not user_ids:
+        return
+    User._base_manager.filter( pk__in=user_ids ).update( membership_version=F( 'membership_version' ) + 1 )
+    # update() sends no post_save, the cached users would keep the old version.
+    # Dropped once committed, before that a request could cache the user again with the old version
+    transaction.on_commit( lambda: invalidate_cached_users( user_ids ) )
+
+
+@receiver( post_save, sender=TeamMembership )
+def bump_version_on_membership_save( sender, instance, **kwargs ):
+    bump_membership_versions( [ instance.member_id ] )
+
+
+@receiver( memberships_changed, sender=Team )
+def bump_versions_on_bulk_change( sender, team, members, **kwargs ):
+    bump_membership_versions( member.pk for member in members )
+
+
+@receiver( m2m_changed, sender=Team.members.through )
+def bump_versions_on_members_change( sender, instance, action, reverse, pk_set, **kwargs ):
+    if action not in ( 'post_add', 'pre_remove', 'pre_clear' ):
+        return
+    if reverse:
+        bump_membership_versions( [ instance.pk ] )
+    elif pk_set is not None:
+        bump_membership_versions( pk_set )
+    else:
+        bump_membership_versions( TeamMembership.objects.filter( team=instance.pk ).values_list( 'member_id', flat=True ) )
+
+
+# ========== MEMBERSHIP CHANGE LOGS ==========
+# Each added, removed or updated membership is appended to its team's log ( see accounts.changes ).
+# Removed memberships of the m2m managers are read before the delete, in the same transaction.
+
+CHANGE_KINDS = { 'post_add': MembershipChange.Kinds.ADDED, 'pre_remove': MembershipChange.Kinds.REMOVED, 'pre_clear': MembershipChange.Kinds.REMOVED }
+
+
+def membership_rows( memberships ):
+    return memberships.active().order_by( 'pk' ).values_list( 'team_id', 'member_id', 'member__username', 'role' )
+
+
+@receiver( post_save, sender=TeamMembership )
+def record_membership_save( sender, instance, created, update_fields=None, **kwargs ):
+    if created:
+        kind = MembershipChange.Kinds.ADDED
+    elif update_fields is None or 'role' in update_fields:
+        kind = MembershipChange.Kinds.ROLE
+    else:
+        return
+    record_changes( instance.team, kind, [ ( instance.member_id, instance.member.username, instance.role ) ] )
+
+
+@receiver( m2m_changed, sender=Team.members.through )
+def record_members_change( sender, instance, action, reverse, pk_set, **kwargs ):
+    kind = CHANGE_KINDS.get( action )
+    if kind is None:
+        return
+
+    if reverse:
+        memberships = TeamMembership.objects.filter( member=instance.pk )
+        if pk_set is not None:
+            memberships = memberships.filter( team__in=pk_set )
+        record_memberships( kind, membership_rows( memberships ) )
+    else:
+        memberships = TeamMembership.objects.filter( team=instance.pk )
+        if pk_set is not None:
+            memberships = memberships.filter( member__in=pk_set )
+        record_changes( instance, kind, [ row[1:] for row in membership_rows( memberships ) ] )
+
+
+@receiver( memberships_changed, sender=Team )
+def record_bulk_change( sender, team, members, action, **kwargs ):
+    if action == 'add':
+        rows = membership_rows( TeamMembership.objects.filter( team=team.pk, member__in=[ member.pk for member in members ] ) )
+        record_changes( team, MembershipChange.Kinds.ADDED, [ row[1:] for row in rows ] )
+    else:
+        record_changes( team, MembershipChange.Kinds.REMOVED, [ ( member.pk, member.username, '' ) for member in members ] )
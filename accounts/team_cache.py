@@ -0,0 +1,66 @@
+"""
+Cached TeamDetail.get representations.
+
+Every team has a version token in the cache and representations are stored under
+the token current when they were built. Invalidating a team replaces its token, which
+orphans every cached variant at once ( other fields, page sizes ).
+A request reads the token before the team and the token is replaced once the writing
+transaction commits, so a representation built from data older than a change always
+lands under a token that change orphans.
+"""
+
+import hashlib
+import json
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def team_cache():
+    return caches[settings.TEAM_CACHE_ALIAS]
+
+
+def _version_key( team_pk ):
+    return f'team-version:{team_pk}'
+
+
+def get_cached_team( team_pk, variant ):
+    """
+    Returns ( key, entry ) for a variant of a team's representation.
+    `entry` is a { 'data', 'etag' } dict, or None on a miss, in which case the
+    representation should be stored under `key` with cache_team().
+    """
+    cache = team_cache()
+    version = cache.get( _version_key( team_pk ) )
+    if version is None:
+        version = uuid.uuid4().hex
+        # Another request may have set it first, use whichever won
+        if not cache.add( _version_key( team_pk ), version, None ):
+            version = cache.get( _version_key( team_pk ), version )
+        return f'team:{team_pk}:{version}:{variant}', None
+
+    key = f'team:{team_pk}:{version}:{variant}'
+    return key, cache.get( key )
+
+
+def cache_team( key, data ):
+    """The { 'data', 'etag' } entry of `data`, stored under `key` unless it is None"""
+
+    entry = {
+        'data': data,
+        'etag': '"%s"' % hashlib.md5( json.dumps( data, cls=JSONEncoder, sort_keys=True ).encode() ).hexdigest(),
+    }
+    if key is not None:
+        team_cache().set( key, entry, settings.TEAM_CACHE_TIMEOUT )
+    return entry
+
+
+def invalidate_teams( team_pks ):
+    """Replace the tokens of the teams once the current transaction commits"""
+
+    team_pks = set( team_pks )
+    if team_pks:
+        # Replaced before the commit, a request could still cache the old data under the new token
+        transaction.on_commit( lambda: team_cache().set_many( { _version_key( team_pk ): uuid.uuid4().hex for team_pk in team_pks }, None ) )
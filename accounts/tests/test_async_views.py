@@ -0,0 +1,70 @@
+from rest_framework import status
+from django.urls import reverse
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import Team
+from accounts.authentication import user_cache
+
+User = get_user_model()
+
+class AsyncViewsTest( TestCase ):
+    def setUp( self ):
+        user_cache().clear()
+        self.luffy = User.objects.create_user( username='luffy', first_name='Monkey', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', first_name='Roronoa', password='123' )
+        self.blackbeard = User.objects.create_user( username='blackbeard', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.team.members.add( self.zoro )
+
+    def auth( self, user ):
+        return { 'Authorization': f'Bearer {AccessToken.for_user( user )}' }
+
+    async def test_unauthenticated_user_denied( self ):
+        response = await self.async_client.get( reverse( 'async_workspace' ) )
+        self.assertEqual( status.HTTP_401_UNAUTHORIZED, response.status_code )
+
+    async def test_user_detail( self ):
+        response = await self.async_client.get( reverse( 'async_user_detail', args=[ 'zoro' ] ), headers=self.auth( self.luffy ) )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( 'Roronoa', response.json()['first_name'] )
+
+        response = await self.async_client.get( reverse( 'async_user_detail', args=[ 'zoro' ] ), headers=self.auth( self.blackbeard ) )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+    async def test_user_edit( self ):
+        response = await self.async_client.put(
+            reverse( 'async_user_detail', args=[ 'luffy' ] ), data={ 'first_name': 'Monki' }, content_type='application/json', headers=self.auth( self.luffy )
+        )
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+        self.assertEqual( 'Monki', ( await User.objects.aget( username='luffy' ) ).first_name )
+
+    async def test_workspace( self ):
+        response = await self.async_client.get( reverse( 'async_workspace' ), headers=self.auth( self.zoro ) )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( [ 'Straw Hat Pirates' ], [ team['name'] for team in response.json()['results'] ] )
+        self.assertEqual( [ 'luffy', 'zoro' ], [ member['username'] for member in response.json()['results'][0]['members'] ] )
+        self.assertIsNone( response.json()['results'][0]['members_next'] )
+
+    async def test_team_detail( self ):
+        url = reverse( 'async_team_detail', args=( self.team.pk, 'straw-hat-pirates' ) )
+
+        response = await self.async_client.get( url, headers=self.auth( self.zoro ) )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( [ ( 'luffy', 'C' ), ( 'zoro', 'M' ) ], [ ( member['username'], member['role'] ) for member in response.json()['members'] ] )
+
+        response = await self.async_client.get( url, headers=self.auth( self.blackbeard ) )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+        response = await self.async_client.get( reverse( 'async_team_detail', args=( 99, 'none' ) ), headers=self.auth( self.luffy ) )
+        self.assertEqual( status.HTTP_404_NOT_FOUND, response.status_code )
+
+    async def test_team_writes( self ):
+        url = reverse( 'async_team_detail', args=( self.team.pk, 'straw-hat-pirates' ) )
+
+        response = await self.async_client.delete( url, headers=self.auth( self.zoro ) )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+        response = await self.async_client.post( url, data={ 'username': 'blackbeard' }, content_type='application/json', headers=self.auth( self.luffy ) )
+        self.assertEqual( status.HTTP_201_CREATED, response.status_code )
+        self.assertTrue( await self.team.members.filter( username='blackbeard' ).aexists() )
@@ -0,0 +1,47 @@
+from rest_framework import status
+from django.urls import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.authentication import user_cache
+
+User = get_user_model()
+
+class CachedJWTAuthenticationTest( TestCase ):
+    def setUp( self ):
+        user_cache().clear()
+        self.user = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', first_name='Monkey', password='123' )
+        self.user.credentials( HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user( self.luffy )}' )
+        self.url = reverse( 'user_detail', args=[ 'luffy' ] )
+
+    def get_user_detail( self ):
+        with CaptureQueriesContext( connection ) as queries:
+            response = self.user.get( self.url )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        return response, len( queries )
+
+    def test_user_served_from_cache( self ):
+        _, first = self.get_user_detail()
+        _, second = self.get_user_detail()
+        self.assertEqual( first - 1, second )
+
+    def test_cache_invalidated_on_update( self ):
+        self.get_user_detail()
+
+        response = self.user.put( self.url, data={ 'first_name': 'Monki' }, format='json' )
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+
+        _, queries = self.get_user_detail()
+        _, cached_queries = self.get_user_detail()
+        self.assertEqual( queries - 1, cached_queries )
+
+    def test_deleted_user_denied( self ):
+        self.get_user_detail()
+        self.luffy.delete()
+
+        response = self.user.get( self.url )
+        self.assertEqual( status.HTTP_401_UNAUTHORIZED, response.status_code )
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.authentication import user_cache
+from accounts.models import MembershipChange, Team, TeamMembership
+from accounts.purge import soft_delete
+
+User = get_user_model()
+
+
+class MembershipChangeLogTest( TestCase ):
+    def setUp( self ):
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.nami = User.objects.create_user( username='nami', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+
+    def log( self ):
+        return list( MembershipChange.objects.filter( team=self.team ).order_by( 'sequence' ).values_list( 'sequence', 'kind', 'username', 'role' ) )
+
+    def test_changes_recorded_in_sequence( self ):
+        self.team.members.add( self.zoro )
+        Team.objects.add_members( self.team, { self.nami: TeamMembership.Roles.FIRST_MATE } )
+        membership = TeamMembership.objects.get( team=self.team, member=self.nami )
+        membership.role = TeamMembership.Roles.MEMBER
+        membership.save()
+        Team.objects.remove_members( self.team, [ self.nami ] )
+        self.team.members.remove( self.zoro )
+
+        self.assertEqual( [
+            ( 1, 'added', 'luffy', 'C' ),
+            ( 2, 'added', 'zoro', 'M' ),
+            ( 3, 'added', 'nami', 'FM' ),
+            ( 4, 'role', 'nami', 'M' ),
+            ( 5, 'removed', 'nami', '' ),
+            ( 6, 'removed', 'zoro', '' ),
+        ], self.log() )
+        self.assertEqual( 6, self.team.change_sequence )
+        self.team.refresh_from_db()
+        self.assertEqual( 6, self.team.change_sequence )
+
+    def test_deleted_user_removed( self ):
+        self.team.members.add( self.zoro )
+        soft_delete( self.zoro )
+
+        self.assertEqual( ( 3, 'removed', 'zoro', '' ), self.log()[-1] )
+
+
+@override_settings( CHANGES_POLL_INTERVAL=0.01, CHANGES_STREAM_TIMEOUT=1 )
+class AsyncTeamChangesTest( TestCase ):
+    def setUp( self ):
+        user_cache().clear()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.blackbeard = User.objects.create_user( username='blackbeard', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.team.members.add( self.zoro )
+        self.url = reverse( 'async_team_changes', args=[self.team.pk, 'straw-hat-pirates'] )
+
+    def auth( self, user, **headers ):
+        return { 'Authorization': f'Bearer {AccessToken.for_user( user )}', **headers }
+
+    async def test_long_poll( self ):
+        response = await self.async_client.get( self.url, { 'since': 1 }, headers=self.auth( self.zoro ) )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( 2, response.json()['next'] )
+        self.assertEqual( [ ( 2, 'added', 'zoro', 'M' ) ], [ ( change['sequence'], change['kind'], change['username'], change['role'] ) for change in response.json()['changes'] ] )
+        self.assertEqual( str( self.zoro.pk ), response.json()['changes'][0]['member'] )
+
+        # Nothing new within the timeout
+        response = await self.async_client.get( self.url, { 'since': 2, 'timeout': 0.05 }, headers=self.auth( self.zoro ) )
+        self.assertEqual( { 'changes': [], 'next': 2 }, response.json() )
+
+    async def test_outsiders_and_bad_cursors_rejected( self ):
+        response = await self.async_client.get( self.url, headers=self.auth( self.blackbeard ) )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+        response = await self.async_client.get( self.url, { 'since': 'latest' }, headers=self.auth( self.zoro ) )
+        self.assertEqual( status.HTTP_400_BAD_REQUEST, response.status_code )
+
+    async def test_server_sent_events( self ):
+        response = await self.async_client.get( self.url, headers=self.auth( self.zoro, Accept='text/event-stream', **{ 'Last-Event-ID': '1' } ) )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( 'text/event-stream', response['Content-Type'] )
+
+        await self.team.members.aremove( self.zoro )
+        events = b''.join( [ chunk async for chunk in response.streaming_content ] ).decode()
+
+        # Ends once zoro has left the team
+        self.assertEqual( [ 'id: 2', 'id: 3' ], [ line for line in events.splitlines() if line.startswith( 'id:' ) ] )
+        self.assertIn( '"kind":"removed"', events.replace( ' ', '' ) )
@@ -0,0 +1,46 @@
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from rest_framework import status
+from rest_framework.test import APIClient
+from accounts.hashing import hash_password, hash_passwords
+
+User = get_user_model()
+
+class PasswordWriteTest( TestCase ):
+    def setUp( self ):
+        self.user = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+
+    def test_password_change_single_update( self ):
+        self.user.force_authenticate( user=self.luffy )
+
+        with CaptureQueriesContext( connection ) as queries:
+            response = self.user.post( reverse( 'user_detail', args=[ 'luffy' ] ), data={ 'password': 'gomu gomu' }, format='json' )
+
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+        self.assertEqual( 1, len( [ query for query in queries if query['sql'].startswith( 'UPDATE' ) ] ) )
+        self.assertTrue( User.objects.get( pk=self.luffy.pk ).check_password( 'gomu gomu' ) )
+
+    def test_create_user_single_insert( self ):
+        with CaptureQueriesContext( connection ) as queries:
+            response = self.user.post( reverse( 'create_user' ), data={ 'username': 'zoro', 'password': 'santoryu' }, format='json' )
+
+        self.assertEqual( status.HTTP_201_CREATED, response.status_code )
+        self.assertEqual( [ 'INSERT' ], [ query['sql'].split()[0] for query in queries if not query['sql'].startswith( 'SELECT' ) ] )
+        self.assertTrue( User.objects.get( username='zoro' ).check_password( 'santoryu' ) )
+
+    @override_settings( PASSWORD_HASHING_WORKERS=1 )
+    def test_hash_in_process_pool( self ):
+        hashed = hash_password( 'gomu gomu' )
+        self.assertTrue( check_password( 'gomu gomu', hashed ) )
+        self.assertFalse( check_password( 'gomu', hashed ) )
+
+    def test_hash_batch_in_process_pool( self ):
+        hashed = hash_passwords( [ 'gomu gomu', 'santoryu' ], workers=2 )
+        self.assertTrue( check_password( 'gomu gomu', hashed[0] ) )
+        self.assertTrue( check_password( 'santoryu', hashed[1] ) )
+        self.assertNotEqual( hashed[0], hashed[1] )
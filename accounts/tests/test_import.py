@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+from accounts.models import Team, TeamMembership
+
+User = get_user_model()
+
+
+class ImportAccountsTest( TestCase ):
+    def setUp( self ):
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup( self.directory.cleanup )
+
+    def write( self, name, content ):
+        path = os.path.join( self.directory.name, name )
+        with open( path, 'w' ) as file:
+            file.write( content )
+        return path
+
+    def run_import( self, path, *args ):
+        stdout, stderr = StringIO(), StringIO()
+        call_command( 'import_accounts', path, '--workers', '0', *args, stdout=stdout, stderr=stderr )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_import( self ):
+        path = self.write( 'crew.csv', (
+            'username,email,password,password_hash,team,role\n'
+            f'zoro,zoro@example.com,santoryu,,{self.team.pk},FM\n'
+            f'nami,,,{make_password( "clima tact" )},{self.team.pk},\n'
+            'usopp,,,,,\n'
+        ) )
+
+        _, errors = self.run_import( path, '--batch-size', '2' )
+
+        self.assertEqual( '', errors )
+        self.assertTrue( User.objects.get( username='zoro' ).check_password( 'santoryu' ) )
+        self.assertTrue( User.objects.get( username='nami' ).check_password( 'clima tact' ) )
+        self.assertFalse( User.objects.get( username='usopp' ).has_usable_password() )
+        self.assertEqual(
+            { 'luffy': 'C', 'zoro': 'FM', 'nami': 'M' },
+            dict( self.team.teammembership_set.values_list( 'member__username', 'role' ) ),
+        )
+        self.team.refresh_from_db()
+        self.assertEqual( ( 3, 1 ), ( self.team.member_count, self.team.first_mate_count ) )
+        self.assertFalse( os.path.exists( f'{path}.checkpoint' ) )
+
+    def test_invalid_rows_skipped( self ):
+        path = self.write( 'crew.jsonl', '\n'.join( [
+            json.dumps( { 'username': 'zoro', 'team': self.team.pk } ),
+            json.dumps( { 'username': 'bad name!', 'team': self.team.pk } ),
+            json.dumps( { 'username': 'nami', 'team': self.team.pk, 'role': 'C' } ),
+            json.dumps( { 'username': 'usopp', 'team': 0 } ),
+            json.dumps( { 'username': 'sanji', 'password_hash': 'plain' } ),
+            '{ not json',
+        ] ) )
+
+        _, errors = self.run_import( path )
+
+        self.assertEqual( [ 'row 2', 'row 3', 'row 4', 'row 5', 'row 6' ], [ line.split( ':' )[0] for line in errors.splitlines() ] )
+        self.assertEqual( [ 'luffy', 'zoro' ], sorted( User.objects.values_list( 'username', flat=True ) ) )
+
+    def test_existing_users_added_to_team( self ):
+        path = self.write( 'crew.csv', f'username,password,team\nluffy,changed,{self.team.pk}\nzoro,santoryu,{self.team.pk}\n' )
+
+        output, _ = self.run_import( path )
+        self.run_import( path )
+
+        self.assertIn( '1 users and 1 memberships created', output )
+        self.assertTrue( User.objects.get( username='luffy' ).check_password( '123' ) )
+        self.assertEqual( 'C', TeamMembership.objects.get( team=self.team, member=self.luffy ).role )
+        self.assertEqual( 2, self.team.teammembership_set.count() )
+
+    def test_resume_from_checkpoint( self ):
+        path = self.write( 'crew.csv', 'username\nzoro\nnami\nusopp\n' )
+        with open( f'{path}.checkpoint', 'w' ) as file:
+            json.dump( { 'rows': 2 }, file )
+
+        output, _ = self.run_import( path )
+
+        self.assertIn( 'Resuming after row 2', output )
+        self.assertEqual( [ 'luffy', 'usopp' ], sorted( User.objects.values_list( 'username', flat=True ) ) )
@@ -0,0 +1,113 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from accounts.models import Team, TeamMembership
+from accounts.permissions import IsInCommonTeam
+from accounts.views import TeamDetail
+
+User = get_user_model()
+
+class TeamRoleResolverTest( TestCase ):
+    def setUp( self ):
+        self.factory = APIRequestFactory()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.blackbeard = User.objects.create_user( username='blackbeard', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.team.members.add( self.zoro )
+
+    def get_view( self, method, user ):
+        request = Request( getattr( self.factory, method )( '/' ) )
+        request.user = user
+        view = TeamDetail()
+        view.request = request
+        view.kwargs = { 'pk': self.team.pk }
+        return view
+
+    def test_single_query_for_combined_permissions( self ):
+        """Ensure IsInTeam and IsCaptain|IsFirstMate share one membership query"""
+
+        view = self.get_view( 'post', self.luffy )
+        with self.assertNumQueries( 1 ):
+            view.check_object_permissions( view.request, self.team )
+            view.check_object_permissions( view.request, self.team )
+
+    def test_single_query_on_denied_permission( self ):
+        view = self.get_view( 'post', self.zoro )
+        with self.assertNumQueries( 1 ):
+            for permission in view.get_permissions():
+                permission.has_object_permission( view.request, view, self.team )
+
+    def test_non_member_has_no_role( self ):
+        view = self.get_view( 'get', self.blackbeard )
+        with self.assertNumQueries( 1 ):
+            self.assertFalse( all(
+                permission.has_object_permission( view.request, view, self.team )
+                for permission in view.get_permissions()
+            ) )
+
+
+class TenantScopedQuerySetTest( TestCase ):
+    def setUp( self ):
+        self.client = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.ace = User.objects.create_user( username='ace', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.team.members.add( self.zoro )
+        self.other_team = Team.objects.create_team( team_name='Whitebeard Pirates', captain=self.ace )
+
+    def test_for_user_scopes_teams_and_annotates_role( self ):
+        with self.assertNumQueries( 1 ):
+            teams = { team.name: team.role for team in Team.objects.for_user( self.zoro.id ) }
+        self.assertEqual( { 'Straw Hat Pirates': TeamMembership.Roles.MEMBER }, teams )
+
+    def test_with_role_keeps_teams_of_others( self ):
+        team = Team.objects.with_role( self.ace.id ).get( pk=self.team.pk )
+        self.assertIsNone( team.role )
+
+    def test_fetch_and_authorize_in_one_query( self ):
+        """Ensure a denied request costs a single query, and a missing team is 404 rather than 403"""
+
+        self.client.force_authenticate( user=self.ace )
+        url = reverse( 'team_members', args=[self.team.pk, 'straw-hat-pirates'] )
+
+        with self.assertNumQueries( 1 ):
+            response = self.client.post( url, { 'members': [ 'ace' ] }, format='json' )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+        missing = reverse( 'team_members', args=[self.other_team.pk + 100, 'nowhere'] )
+        self.assertEqual( status.HTTP_404_NOT_FOUND, self.client.post( missing, { 'members': [ 'ace' ] }, format='json' ).status_code )
+
+
+class IsInCommonTeamTest( TestCase ):
+    def setUp( self ):
+        self.factory = APIRequestFactory()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.ace = User.objects.create_user( username='ace', password='123' )
+        team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        team.members.add( self.zoro )
+        for number in range( 5 ):
+            Team.objects.create_team( team_name=f'Fleet {number}', captain=self.ace )
+
+    def has_permission( self, user, obj ):
+        request = Request( self.factory.get( '/' ) )
+        request.user = user
+        return IsInCommonTeam().has_object_permission( request, None, obj )
+
+    def test_single_query( self ):
+        with self.assertNumQueries( 1 ):
+            self.assertTrue( self.has_permission( self.zoro, self.luffy ) )
+        with self.assertNumQueries( 1 ):
+            self.assertFalse( self.has_permission( self.ace, self.luffy ) )
+
+    def test_shared_with_roles( self ):
+        memberships = TeamMembership.objects.filter( member=self.luffy ).shared_with( self.zoro.id )
+        self.assertEqual(
+            [ ( 'Straw Hat Pirates', TeamMembership.Roles.CAPTAIN, TeamMembership.Roles.MEMBER ) ],
+            [ ( membership.team.name, membership.role, membership.shared_role ) for membership in memberships ]
+        )
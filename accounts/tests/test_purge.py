@@ -0,0 +1,118 @@
+import datetime
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from accounts.models import PurgeJob, Team, TeamMembership
+from accounts.purge import soft_delete
+from tasks.models import Task
+
+User = get_user_model()
+
+
+@override_settings( PURGE_INLINE=True, PURGE_BATCH_SIZE=2 )
+class PurgeTest( TestCase ):
+    def setUp( self ):
+        self.client = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        crew = [ User.objects.create_user( username=f'pirate{number}', password='123' ) for number in range( 5 ) ]
+        Team.objects.add_members( self.team, { user: TeamMembership.Roles.MEMBER for user in [ self.zoro, *crew ] } )
+        self.other_team = Team.objects.create_team( team_name='Whitebeard Pirates', captain=self.zoro )
+
+        zoro_membership = TeamMembership.objects.get( team=self.team, member=self.zoro )
+        for number in range( 3 ):
+            Task.objects.create( team=self.team, title=f'task {number}', due_date=datetime.date.today(), assignee=zoro_membership )
+        self.team_url = reverse( 'team_detail', args=[self.team.pk, 'straw-hat-pirates'] )
+
+    def test_team_purged_in_batches( self ):
+        self.client.force_authenticate( user=self.luffy )
+
+        with self.captureOnCommitCallbacks( execute=True ):
+            response = self.client.delete( self.team_url )
+
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+        job = PurgeJob.objects.get()
+        self.assertEqual( reverse( 'purge_job', args=[job.pk] ), response['Location'] )
+        self.assertEqual( PurgeJob.Status.DONE, job.status )
+        # 7 memberships and their 7 change log entries, 3 tasks and the team
+        self.assertEqual( 18, job.deleted_rows )
+        self.assertFalse( Team._base_manager.filter( pk=self.team.pk ).exists() )
+        self.assertFalse( TeamMembership.objects.filter( team=self.team.pk ).exists() )
+        self.assertFalse( Task.objects.filter( team=self.team.pk ).exists() )
+        self.assertTrue( Team.objects.filter( pk=self.other_team.pk ).exists() )
+
+        progress = self.client.get( response['Location'] )
+        self.assertEqual( status.HTTP_200_OK, progress.status_code )
+        self.assertEqual( ( 'D', 18 ), ( progress.data['status'], progress.data['deleted_rows'] ) )
+
+    def test_deleted_team_hidden_before_purge( self ):
+        self.client.force_authenticate( user=self.luffy )
+
+        # Without executing the on_commit callbacks, the purge never runs
+        response = self.client.delete( self.team_url )
+
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+        self.assertEqual( PurgeJob.Status.PENDING, PurgeJob.objects.get().status )
+        self.assertTrue( TeamMembership.objects.filter( team=self.team.pk ).exists() )
+        self.assertEqual( status.HTTP_404_NOT_FOUND, self.client.get( self.team_url ).status_code )
+        self.assertEqual( [], self.client.get( reverse( 'workspace' ) ).data['results'] )
+
+        self.client.force_authenticate( user=self.zoro )
+        self.assertEqual( [], self.client.get( reverse( 'my_tasks' ) ).data['results'] )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, self.client.get( reverse( 'user_detail', args=['luffy'] ) ).status_code )
+
+    def test_user_purged( self ):
+        self.client.force_authenticate( user=self.zoro )
+
+        with self.captureOnCommitCallbacks( execute=True ):
+            response = self.client.delete( reverse( 'user_detail', args=['zoro'] ) )
+
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+        self.assertFalse( User._base_manager.filter( pk=self.zoro.pk ).exists() )
+        self.assertFalse( TeamMembership.objects.filter( member=self.zoro.pk ).exists() )
+        # Tasks stay with the team, unassigned
+        self.assertEqual( 3, Task.objects.filter( team=self.team, assignee=None ).count() )
+        self.assertEqual( PurgeJob.Status.DONE, PurgeJob.objects.get().status )
+
+    def test_deleted_user_hidden_before_purge( self ):
+        soft_delete( self.zoro, requested_by=self.zoro )
+
+        self.assertFalse( User.objects.filter( username='zoro' ).exists() )
+        self.client.force_authenticate( user=self.luffy )
+        response = self.client.get( reverse( 'team_members', args=[self.team.pk, 'straw-hat-pirates'] ) )
+        self.assertNotIn( 'zoro', [ member['username'] for member in response.data['results'] ] )
+        self.assertEqual( status.HTTP_404_NOT_FOUND, self.client.get( reverse( 'user_detail', args=['zoro'] ) ).status_code )
+
+    def test_progress_only_for_requester( self ):
+        job = soft_delete( self.other_team, requested_by=self.zoro )
+
+        self.client.force_authenticate( user=self.luffy )
+        self.assertEqual( status.HTTP_404_NOT_FOUND, self.client.get( reverse( 'purge_job', args=[job.pk] ) ).status_code )
+
+    def test_command_resumes_unfinished_jobs( self ):
+        job = soft_delete( self.team, requested_by=self.luffy )
+        PurgeJob.objects.filter( pk=job.pk ).update( status=PurgeJob.Status.RUNNING )
+
+        output = StringIO()
+        call_command( 'purge', stdout=output )
+
+        self.assertIn( 'accounts.team', output.getvalue() )
+        self.assertEqual( PurgeJob.Status.DONE, PurgeJob.objects.get( pk=job.pk ).status )
+        self.assertFalse( Team._base_manager.filter( pk=self.team.pk ).exists() )
+
+    def test_deleted_username_taken_until_purged( self ):
+        soft_delete( self.zoro, requested_by=self.zoro )
+
+        response = self.client.post( reverse( 'create_user' ), data={ 'username': 'zoro', 'password': 'santoryu' }, format='json' )
+        self.assertEqual( status.HTTP_400_BAD_REQUEST, response.status_code )
+        self.assertIn( 'username', response.data )
+
+        self.client.force_authenticate( user=self.luffy )
+        response = self.client.put( reverse( 'user_detail', args=['luffy'] ), data={ 'username': 'zoro' }, format='json' )
+        self.assertEqual( status.HTTP_400_BAD_REQUEST, response.status_code )
+        self.assertIn( 'username', response.data )
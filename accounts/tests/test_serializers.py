@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from accounts.models import Team, TeamMembership
+from accounts.serializers import TeamSerializer, TeamMemberSerializer, TeamRowSerializer, TeamMemberRowSerializer
+from accounts.views import get_members_rows, get_workspace_members
+
+User = get_user_model()
+
+
+class RowSerializerTest( TestCase ):
+    def setUp( self ):
+        self.luffy = User.objects.create_user( username='luffy', password='123', first_name='Monkey D.', email='luffy@example.com' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        Team.objects.add_members( self.team, { self.zoro: TeamMembership.Roles.FIRST_MATE } )
+
+    def test_same_output_as_model_serializers( self ):
+        member_serializer = TeamMemberRowSerializer()
+        rows = get_members_rows( [ self.team.pk ], member_serializer )
+        members, members_next = get_workspace_members( RequestFactory().get( '/' ), Team.objects.filter( pk=self.team.pk ).values( 'id', 'slug' ), rows, member_serializer )
+
+        for fields in ( None, [ 'id', 'name' ], [ 'members', 'created' ] ):
+            serializer = TeamRowSerializer( fields )
+            teams = serializer.many( Team.objects.filter( pk=self.team.pk ).values( *serializer.columns ), members, members_next )
+            expected = TeamSerializer( Team.objects.with_members().filter( pk=self.team.pk ), many=True, fields=fields ).data
+            # Members come with their members_next link, as from TeamDetail.get
+            expected = [ { **team, 'members_next': None } if 'members' in team else dict( team ) for team in expected ]
+            self.assertEqual( expected, teams )
+
+        memberships = self.team.teammembership_set.select_related( 'member' ).order_by( 'pk' )
+        self.assertEqual( TeamMemberSerializer( memberships, many=True ).data, member_serializer.many( rows ) )
@@ -0,0 +1,107 @@
+from rest_framework import status
+from django.urls import reverse
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from accounts.models import Team
+from accounts.team_cache import team_cache
+
+User = get_user_model()
+
+class TeamDetailCacheTest( TestCase ):
+    def setUp( self ):
+        self.user = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', first_name='Roronoa', password='123' )
+        self.sanji = User.objects.create_user( username='sanji', password='123' )
+        self.blackbeard = User.objects.create_user( username='blackbeard', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.team.members.add( self.zoro )
+        self.url = reverse( 'team_detail', args=( self.team.pk, 'straw-hat-pirates' ) )
+        self.user.force_authenticate( user=self.luffy )
+
+    def usernames( self ):
+        return [ member['username'] for member in self.user.get( self.url ).data['members'] ]
+
+    def test_cached_read_only_checks_membership( self ):
+        first = self.user.get( self.url )
+
+        with self.assertNumQueries( 1 ):
+            second = self.user.get( self.url )
+        self.assertEqual( first.data, second.data )
+        self.assertEqual( first['ETag'], second['ETag'] )
+
+    def test_not_modified( self ):
+        etag = self.user.get( self.url )['ETag']
+
+        with self.assertNumQueries( 1 ):
+            response = self.user.get( self.url, HTTP_IF_NONE_MATCH=etag )
+        self.assertEqual( status.HTTP_304_NOT_MODIFIED, response.status_code )
+        self.assertEqual( etag, response['ETag'] )
+
+    def test_cached_team_still_forbidden( self ):
+        self.user.get( self.url )
+
+        self.user.force_authenticate( user=self.blackbeard )
+        response = self.user.get( self.url )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+    def test_invalidated_on_member_add_and_remove( self ):
+        etag = self.user.get( self.url )['ETag']
+
+        with self.captureOnCommitCallbacks( execute=True ):
+            self.user.post( self.url, data={ 'username': 'sanji' } )
+        self.assertEqual( [ 'luffy', 'zoro', 'sanji' ], self.usernames() )
+        self.assertEqual( status.HTTP_200_OK, self.user.get( self.url, HTTP_IF_NONE_MATCH=etag ).status_code )
+
+        with self.captureOnCommitCallbacks( execute=True ):
+            self.user.patch( self.url, data={ 'username': 'zoro' } )
+        self.assertEqual( [ 'luffy', 'sanji' ], self.usernames() )
+
+    def test_invalidated_on_bulk_change( self ):
+        self.usernames()
+
+        members_url = reverse( 'team_members', args=( self.team.pk, 'straw-hat-pirates' ) )
+        with self.captureOnCommitCallbacks( execute=True ):
+            self.user.post( members_url, data={ 'members': [ 'sanji' ] }, format='json' )
+        self.assertEqual( [ 'luffy', 'zoro', 'sanji' ], self.usernames() )
+
+        with self.captureOnCommitCallbacks( execute=True ):
+            self.user.delete( members_url, data={ 'members': [ 'sanji', 'zoro' ] }, format='json' )
+        self.assertEqual( [ 'luffy' ], self.usernames() )
+
+    def test_invalidated_on_member_update( self ):
+        self.usernames()
+
+        self.zoro.first_name = 'Zoro'
+        with self.captureOnCommitCallbacks( execute=True ):
+            self.zoro.save()
+        response = self.user.get( self.url )
+        self.assertEqual( 'Zoro', response.data['members'][1]['first_name'] )
+
+        with self.captureOnCommitCallbacks( execute=True ):
+            self.zoro.delete()
+        self.assertEqual( [ 'luffy' ], self.usernames() )
+
+    def test_invalidated_on_team_update( self ):
+        self.user.get( self.url )
+
+        self.team.name = 'Straw Hat Grand Fleet'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.team.save()
+        # Not before the change commits, a request could cache the old team under the new token
+        self.assertEqual( 'Straw Hat Pirates', self.user.get( self.url ).data['name'] )
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual( 'Straw Hat Grand Fleet', self.user.get( self.url ).data['name'] )
+
+    def test_later_pages_not_cached( self ):
+        cursor = self.user.get( self.url, { 'limit': 1 } ).data['members_next'].split( 'cursor=' )[1]
+        team_cache().clear()
+
+        response = self.user.get( self.url, { 'limit': 1, 'cursor': cursor } )
+        self.assertEqual( [ 'zoro' ], [ member['username'] for member in response.data['members'] ] )
+        # The first page is built again, captain included
+        response = self.user.get( self.url, { 'limit': 1 } )
+        self.assertEqual( [ 'luffy' ], [ member['username'] for member in response.data['members'] ] )
@@ -0,0 +1,91 @@
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import Team
+from accounts.purge import soft_delete
+
+User = get_user_model()
+
+
+class TeamCountersTest( TestCase ):
+    def setUp( self ):
+        self.client = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.crew = [ User.objects.create_user( username=f'pirate{number}' ) for number in range( 4 ) ]
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.url = reverse( 'team_detail', args=( self.team.pk, 'straw-hat-pirates' ) )
+
+    def assertCounts( self, member_count, first_mate_count, captain ):
+        team = Team.objects.get( pk=self.team.pk )
+        self.assertEqual( ( member_count, first_mate_count, captain ), ( team.member_count, team.first_mate_count, team.captain ) )
+
+    def test_create_team( self ):
+        self.assertCounts( 1, 0, self.luffy )
+
+    def test_team_detail_add_and_remove( self ):
+        self.client.force_authenticate( user=self.luffy )
+
+        response = self.client.post( self.url, data={ 'username': 'zoro' } )
+        self.assertEqual( 2, response.data['member_count'] )
+        self.assertCounts( 2, 0, self.luffy )
+
+        self.client.patch( self.url, data={ 'username': 'zoro' } )
+        self.assertCounts( 1, 0, self.luffy )
+
+        # The captain leaving
+        self.client.patch( self.url, data={ 'username': 'luffy' } )
+        self.assertCounts( 0, 0, None )
+
+    def test_bulk_add_and_remove( self ):
+        Team.objects.add_members( self.team, { self.zoro: 'FM', self.crew[0]: 'FM', self.crew[1]: 'M' } )
+        self.assertEqual( ( 4, 2 ), ( self.team.member_count, self.team.first_mate_count ) )
+        self.assertCounts( 4, 2, self.luffy )
+
+        Team.objects.remove_members( self.team, [ self.luffy, self.zoro, self.crew[1] ] )
+        self.assertCounts( 2, 1, self.luffy )
+
+    def test_related_manager_writes( self ):
+        self.team.members.add( *self.crew, through_defaults={ 'role': 'FM' } )
+        self.assertCounts( 5, 4, self.luffy )
+
+        self.crew[0].teams.remove( self.team )
+        self.assertCounts( 4, 3, self.luffy )
+
+        self.team.members.clear()
+        self.assertCounts( 0, 0, None )
+
+    @override_settings( PURGE_INLINE=True )
+    def test_deleted_user_uncounted( self ):
+        Team.objects.add_members( self.team, { self.zoro: 'FM' } )
+
+        with self.captureOnCommitCallbacks( execute=True ):
+            soft_delete( self.zoro )
+            soft_delete( self.luffy )
+
+        self.assertCounts( 0, 0, None )
+
+    def test_recount_command( self ):
+        Team.objects.add_members( self.team, { self.zoro: 'FM', self.crew[0]: 'M' } )
+        Team.objects.filter( pk=self.team.pk ).update( member_count=0, first_mate_count=7, captain=None )
+
+        output = StringIO()
+        call_command( 'recount_teams', stdout=output )
+
+        self.assertIn( '1 teams recounted', output.getvalue() )
+        self.assertCounts( 3, 1, self.luffy )
+
+    def test_summaries_without_members( self ):
+        Team.objects.add_members( self.team, { self.zoro: 'FM' } )
+        self.client.force_authenticate( user=self.luffy )
+
+        with self.assertNumQueries( 1 ):
+            response = self.client.get( reverse( 'workspace' ) + '?fields=id,name,captain,member_count,first_mate_count' )
+
+        self.assertEqual(
+            [ { 'id': self.team.pk, 'name': 'Straw Hat Pirates', 'captain': 'luffy', 'member_count': 2, 'first_mate_count': 1 } ],
+            response.data['results'],
+        )
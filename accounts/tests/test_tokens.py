@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import Team
+
+User = get_user_model()
+
+
+class TeamClaimsTest( TestCase ):
+    def setUp( self ):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.team.members.add( self.zoro )
+        self.other_team = Team.objects.create_team( team_name='Whitebeard Pirates', captain=self.luffy )
+        self.url = reverse( 'team_detail', args=( self.team.pk, 'straw-hat-pirates' ) )
+        self.other_url = reverse( 'team_detail', args=( self.other_team.pk, 'whitebeard-pirates' ) )
+
+    def obtain( self, username ):
+        response = self.client.post( reverse( 'token_obtain_pair' ), data={ 'username': username, 'password': '123' }, format='json' )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        return response.data
+
+    def test_roles_in_access_token( self ):
+        access = AccessToken( self.obtain( 'zoro' )['access'] )
+        self.assertEqual( { str( self.team.pk ): 'M' }, access['teams'] )
+        self.assertEqual( User.objects.get( pk=self.zoro.pk ).membership_version, access['mv'] )
+
+    def test_authorized_from_claims( self ):
+        self.client.credentials( HTTP_AUTHORIZATION=f'Bearer {self.obtain( "zoro" )["access"]}' )
+        self.client.get( self.url )
+
+        # The user and the team come from the caches, the role from the token
+        with self.assertNumQueries( 0 ):
+            response = self.client.get( self.url )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+
+        self.client.get( self.other_url )
+        with self.assertNumQueries( 1 ):
+            # Forbidden from the claims, only the team is loaded to tell 403 from 404
+            response = self.client.get( self.other_url )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+    def test_stale_claims_ignored( self ):
+        self.client.credentials( HTTP_AUTHORIZATION=f'Bearer {self.obtain( "zoro" )["access"]}' )
+        self.assertEqual( status.HTTP_200_OK, self.client.get( self.url ).status_code )
+
+        with self.captureOnCommitCallbacks( execute=True ):
+            self.team.members.remove( self.zoro )
+
+        # The token still says zoro is a member, the membership version says otherwise
+        self.assertEqual( status.HTTP_403_FORBIDDEN, self.client.get( self.url ).status_code )
+
+    def test_refresh_updates_claims( self ):
+        tokens = self.obtain( 'zoro' )
+        Team.objects.add_members( self.other_team, { self.zoro: 'FM' } )
+
+        response = self.client.post( reverse( 'token_refresh' ), data={ 'refresh': tokens['refresh'] }, format='json' )
+
+        access = AccessToken( response.data['access'] )
+        self.assertEqual( { str( self.team.pk ): 'M', str( self.other_team.pk ): 'FM' }, access['teams'] )
+        self.assertEqual( User.objects.get( pk=self.zoro.pk ).membership_version, access['mv'] )
+
+    @override_settings( TOKEN_TEAM_CLAIMS_MAX=1 )
+    def test_too_many_teams_use_database( self ):
+        access = AccessToken( self.obtain( 'luffy' )['access'] )
+        self.assertNotIn( 'teams', access )
+
+        self.client.credentials( HTTP_AUTHORIZATION=f'Bearer {access}' )
+        self.assertEqual( status.HTTP_200_OK, self.client.get( self.other_url ).status_code )
@@ -1,9 +1,13 @@
 import json
+from base64 import urlsafe_b64encode
 from rest_framework import status
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth import get_user_model
 from accounts.models import Team
+from accounts.purge import soft_delete
 import unittest.mock as mock
 from rest_framework.test import APIClient
 
@@ -173,6 +177,44 @@ class UserDetailTestCase( TestCase ):
         })
     
 
+class SharedTeamsTest( TestCase ):
+    def setUp( self ):
+        self.user = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.ace = User.objects.create_user( username='ace', password='123' )
+
+        self.straw_hats = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.straw_hats.members.add( self.zoro )
+        self.brothers = Team.objects.create_team( team_name='Brothers', captain=self.ace )
+        self.brothers.members.add( self.luffy )
+        self.url = reverse( 'shared_teams' )
+
+    def test_shared_teams_with_roles( self ):
+        self.user.force_authenticate( user=self.luffy )
+
+        with self.assertNumQueries( 1 ):
+            response = self.user.get( self.url, { 'usernames': 'zoro,ace,nobody' } )
+
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( {
+            'zoro': [ { 'id': self.straw_hats.pk, 'name': 'Straw Hat Pirates', 'role': 'M', 'my_role': 'C' } ],
+            'ace': [ { 'id': self.brothers.pk, 'name': 'Brothers', 'role': 'C', 'my_role': 'M' } ],
+            'nobody': [],
+        }, response.data )
+
+    def test_no_shared_team( self ):
+        self.user.force_authenticate( user=self.zoro )
+        response = self.user.get( self.url, { 'usernames': 'ace' } )
+        self.assertEqual( { 'ace': [] }, response.data )
+
+    def test_usernames_required( self ):
+        self.user.force_authenticate( user=self.zoro )
+        self.assertEqual( status.HTTP_400_BAD_REQUEST, self.user.get( self.url ).status_code )
+        too_many = ','.join( f'user{number}' for number in range( 101 ) )
+        self.assertEqual( status.HTTP_400_BAD_REQUEST, self.user.get( self.url, { 'usernames': too_many } ).status_code )
+
+
 class TeamListTest( TestCase ):
     def setUp( self ):
         self.user = APIClient()
@@ -205,34 +247,114 @@ class TeamListTest( TestCase ):
 
         self.user.force_authenticate( user=self.luffy )
         response = self.user.get( url )
-        self.assertEqual( response.data, 
+        self.assertEqual( response.data['next'], None )
+        self.assertEqual( response.data['results'], 
             [
                 {
                     'id': 1, 
                     'name': 'Straw Hat Pirates', 
+                    'captain': 'luffy',
+                    'member_count': 3,
+                    'first_mate_count': 0,
+                    'change_sequence': 3,
                     'members': [
                         {
                             'id': mock.ANY, 
                             'username': 'luffy', 
                             'first_name': 'Monkey', 
-                            'last_name': 'D. Luffy'
+                            'last_name': 'D. Luffy',
+                            'role': 'C'
                         }, 
                         {
                             'id': mock.ANY, 
                             'username': 'zoro', 
                             'first_name': 'Roronoa', 
-                            'last_name': 'Zoro'
+                            'last_name': 'Zoro',
+                            'role': 'M'
                         }, 
                         {
                             'id': mock.ANY, 
-                            'username': 'sanji'
+                            'username': 'sanji',
+                            'role': 'M'
                         }
                     ], 
+                    'members_next': None,
                     'created': mock.ANY
                 }
             ]
         )
     
+    def test_constant_query_count( self ):
+        """Ensure the number of queries doesn't grow with the number of teams and members"""
+
+        url = reverse( 'workspace' )
+        self.user.force_authenticate( user=self.luffy )
+
+        with self.assertNumQueries( 2 ):
+            self.user.get( url )
+
+        for i in range( 10 ):
+            team = Team.objects.create_team( team_name=f'Fleet {i}', captain=self.luffy )
+            team.members.add( self.zoro, self.ace )
+
+        with self.assertNumQueries( 2 ):
+            response = self.user.get( url )
+        self.assertEqual( 11, len( response.data['results'] ) )
+
+    def test_members_capped_per_team( self ):
+        crew = [ User.objects.create_user( username=f'pirate{number}', password='123' ) for number in range( 12 ) ]
+        Team.objects.add_members( self.team, { user: 'M' for user in crew } )
+
+        self.user.force_authenticate( user=self.luffy )
+        team = self.user.get( reverse( 'workspace' ) ).data['results'][0]
+        self.assertEqual( [ 'luffy', 'zoro', 'sanji', *( f'pirate{number}' for number in range( 7 ) ) ], [ member['username'] for member in team['members'] ] )
+
+        response = self.user.get( team['members_next'] )
+        self.assertEqual( [ f'pirate{number}' for number in range( 7, 12 ) ], [ member['username'] for member in response.data['results'] ] )
+
+    def test_cursor_pagination( self ):
+        for i in range( 4 ):
+            Team.objects.create_team( team_name=f'Fleet {i}', captain=self.luffy )
+
+        self.user.force_authenticate( user=self.luffy )
+        url = reverse( 'workspace' ) + '?limit=2'
+        names = []
+        while url:
+            response = self.user.get( url )
+            self.assertLessEqual( len( response.data['results'] ), 2 )
+            names += [ team['name'] for team in response.data['results'] ]
+            url = response.data['next']
+
+        self.assertEqual( [ 'Straw Hat Pirates', 'Fleet 0', 'Fleet 1', 'Fleet 2', 'Fleet 3' ], names )
+
+    def test_invalid_cursor( self ):
+        self.user.force_authenticate( user=self.luffy )
+        response = self.user.get( reverse( 'workspace' ) + '?cursor=not-a-cursor' )
+        self.assertEqual( status.HTTP_404_NOT_FOUND, response.status_code )
+
+    def test_cursor_with_bad_values( self ):
+        def cursor( values ):
+            return urlsafe_b64encode( json.dumps( values ).encode() ).decode()
+
+        self.user.force_authenticate( user=self.luffy )
+        members_url = reverse( 'team_members', args=( self.team.pk, 'straw-hat-pirates' ) )
+        for url, values in (
+            ( reverse( 'workspace' ), [ 'garbage', 'x' ] ),
+            ( reverse( 'workspace' ), [ None, None ] ),
+            ( members_url, [ 'x' ] ),
+            ( members_url, [ [ 1 ] ] ),
+            ( reverse( 'my_tasks' ), [ 'a', 'b', 'c' ] ),
+        ):
+            response = self.user.get( url, { 'cursor': cursor( values ) } )
+            self.assertEqual( status.HTTP_404_NOT_FOUND, response.status_code, ( url, values ) )
+
+    def test_team_summaries_skip_members( self ):
+        self.user.force_authenticate( user=self.luffy )
+
+        with self.assertNumQueries( 1 ):
+            response = self.user.get( reverse( 'workspace' ) + '?fields=id,name' )
+        self.assertEqual( [ { 'id': self.team.pk, 'name': 'Straw Hat Pirates' } ], response.data['results'] )
+    
     # POST METHOD
     def test_team_name_required( self ):
         url = reverse( 'workspace' )
@@ -241,6 +363,17 @@ class TeamListTest( TestCase ):
         response = self.user.post( url, data={}, format='json' )
         self.assertEqual( status.HTTP_400_BAD_REQUEST, response.status_code )
 
+    def test_created_team_constant_query_count( self ):
+        """Ensure the created team is sent back with the same number of queries whatever its size"""
+
+        self.user.force_authenticate( user=self.ace )
+        with CaptureQueriesContext( connection ) as few:
+            self.user.post( reverse( 'workspace' ), data={ 'name': 'Spade Pirates', 'members': [ 'zoro' ] }, format='json' )
+        with CaptureQueriesContext( connection ) as many:
+            response = self.user.post( reverse( 'workspace' ), data={ 'name': 'Ace Pirates', 'members': [ 'zoro', 'sanji', 'marco', 'pops' ] }, format='json' )
+
+        self.assertEqual( len( few ), len( many ) )
+        self.assertCountEqual( [ 'ace', 'zoro', 'sanji', 'marco', 'pops' ], [ member['username'] for member in response.data['members'] ] )
 
 class TeamDetailTest( TestCase ):
     def setUp( self ):
@@ -291,6 +424,38 @@ class TeamDetailTest( TestCase ):
         self.assertEqual( status.HTTP_404_NOT_FOUND, delete_response.status_code )
         self.assertEqual( status.HTTP_404_NOT_FOUND, patch_response.status_code )
     
+    # GET METHOD
+    def test_valid_team_detail( self ):
+        self.user.force_authenticate( user=self.zoro )
+
+        # team with the user's role, and members with their roles
+        with self.assertNumQueries( 2 ):
+            response = self.user.get( self.url )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual(
+            [ ( 'luffy', 'C' ), ( 'zoro', 'M' ), ( 'sanji', 'M' ) ],
+            [ ( member['username'], member['role'] ) for member in response.data['members'] ]
+        )
+        self.assertIsNone( response.data['members_next'] )
+
+    def test_team_detail_members_paginated( self ):
+        self.user.force_authenticate( user=self.zoro )
+
+        response = self.user.get( self.url + '?limit=2' )
+        self.assertEqual( [ 'luffy', 'zoro' ], [ member['username'] for member in response.data['members'] ] )
+
+        response = self.user.get( response.data['members_next'] )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( [ 'sanji' ], [ member['username'] for member in response.data['results'] ] )
+        self.assertIsNone( response.data['next'] )
+
+    def test_team_detail_without_members( self ):
+        self.user.force_authenticate( user=self.zoro )
+
+        with self.assertNumQueries( 1 ):
+            response = self.user.get( self.url + '?fields=name' )
+        self.assertEqual( { 'name': 'Straw Hat Pirates' }, response.data )
+
     # POST METHOD
     def test_access_denied_add_member( self ):
         # authenticated, but not a member of team
@@ -332,4 +497,136 @@ class TeamDetailTest( TestCase ):
         self.user.force_authenticate( user=self.zoro )
         response = self.user.patch( self.url, data={ 'username': 'sanji' } )
         self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
-        self.assertIn( self.sanji, self.team.members.all() )
\ No newline at end of file
+        self.assertIn( self.sanji, self.team.members.all() )
+
+    def test_constant_query_count( self ):
+        """Ensure adding a member or deleting the team sends the team back with the same number of queries whatever its size"""
+
+        crew = [ User.objects.create_user( username=f'pirate{number}', password='123' ) for number in range( 10 ) ]
+        other_team = Team.objects.create_team( team_name='Heart Pirates', captain=self.luffy )
+        self.user.force_authenticate( user=self.luffy )
+
+        with CaptureQueriesContext( connection ) as few:
+            self.user.post( self.url, data={ 'username': 'pirate0' } )
+        Team.objects.add_members( self.team, { user: 'M' for user in crew[1:9] } )
+        soft_delete( crew[1] )
+        with CaptureQueriesContext( connection ) as many:
+            response = self.user.post( self.url, data={ 'username': 'pirate9' } )
+        self.assertEqual( len( few ), len( many ) )
+        # Soft deleted members are left out
+        self.assertEqual( 12, len( response.data['members'] ) )
+
+        with CaptureQueriesContext( connection ) as few:
+            self.user.delete( reverse( 'team_detail', args=( other_team.pk, 'heart-pirates' ) ) )
+        with CaptureQueriesContext( connection ) as many:
+            response = self.user.delete( self.url )
+        self.assertEqual( len( few ), len( many ) )
+        self.assertEqual( 12, len( response.data['members'] ) )
+
+
+class TeamMembersTest( TestCase ):
+    def setUp( self ):
+        self.user = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.team.members.add( self.zoro )
+        self.url = reverse( 'team_members', args=( self.team.pk, 'straw-hat-pirates' ) )
+
+        self.crew = [ User.objects.create_user( username=f'pirate{i}' ) for i in range( 20 ) ]
+
+    def test_access_denied_not_captain_or_first_mate( self ):
+        self.user.force_authenticate( user=self.zoro )
+        response = self.user.post( self.url, data={ 'members': [ 'pirate0' ] }, format='json' )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+    def test_valid_bulk_add( self ):
+        self.user.force_authenticate( user=self.luffy )
+        response = self.user.post( self.url, data={ 'members': [ 'pirate0', { 'username': 'pirate1', 'role': 'FM' }, 'zoro' ] }, format='json' )
+
+        self.assertEqual( status.HTTP_201_CREATED, response.status_code )
+        self.assertEqual( [ ( 'pirate0', 'M' ), ( 'pirate1', 'FM' ) ], [ ( member['username'], member['role'] ) for member in response.data['added'] ] )
+        self.assertEqual( [ 'zoro' ], response.data['already_members'] )
+        self.assertEqual( 4, self.team.members.count() )
+
+    def test_missing_users_reported_together( self ):
+        self.user.force_authenticate( user=self.luffy )
+        response = self.user.post( self.url, data={ 'members': [ 'pirate0', 'buggy', 'alvida' ] }, format='json' )
+
+        self.assertEqual( status.HTTP_400_BAD_REQUEST, response.status_code )
+        self.assertEqual( [ 'buggy', 'alvida' ], response.data['members']['missing'] )
+        self.assertEqual( 2, self.team.members.count() )
+
+    def test_captain_cannot_be_granted( self ):
+        self.user.force_authenticate( user=self.luffy )
+        response = self.user.post( self.url, data={ 'members': [ { 'username': 'pirate0', 'role': 'C' } ] }, format='json' )
+        self.assertEqual( status.HTTP_400_BAD_REQUEST, response.status_code )
+
+    def test_constant_query_count( self ):
+        """Ensure adding many members costs the same number of queries as adding a few"""
+
+        self.user.force_authenticate( user=self.luffy )
+        with CaptureQueriesContext( connection ) as few:
+            self.user.post( self.url, data={ 'members': [ user.username for user in self.crew[:2] ] }, format='json' )
+        with CaptureQueriesContext( connection ) as many:
+            self.user.post( self.url, data={ 'members': [ user.username for user in self.crew[2:] ] }, format='json' )
+
+        self.assertEqual( len( few ), len( many ) )
+        self.assertEqual( 22, self.team.members.count() )
+
+    def test_valid_bulk_remove( self ):
+        Team.objects.add_members( self.team, { user: 'M' for user in self.crew } )
+
+        self.user.force_authenticate( user=self.luffy )
+        response = self.user.delete( self.url, data={ 'members': [ 'luffy', 'zoro', 'pirate0', 'pirate1' ] }, format='json' )
+
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+        self.assertCountEqual( [ 'zoro', 'pirate0', 'pirate1' ], response.data['removed'] )
+        self.assertIn( self.luffy, self.team.members.all() )
+        self.assertEqual( 19, self.team.members.count() )
+
+    def test_invalid_bulk_remove( self ):
+        self.user.force_authenticate( user=self.luffy )
+        for members in ( [ [ 'zoro' ] ], [ { 'username': 'zoro' } ], [ 'zoro', None ], [], 'zoro' ):
+            response = self.user.delete( self.url, data={ 'members': members }, format='json' )
+            self.assertEqual( status.HTTP_400_BAD_REQUEST, response.status_code, members )
+            self.assertIn( 'members', response.data )
+
+        response = self.user.delete( self.url, data={ 'members': [ 'zoro', 'buggy' ] }, format='json' )
+        self.assertEqual( [ 'buggy' ], response.data['members']['missing'] )
+        self.assertIn( self.zoro, self.team.members.all() )
+
+
+class TeamExportTest( TestCase ):
+    def setUp( self ):
+        self.user = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123', email='luffy@example.com' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.team.slug = 'straw-hat-pirates'
+        self.team.save()
+        Team.objects.add_members( self.team, { self.zoro: 'FM' } )
+        self.url = reverse( 'team_export', args=( self.team.pk, 'straw-hat-pirates' ) )
+
+    def test_captain_exports_team( self ):
+        self.user.force_authenticate( user=self.luffy )
+        response = self.user.get( self.url )
+
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertTrue( response.streaming )
+        self.assertEqual( 'application/x-ndjson', response['Content-Type'] )
+        self.assertIn( 'straw-hat-pirates.ndjson', response['Content-Disposition'] )
+
+        with self.assertNumQueries( 1 ):
+            lines = [ json.loads( line ) for line in b''.join( response.streaming_content ).splitlines() ]
+        self.assertEqual( ( 'team', self.team.pk, 'Straw Hat Pirates' ), ( lines[0]['type'], lines[0]['id'], lines[0]['name'] ) )
+        self.assertEqual(
+            [ ( 'member', 'luffy', 'C', 'luffy@example.com' ), ( 'member', 'zoro', 'FM', '' ) ],
+            [ ( line['type'], line['username'], line['role'], line['email'] ) for line in lines[1:] ],
+        )
+        self.assertNotIn( 'password', lines[1] )
+
+    def test_access_denied_not_captain( self ):
+        self.user.force_authenticate( user=self.zoro )
+        response = self.user.get( self.url )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
@@ -0,0 +1,78 @@
+"""
+Team roles carried in access tokens.
+
+Access tokens hold the user's role in each of their teams, as { "team id": "role" } under the
+`teams` claim, along with the user's membership_version under `mv`. The version goes up whenever
+one of the user's memberships is added, removed or saved ( see accounts.signals ).
+CachedJWTAuthentication compares it with the version of the user it authenticates, which
+usually comes from the user cache. If they match, the team permission classes answer from the
+claims without querying the database. If not, the claims are ignored and roles are read from
+the database as for tokens without claims.
+
+Users in more than TOKEN_TEAM_CLAIMS_MAX teams get no claims, to keep tokens small.
+Claims are built from the database whenever an access token is issued, refreshes included.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import TeamMembership
+
+User = get_user_model()
+
+TEAMS_CLAIM = 'teams'
+VERSION_CLAIM = 'mv'
+
+
+def add_team_claims( token, user ):
+    """Put the user's roles and membership version in the token, unless the user is in too many teams"""
+
+    token.payload.pop( TEAMS_CLAIM, None )
+    token.payload.pop( VERSION_CLAIM, None )
+
+    limit = settings.TOKEN_TEAM_CLAIMS_MAX
+    roles = list(
+        TeamMembership.objects.filter( member=user.pk, team__deleted_at__isnull=True )
+        .order_by().values_list( 'team_id', 'role' )[:limit + 1]
+    )
+    if len( roles ) > limit:
+        return token
+
+    token[TEAMS_CLAIM] = { str( team_id ): role for team_id, role in roles }
+    token[VERSION_CLAIM] = user.membership_version
+    return token
+
+
+def claimed_roles( token, user ):
+    """Roles by team id from the token, None if it has no claims or they are out of date"""
+
+    roles = token.get( TEAMS_CLAIM )
+    if roles is None or token.get( VERSION_CLAIM ) != user.membership_version:
+        return None
+    return { int( team_id ): role for team_id, role in roles.items() }
+
+
+class TeamRolesTokenObtainPairSerializer( TokenObtainPairSerializer ):
+
+    def validate( self, attrs ):
+        data = super().validate( attrs )
+        data['access'] = str( add_team_claims( AccessToken( data['access'] ), self.user ) )
+        return data
+
+
+class TeamRolesTokenRefreshSerializer( TokenRefreshSerializer ):
+    """Refreshed access tokens get up to date claims, the ones of the old token are not copied"""
+
+    def validate( self, attrs ):
+        data = super().validate( attrs )
+        access = AccessToken( data['access'] )
+        user = User.objects.filter( pk=access[api_settings.USER_ID_CLAIM] ).first()
+        if user is None:
+            access.payload.pop( TEAMS_CLAIM, None )
+            access.payload.pop( VERSION_CLAIM, None )
+        else:
+            add_team_claims( access, user )
+        data['access'] = str( access )
+        return data
@@ -1,15 +1,28 @@
 from django.urls import path
-from .views import CreateUser, TeamList, UserDetail, TeamDetail
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .views import TokenObtainPair, CreateUser, TeamList, UserDetail, TeamDetail, TeamMembers, TeamExport, SharedTeams, PurgeJobDetail
+from .async_views import AsyncUserDetail, AsyncTeamList, AsyncTeamDetail, AsyncTeamChanges
+from rest_framework_simplejwt.views import TokenRefreshView
+from .tokens import TeamRolesTokenObtainPairSerializer, TeamRolesTokenRefreshSerializer
 
 urlpatterns = [
-    path('token', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token', TokenObtainPair.as_view( serializer_class=TeamRolesTokenObtainPairSerializer ), name='token_obtain_pair'),
+    path('token/refresh', TokenRefreshView.as_view( serializer_class=TeamRolesTokenRefreshSerializer ), name='token_refresh'),
 
     path( 'create_user', CreateUser.as_view(), name='create_user' ),
     path( 'user_detail/<str:username>', UserDetail.as_view(), name='user_detail' ),
+    path( 'shared_teams', SharedTeams.as_view(), name='shared_teams' ),
 
     path( 'workspace', TeamList.as_view(), name='workspace' ),
     
     path( 'team_detail/<int:pk>/<slug:slug>', TeamDetail.as_view(), name='team_detail' ),
+    path( 'team_detail/<int:pk>/<slug:slug>/members', TeamMembers.as_view(), name='team_members' ),
+    path( 'team_detail/<int:pk>/<slug:slug>/export', TeamExport.as_view(), name='team_export' ),
+
+    path( 'purge_jobs/<int:pk>', PurgeJobDetail.as_view(), name='purge_job' ),
+
+    # ASGI-native variants, only useful when served by an ASGI server ( task_manager.asgi )
+    path( 'async/user_detail/<str:username>', AsyncUserDetail.as_view(), name='async_user_detail' ),
+    path( 'async/workspace', AsyncTeamList.as_view(), name='async_workspace' ),
+    path( 'async/team_detail/<int:pk>/<slug:slug>', AsyncTeamDetail.as_view(), name='async_team_detail' ),
+    path( 'async/team_detail/<int:pk>/<slug:slug>/changes', AsyncTeamChanges.as_view(), name='async_team_changes' ),
 ]
\ No newline at end of file
@@ -1,19 +1,96 @@
 from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer, TeamSerializer
+from .serializers import (
+    UserSerializer, TeamSerializer, TeamMemberSerializer, BulkMembersSerializer, BulkRemoveMembersSerializer, SharedTeamSerializer, PurgeJobSerializer,
+    TeamRowSerializer, TeamMemberRowSerializer, get_users_by_username,
+)
+from rest_framework.exceptions import ValidationError
+from .pagination import TeamPagination, MembershipPagination
+from django.urls import reverse
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import F, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .permissions import IsInCommonTeam, IsUser, IsInTeam, IsReadOnly, IsCaptain, IsFirstMate, IsInTeamAndIsUserOrIsCaptainOrIsFirstMate
-from .models import Team
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .permissions import IsInCommonTeam, IsUser, IsInTeam, IsReadOnly, IsCaptain, IsFirstMate, IsInTeamAndIsUserOrIsCaptainOrIsFirstMate, get_team_or_404
+from .models import PurgeJob, Team, TeamMembership, members_prefetch
+from .purge import soft_delete
+from .export import export_team
+from .authentication import CachedJWTAuthentication
+from .team_cache import get_cached_team, cache_team
+from task_manager.db_router import primary
+from task_manager.instrumentation import InstrumentedViewMixin
+from task_manager.ratelimit import RateLimitMixin
 
 User = get_user_model()
 
+# Most users a shared teams lookup takes at once
+SHARED_TEAMS_MAX_USERS = 100
+# Members embedded per team by the workspace, `members_next` links to the rest
+WORKSPACE_MEMBERS_PER_TEAM = 10
+
+
+def get_query_list( request, parameter ):
+    """Comma separated values of a query parameter ( e.g. ?fields=id,name ), or None if it's missing"""
+
+    values = request.query_params.get( parameter )
+    if not values:
+        return None
+    return [ value.strip() for value in values.split( ',' ) if value.strip() ]
+
+
+def get_requested_fields( request ):
+    """Fields listed in the `fields` query parameter ( e.g. ?fields=id,name ), or None for all fields"""
+
+    return get_query_list( request, 'fields' )
+
+
+def get_members_rows( team_ids, serializer, limit=WORKSPACE_MEMBERS_PER_TEAM ):
+    """
+    Active memberships of the teams as the .values() rows `serializer` reads, in membership order.
+    At most `limit` + 1 per team, the extra row tells whether the team has more members.
+    """
+
+    memberships = TeamMembership.objects.filter( team__in=team_ids ).active()
+    if limit is not None:
+        memberships = memberships.annotate(
+            position=Window( RowNumber(), partition_by=F( 'team_id' ), order_by=F( 'pk' ).asc() )
+        ).filter( position__lte=limit + 1 )
+    return memberships.order_by( 'pk' ).values( *serializer.columns )
+
+
+def get_workspace_members( request, teams, rows, serializer, limit=WORKSPACE_MEMBERS_PER_TEAM ):
+    """
+    The first `limit` members of each team from get_members_rows() and `members_next`, the link to
+    the team's next members or None, as TeamDetail.get gives them. Both by team id.
+    """
+
+    rows_by_team = {}
+    for row in rows:
+        rows_by_team.setdefault( row['team_id'], [] ).append( row )
+
+    members, members_next = {}, {}
+    paginator = MembershipPagination()
+    paginator.request, paginator.page_size_requested = request, limit
+    for team in teams:
+        page = paginator.set_page( rows_by_team.get( team['id'], [] ) )
+        members[team['id']] = serializer.many( page )
+        members_next[team['id']] = paginator.get_next_link( reverse( 'team_members', args=( team['id'], team['slug'] or team['id'] ) ) )
+    return members, members_next
+
 # ========== USER VIEWS ==========
 
-class CreateUser( APIView ):
+class TokenObtainPair( RateLimitMixin, TokenObtainPairView ):
+    """TokenObtainPairView with its attempts limited per IP and per username"""
+
+    rate_limit_scope = 'token'
+
+
+class CreateUser( RateLimitMixin, InstrumentedViewMixin, APIView ):
+    rate_limit_scope = 'create_user'
 
     def post( self, request ):
         deserialized_user = UserSerializer( data=request.data )
@@ -23,11 +100,14 @@ class CreateUser( APIView ):
         return Response( deserialized_user.errors, status=status.HTTP_400_BAD_REQUEST )
 
 
-class UserDetail( APIView ):
+class UserDetail( RateLimitMixin, InstrumentedViewMixin, APIView ):
     # IsInCommonTeamOrIsUser will block unauthenticated users as IsAuthenticated.
     # To save computational resources by not hitting the database, it's preferable to block unauthenticated users earlier.
-    authentication_classes = ( JWTAuthentication, )
+    authentication_classes = ( CachedJWTAuthentication, )
     permission_classes = ( IsAuthenticated, IsUser|( IsReadOnly&IsInCommonTeam ) )
+    # POST sets the password
+    rate_limit_scope = 'password'
+    rate_limit_authenticated = True
 
     def get( self, request, username ):
         """Get user data"""
@@ -76,23 +156,67 @@ class UserDetail( APIView ):
         self.check_object_permissions( request, user )
 
         serialized = UserSerializer( user )
-        user.delete()
-        return Response( serialized.data, status=status.HTTP_202_ACCEPTED )
+        job = soft_delete( user, requested_by=request.user )
+        return Response( serialized.data, status=status.HTTP_202_ACCEPTED, headers={ 'Location': reverse( 'purge_job', args=[job.pk] ) } )
+    
+
+class SharedTeams( InstrumentedViewMixin, APIView ):
+    authentication_classes = ( CachedJWTAuthentication, )
+    permission_classes = ( IsAuthenticated, )
+
+    def get( self, request ):
+        """
+        Teams the user shares with each of the given users, with both roles, in one query.
+        ?usernames=zoro,sanji gives { "zoro": [ { "id", "name", "role", "my_role" } ], "sanji": [] }.
+        Users sharing no team, or not existing, get an empty list.
+        """
+
+        usernames = list( dict.fromkeys( get_query_list( request, 'usernames' ) or [] ) )
+        if not usernames:
+            return Response( { 'error': 'usernames query parameter required' }, status=status.HTTP_400_BAD_REQUEST )
+        if len( usernames ) > SHARED_TEAMS_MAX_USERS:
+            return Response( { 'error': f'at most {SHARED_TEAMS_MAX_USERS} usernames' }, status=status.HTTP_400_BAD_REQUEST )
+
+        memberships = (
+            TeamMembership.objects
+            .filter( member__username__in=usernames )
+            .active()
+            .shared_with( request.user.id )
+            .select_related( 'team', 'member' )
+            .order_by( 'team__created', 'team_id' )
+        )
+        shared = { username: [] for username in usernames }
+        for membership in memberships:
+            shared[membership.member.username].append( SharedTeamSerializer( membership ).data )
+        return Response( shared, status=status.HTTP_200_OK )
     
 
 # ========== TEAM VIEWS ==========
 
 
-class TeamList( APIView ):
-    authentication_classes = ( JWTAuthentication, )
+class TeamList( InstrumentedViewMixin, APIView ):
+    authentication_classes = ( CachedJWTAuthentication, )
     permission_classes = ( IsAuthenticated, )
 
     def get( self, request ):
-        """Shows all the teams the user is on"""
+        """
+        Shows the teams the user is on, paginated by cursor ( ?cursor=, ?limit= ).
+        Up to WORKSPACE_MEMBERS_PER_TEAM members per team, `members_next` links to the rest.
+        Optional: ?fields=id,name,created to get team summaries without members
+        """
+
+        fields = get_requested_fields( request )
+        serializer = TeamRowSerializer( fields )
+
+        paginator = TeamPagination()
+        page = paginator.paginate_queryset( Team.objects.for_user( request.user.id ).values( *serializer.columns ), request, self )
 
-        user_teams = request.user.teams.all()
-        teams_serilized = TeamSerializer( user_teams, many=True )
-        return Response( teams_serilized.data, status=status.HTTP_200_OK )
+        members = members_next = None
+        if fields is None or 'members' in fields:
+            member_serializer = TeamMemberRowSerializer()
+            rows = get_members_rows( [ team['id'] for team in page ], member_serializer )
+            members, members_next = get_workspace_members( request, page, rows, member_serializer )
+        return paginator.get_paginated_response( serializer.many( page, members, members_next ) )
 
 
     def post( self, request ):
@@ -101,17 +225,22 @@ class TeamList( APIView ):
         Optional: populate team with members
         """
 
-        members_to_add = [ get_object_or_404( User, username=member ) for member in request.data.get( 'members', [] ) ]  
+        try:
+            members_to_add = list( get_users_by_username( request.data.get( 'members', [] ) ).values() )
+        except ValidationError as error:
+            return Response( error.detail, status=status.HTTP_404_NOT_FOUND )
         team_serialized = TeamSerializer( data=request.data, context={ 'captain': request.user, 'members': members_to_add } )
 
         if team_serialized.is_valid():
-            team_serialized.save( members=members_to_add )
+            team = team_serialized.save( members=members_to_add )
+            # One query for the members instead of one per member
+            prefetch_related_objects( [ team ], members_prefetch() )
             return Response( team_serialized.data, status=status.HTTP_201_CREATED )
         return Response( team_serialized.errors, status=status.HTTP_400_BAD_REQUEST )
 
 
-class TeamDetail( APIView ):
-    authentication_classes = ( JWTAuthentication, )
+class TeamDetail( InstrumentedViewMixin, APIView ):
+    authentication_classes = ( CachedJWTAuthentication, )
     
     def get_permissions( self ):
         if self.request.method == 'POST':
@@ -126,26 +255,57 @@ class TeamDetail( APIView ):
     
     
     def get( self, request, pk, slug ):
-        """Get information about a team and its members"""
+        """
+        Get information about a team and the first page of its members.
+        `members_next` links to the next page of members, if any.
+        Optional: ?fields=id,name,created to leave members out
+        Cached until the team or its members change, sends 304 for a matching If-None-Match
+        """
 
-        team = get_object_or_404( Team, pk=pk )
-        self.check_object_permissions( request, team )
+        fields = get_requested_fields( request )
+        if request.query_params.get( MembershipPagination.cursor_query_param ):
+            # Later pages of members are built every time, they must not take the first page's place
+            cache_key, cached = None, None
+        else:
+            cache_key, cached = get_cached_team( pk, f'{fields}:{request.query_params.get( "limit" )}' )
 
-        team_serialized = TeamSerializer( team )
-        return Response( team_serialized.data, status=status.HTTP_200_OK )
+        if cached is not None:
+            # Only existing teams are cached, what's left is checking the user is allowed to see it
+            self.check_object_permissions( request, Team( pk=pk ) )
+        else:
+            # Cached for everyone, so read from the primary: a lagging replica would outlive its lag here
+            with primary():
+                team = get_team_or_404( request, pk, Team.objects.select_related( 'captain' ) )
+                self.check_object_permissions( request, team )
+
+                team_fields = [ field for field in ( fields or TeamSerializer.Meta.fields ) if field != 'members' ]
+                team_serialized = TeamSerializer( team, fields=team_fields ).data
+
+                if fields is None or 'members' in fields:
+                    member_serializer = TeamMemberRowSerializer()
+                    paginator = MembershipPagination()
+                    page = paginator.paginate_queryset( team.teammembership_set.active().values( *member_serializer.columns ), request, self )
+                    team_serialized['members'] = member_serializer.many( page )
+                    team_serialized['members_next'] = paginator.get_next_link( reverse( 'team_members', args=( pk, slug ) ) )
+            cached = cache_team( cache_key, team_serialized )
+
+        if cached['etag'] in request.headers.get( 'If-None-Match', '' ):
+            return Response( status=status.HTTP_304_NOT_MODIFIED, headers={ 'ETag': cached['etag'] } )
+        return Response( cached['data'], status=status.HTTP_200_OK, headers={ 'ETag': cached['etag'] } )
     
 
     def post( self, request, pk, slug ):
         """Add a member to the team ( must be captain or first mate )"""
 
-        team = get_object_or_404( Team, pk=pk )
+        team = get_team_or_404( request, pk, Team.objects.select_related( 'captain' ) )
         self.check_object_permissions( request, team )
 
         if not request.data.get( 'username' ):
             return Response( { 'error': 'username field required' }, status=status.HTTP_400_BAD_REQUEST )
         new_member = get_object_or_404( User, username=request.data.get( 'username' ) )
 
-        team.members.add( new_member )
+        Team.objects.add_members( team, { new_member: TeamMembership.Roles.MEMBER } )
+        prefetch_related_objects( [ team ], members_prefetch() )
         serialized = TeamSerializer( team )
         return Response( serialized.data, status=status.HTTP_201_CREATED )
     
@@ -153,7 +313,7 @@ class TeamDetail( APIView ):
     def patch( self, request, pk, slug ):
         """Remove a member or leave a team"""
 
-        team = get_object_or_404( Team, pk=pk )
+        team = get_team_or_404( request, pk )
         # Security: first check if user is in team before returning if user is in team or not
         # or a user not in team would have access to what user is in team or not
         try:
@@ -170,8 +330,97 @@ class TeamDetail( APIView ):
     def delete( self, request, pk, slug ):
         """Delete a team"""
 
-        team = get_object_or_404( Team, pk=pk )
+        team = get_team_or_404( request, pk, Team.objects.select_related( 'captain' ) )
         self.check_object_permissions( request, team )
+        prefetch_related_objects( [ team ], members_prefetch() )
         team_serialized_data = TeamSerializer( team ).data
-        team.delete()
-        return Response( team_serialized_data, status=status.HTTP_202_ACCEPTED )
\ No newline at end of file
+        # Hidden right away, memberships and tasks are purged in the background
+        job = soft_delete( team, requested_by=request.user )
+        return Response( team_serialized_data, status=status.HTTP_202_ACCEPTED, headers={ 'Location': reverse( 'purge_job', args=[job.pk] ) } )
+
+
+class TeamMembers( InstrumentedViewMixin, APIView ):
+    """List the members of a team, or add or remove many at once ( must be captain or first mate )"""
+
+    authentication_classes = ( CachedJWTAuthentication, )
+
+    def get_permissions( self ):
+        if self.request.method in ( 'POST', 'DELETE' ):
+            self.permission_classes = ( IsAuthenticated, IsInTeam, IsCaptain|IsFirstMate )
+        else:
+            self.permission_classes = ( IsAuthenticated, IsInTeam )
+        return super( TeamMembers, self ).get_permissions()
+
+    def get( self, request, pk, slug ):
+        """Members of the team with their roles, paginated by cursor ( ?cursor=, ?limit= )"""
+
+        team = get_team_or_404( request, pk )
+        self.check_object_permissions( request, team )
+
+        member_serializer = TeamMemberRowSerializer()
+        paginator = MembershipPagination()
+        page = paginator.paginate_queryset( team.teammembership_set.active().values( *member_serializer.columns ), request, self )
+        return paginator.get_paginated_response( member_serializer.many( page ) )
+
+    def post( self, request, pk, slug ):
+        """
+        Add members to the team.
+        Body: { "members": [ "username", { "username": "...", "role": "FM" }, ... ] }
+        """
+
+        team = get_team_or_404( request, pk )
+        self.check_object_permissions( request, team )
+
+        deserialized = BulkMembersSerializer( data=request.data )
+        if not deserialized.is_valid():
+            return Response( deserialized.errors, status=status.HTTP_400_BAD_REQUEST )
+
+        members = deserialized.validated_data['members']
+        added = Team.objects.add_members( team, members )
+        added_ids = { membership.member_id for membership in added }
+        return Response( {
+            'added': TeamMemberSerializer( added, many=True ).data,
+            'already_members': [ user.username for user in members if user.pk not in added_ids ],
+        }, status=status.HTTP_201_CREATED )
+
+    def delete( self, request, pk, slug ):
+        """
+        Remove members from the team. The captain can't be removed.
+        Body: { "members": [ "username", ... ] }
+        """
+
+        team = get_team_or_404( request, pk )
+        self.check_object_permissions( request, team )
+
+        deserialized = BulkRemoveMembersSerializer( data=request.data )
+        if not deserialized.is_valid():
+            return Response( deserialized.errors, status=status.HTTP_400_BAD_REQUEST )
+
+        removed = Team.objects.remove_members( team, deserialized.validated_data['members'].values() )
+        return Response( { 'removed': removed }, status=status.HTTP_202_ACCEPTED )
+
+
+class TeamExport( InstrumentedViewMixin, APIView ):
+    authentication_classes = ( CachedJWTAuthentication, )
+    permission_classes = ( IsAuthenticated, IsInTeam, IsCaptain )
+
+    def get( self, request, pk, slug ):
+        """Stream the team, its members and their roles as newline delimited JSON ( must be captain )"""
+
+        team = get_team_or_404( request, pk )
+        self.check_object_permissions( request, team )
+
+        response = StreamingHttpResponse( export_team( team ), content_type='application/x-ndjson' )
+        response['Content-Disposition'] = f'attachment; filename="{team.slug or team.pk}.ndjson"'
+        return response
+
+
+class PurgeJobDetail( InstrumentedViewMixin, APIView ):
+    authentication_classes = ( CachedJWTAuthentication, )
+    permission_classes = ( IsAuthenticated, )
+
+    def get( self, request, pk ):
+        """Progress of the purge of a deleted team or user, for the user who deleted it"""
+
+        job = get_object_or_404( PurgeJob, pk=pk, requested_by=request.user )
+        return Response( PurgeJobSerializer( job ).data, status=status.HTTP_200_OK )
@@ -0,0 +1,221 @@
+"""
+Latency, throughput and query counts of the accounts endpoints on synthetic data.
+
+Generates users, teams and memberships ( see benchmarks.data ) in a scratch database,
+then drives each scenario in-process through the full Django stack, JWT authentication
+included. Request parameters are drawn from the data with a fixed seed, so two runs with
+the same arguments send the same requests. Query counts come from
+task_manager.instrumentation. Caches are cleared before every scenario.
+
+Results can be written as JSON ( --output ) and compared with an earlier run ( --compare ).
+
+Usage: python -m benchmarks.api [--users 100000] [--teams 10000] [--requests 500] [--scenario workspace ...] [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import subprocess
+import time
+
+from benchmarks.common import percentile, scratch_database, setup_django
+
+
+def scenarios( data ):
+    """Name: callable drawing ( path, requesting user id, accepted statuses )"""
+
+    from django.urls import reverse
+
+    def team_route( name, team_id ):
+        return reverse( name, args=( team_id, data.slugs[team_id] ) )
+
+    def workspace():
+        return reverse( 'workspace' ), data.random_member(), ( 200, )
+
+    def workspace_power_user():
+        return reverse( 'workspace' ), data.random_power_user(), ( 200, )
+
+    def workspace_summaries():
+        return reverse( 'workspace' ) + '?fields=id,name,created', data.random_power_user(), ( 200, )
+
+    def team_detail():
+        team_id, member_id = data.random_team()
+        return team_route( 'team_detail', team_id ), member_id, ( 200, )
+
+    def team_detail_forbidden():
+        team_id, _ = data.random_team()
+        return team_route( 'team_detail', team_id ), data.random_stranger( team_id ), ( 403, )
+
+    def team_members():
+        team_id, member_id = data.random_team()
+        return team_route( 'team_members', team_id ), member_id, ( 200, )
+
+    def user_detail_teammate():
+        user_id, teammate_id = data.random_teammates()
+        return reverse( 'user_detail', args=( data.usernames[teammate_id], ) ), user_id, ( 200, )
+
+    def user_detail_stranger():
+        # Most random pairs share no team, IsInCommonTeam has to look through all of their teams
+        user_id, other_id = data.random_power_user(), data.random_member()
+        return reverse( 'user_detail', args=( data.usernames[other_id], ) ), user_id, ( 200, 403 )
+
+    def shared_teams():
+        usernames = ','.join( data.usernames[data.random_member()] for _ in range( 20 ) )
+        return reverse( 'shared_teams' ) + f'?usernames={usernames}', data.random_power_user(), ( 200, )
+
+    return {
+        'workspace': workspace,
+        'workspace power user': workspace_power_user,
+        'workspace summaries': workspace_summaries,
+        'team detail': team_detail,
+        'team detail forbidden': team_detail_forbidden,
+        'team members': team_members,
+        'user detail teammate': user_detail_teammate,
+        'user detail stranger': user_detail_stranger,
+        'shared teams': shared_teams,
+    }
+
+
+def run_scenario( draw, requests, warmup, tokens ):
+    from django.core.cache import caches
+    from django.test import Client
+    from rest_framework_simplejwt.tokens import AccessToken
+    from accounts.models import User
+    from task_manager.instrumentation import request_measured
+
+    def token( user_id ):
+        if user_id not in tokens:
+            tokens[user_id] = f'Bearer {AccessToken.for_user( User( pk=user_id ) )}'
+        return tokens[user_id]
+
+    for cache in caches.all():
+        cache.clear()
+
+    client = Client()
+    queries = []
+    record = lambda sender, metrics, **kwargs: queries.append( metrics.queries )
+    request_measured.connect( record )
+    try:
+        # Drawn before timing, token signing is not part of what is measured
+        planned = [ draw() for _ in range( warmup + requests ) ]
+        planned = [ ( path, token( user_id ), accepted ) for path, user_id, accepted in planned ]
+
+        latencies = []
+        statuses = {}
+        start = time.perf_counter()
+        for number, ( path, authorization, accepted ) in enumerate( planned ):
+            if number == warmup:
+                queries.clear()
+                start = time.perf_counter()
+            request_start = time.perf_counter()
+            response = client.get( path, HTTP_AUTHORIZATION=authorization )
+            if number >= warmup:
+                latencies.append( time.perf_counter() - request_start )
+                statuses[str( response.status_code )] = statuses.get( str( response.status_code ), 0 ) + 1
+            assert response.status_code in accepted, ( path, response.status_code, response.content[:200] )
+        elapsed = time.perf_counter() - start
+    finally:
+        request_measured.disconnect( record )
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'throughput': requests / elapsed if elapsed else 0.0,
+        'mean_ms': sum( latencies ) / len( latencies ) * 1000 if latencies else 0.0,
+        'p50_ms': percentile( latencies, 0.5 ) * 1000,
+        'p95_ms': percentile( latencies, 0.95 ) * 1000,
+        'p99_ms': percentile( latencies, 0.99 ) * 1000,
+        'queries_mean': sum( queries ) / len( queries ) if queries else 0.0,
+        'queries_max': max( queries, default=0 ),
+        'statuses': statuses,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run( [ 'git', 'rev-parse', 'HEAD' ], capture_output=True, text=True, check=True ).stdout.strip()
+    except ( OSError, subprocess.CalledProcessError ):
+        return None
+
+
+def report( results, previous=None ):
+    print( f'{"":<24}{"req/s":>10}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"max":>5}' )
+    for name, result in results.items():
+        line = (
+            f'{name:<24}{result["throughput"]:>10.1f}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+            f'{result["p99_ms"]:>9.2f}{result["queries_mean"]:>9.1f}{result["queries_max"]:>5}'
+        )
+        before = ( previous or {} ).get( name )
+        if before and before['p95_ms']:
+            line += f'   p95 {( result["p95_ms"] / before["p95_ms"] - 1 ) * 100:+.0f}%, queries {result["queries_mean"] - before["queries_mean"]:+.1f}'
+        print( line )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--users', type=int, default=100_000 )
+    parser.add_argument( '--teams', type=int, default=10_000 )
+    parser.add_argument( '--team-size', type=int, default=20, help='mean members per team' )
+    parser.add_argument( '--power-users', type=int, default=50 )
+    parser.add_argument( '--power-user-teams', type=int, default=500, help='teams each power user is in' )
+    parser.add_argument( '--seed', type=int, default=0 )
+    parser.add_argument( '--requests', type=int, default=500, help='measured requests per scenario' )
+    parser.add_argument( '--warmup', type=int, default=20 )
+    parser.add_argument( '--scenario', action='append', help='run only these scenarios, can be repeated' )
+    parser.add_argument( '--output', help='write the results to this JSON file' )
+    parser.add_argument( '--compare', help='JSON results of an earlier run to compare with' )
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open( args.compare ) as file:
+            previous = json.load( file )['results']
+
+    setup_django()
+    # The forbidden scenarios would log every request
+    logging.getLogger( 'django.request' ).setLevel( logging.ERROR )
+    import django
+    from django.db import connection
+    from benchmarks.data import generate
+
+    with scratch_database():
+        start = time.perf_counter()
+        data = generate(
+            users=args.users, teams=args.teams, team_size=args.team_size,
+            power_users=args.power_users, power_user_teams=args.power_user_teams, seed=args.seed,
+        )
+        summary = data.summary()
+        print( f'{summary} generated in {time.perf_counter() - start:.1f}s' )
+
+        available = scenarios( data )
+        selected = args.scenario or list( available )
+        unknown = set( selected ) - set( available )
+        if unknown:
+            parser.error( f'unknown scenarios {sorted( unknown )}, expected some of {list( available )}' )
+
+        tokens = {}
+        results = { name: run_scenario( available[name], args.requests, args.warmup, tokens ) for name in selected }
+
+    report( results, previous )
+
+    if args.output:
+        with open( args.output, 'w' ) as file:
+            json.dump( {
+                'commit': git_commit(),
+                'date': datetime.datetime.now( datetime.timezone.utc ).isoformat(),
+                'arguments': vars( args ),
+                'environment': {
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'machine': platform.machine(),
+                },
+                'data': summary,
+                'results': results,
+            }, file, indent=2 )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Throughput of the sync ( WSGI ) and async ( ASGI ) team detail views with many slow clients.
+
+A slow client holds on to the server until it has read the whole response. A sync
+server needs a thread for every such client, so a worker with `--threads` threads
+serves at most that many clients at a time. The async views wait on slow clients
+from the event loop, so a single worker keeps serving the others.
+
+Both servers are driven in-process: the sync one as a thread pool calling the WSGI
+application, the async one as coroutines calling the ASGI application.
+
+Usage: python -m benchmarks.async_load [--requests 400] [--concurrency 200] [--threads 8] [--client-delay 0.5]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from benchmarks.common import percentile, scratch_database, setup_django
+
+
+def create_fixture( members ):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from rest_framework_simplejwt.tokens import AccessToken
+    from accounts.models import Team, TeamMembership
+
+    User = get_user_model()
+    password = make_password( None )
+    captain = User.objects.create( username='captain', password=password )
+    team = Team.objects.create_team( team_name='Load test', captain=captain )
+    crew = User.objects.bulk_create( [ User( username=f'member{i}', password=password ) for i in range( members ) ] )
+    Team.objects.add_members( team, { user: TeamMembership.Roles.MEMBER for user in crew } )
+    return team, f'Bearer {AccessToken.for_user( captain )}'
+
+
+def run_sync( path, token, requests, threads, delay ):
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def request():
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80', 'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': token,
+            'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        }
+        statuses = []
+        start = time.perf_counter()
+        response = application( environ, lambda status, headers: statuses.append( status ) )
+        body = b''.join( response )
+        # The thread is busy until the slow client has read the response
+        time.sleep( delay )
+        response.close()
+        assert statuses[0].startswith( '200' ), ( statuses, body[:200] )
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor( max_workers=threads ) as pool:
+        latencies = list( pool.map( lambda _: request(), range( requests ) ) )
+    return time.perf_counter() - start, latencies
+
+
+def run_async( path, token, requests, concurrency, delay ):
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def request( slots ):
+        async with slots:
+            scope = {
+                'type': 'http', 'asgi': { 'version': '3.0' }, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+                'headers': [ ( b'host', b'testserver' ), ( b'authorization', token.encode() ) ],
+                'client': ( '127.0.0.1', 0 ), 'server': ( 'testserver', 80 ),
+            }
+            statuses = []
+            body_sent = False
+            finished = asyncio.Event()
+            start = time.perf_counter()
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return { 'type': 'http.request', 'body': b'', 'more_body': False }
+                # The client stays connected until it has read the response
+                await finished.wait()
+                return { 'type': 'http.disconnect' }
+
+            async def send( message ):
+                if message['type'] == 'http.response.start':
+                    statuses.append( message['status'] )
+                elif not message.get( 'more_body' ):
+                    # The slow client reads the response without blocking the worker
+                    await asyncio.sleep( delay )
+                    finished.set()
+
+            await application( scope, receive, send )
+            assert statuses[0] == 200, statuses
+            return time.perf_counter() - start
+
+    async def main():
+        slots = asyncio.Semaphore( concurrency )
+        start = time.perf_counter()
+        latencies = await asyncio.gather( *( request( slots ) for _ in range( requests ) ) )
+        return time.perf_counter() - start, latencies
+
+    return asyncio.run( main() )
+
+
+def report( label, elapsed, latencies ):
+    latencies = sorted( latencies )
+    print(
+        f'{label:<6}{len( latencies ) / elapsed:>12.1f}'
+        f'{percentile( latencies, 0.5 ) * 1000:>10.1f}{percentile( latencies, 0.95 ) * 1000:>10.1f}{percentile( latencies, 0.99 ) * 1000:>10.1f}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--requests', type=int, default=400 )
+    parser.add_argument( '--concurrency', type=int, default=200, help='clients connected at the same time ( async )' )
+    parser.add_argument( '--threads', type=int, default=8, help='threads of the sync worker' )
+    parser.add_argument( '--client-delay', type=float, default=0.5, help='seconds a client takes to read a response' )
+    parser.add_argument( '--members', type=int, default=20 )
+    args = parser.parse_args()
+
+    setup_django()
+    from django.urls import reverse
+
+    with scratch_database():
+        team, token = create_fixture( args.members )
+        sync_path = reverse( 'team_detail', args=( team.pk, team.slug or 'team' ) )
+        async_path = reverse( 'async_team_detail', args=( team.pk, team.slug or 'team' ) )
+
+        print( f'{args.requests} requests, {args.client_delay * 1000:.0f} ms per client, sync {args.threads} threads, async {args.concurrency} concurrent' )
+        print( f'{"":<6}{"req/s":>12}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}' )
+        report( 'sync', *run_sync( sync_path, token, args.requests, args.threads, args.client_delay ) )
+        report( 'async', *run_async( async_path, token, args.requests, args.concurrency, args.client_delay ) )
+
+
+if __name__ == '__main__':
+    main()
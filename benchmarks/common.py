@@ -0,0 +1,36 @@
+"""Helpers shared by the benchmarks that drive the Django project in-process"""
+
+import os
+from contextlib import contextmanager
+
+
+def setup_django( settings_module='task_manager.settings' ):
+    os.environ.setdefault( 'DJANGO_SETTINGS_MODULE', settings_module )
+
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    # Allows the `testserver` host and in-memory email, as in the test suite
+    setup_test_environment()
+
+
+@contextmanager
+def scratch_database():
+    """Create the schema in a throwaway test database, the configured database is never touched"""
+
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db( verbosity=0, autoclobber=True, serialize=False )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db( old_name, verbosity=0 )
+
+
+def percentile( sorted_values, fraction ):
+    if not sorted_values:
+        return 0.0
+    index = min( int( round( fraction * ( len( sorted_values ) - 1 ) ) ), len( sorted_values ) - 1 )
+    return sorted_values[index]
@@ -0,0 +1,132 @@
+"""
+Synthetic users, teams and memberships for the benchmarks.
+
+Team sizes follow a log-normal distribution around `team_size`, so most teams are
+small and a few are large. On top of that, `power_users` users are each in
+`power_user_teams` teams, like the managers and admins found in real workspaces.
+Rows are bulk inserted without signals, then the team counters are recomputed. The same seed
+gives the same data.
+"""
+
+import math
+import random
+
+BATCH_SIZE = 5000
+
+
+def generate( users=100_000, teams=10_000, team_size=20, team_size_sigma=1.0, power_users=50, power_user_teams=500, first_mate_ratio=0.1, seed=0 ):
+    """Insert the data and return a Dataset describing it"""
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from accounts.models import Team, TeamMembership
+
+    User = get_user_model()
+    rng = random.Random( seed )
+    Roles = TeamMembership.Roles
+
+    # Hashing is not what is measured, every user shares one hash
+    password = make_password( 'benchmark' )
+    user_rows = User.objects.bulk_create(
+        ( User( username=f'user{number}', password=password ) for number in range( users ) ),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = [ user.pk for user in user_rows ]
+
+    team_rows = Team.objects.bulk_create(
+        ( Team( name=f'Team {number}', slug=f'team-{number}' ) for number in range( teams ) ),
+        batch_size=BATCH_SIZE,
+    )
+    team_ids = [ team.pk for team in team_rows ]
+
+    # exp( mu + sigma² / 2 ) is the mean of the log-normal distribution
+    mu = math.log( team_size ) - team_size_sigma ** 2 / 2
+    members_by_team = {}
+    for team_id in team_ids:
+        size = min( max( int( rng.lognormvariate( mu, team_size_sigma ) ), 1 ), users )
+        members_by_team[team_id] = rng.sample( user_ids, size )
+
+    power_user_ids = user_ids[:power_users]
+    for user_id in power_user_ids:
+        for team_id in rng.sample( team_ids, min( power_user_teams, teams ) ):
+            members_by_team[team_id].append( user_id )
+
+    def memberships():
+        for team_id, member_ids in members_by_team.items():
+            seen = set()
+            for position, member_id in enumerate( member_ids ):
+                if member_id in seen:
+                    continue
+                seen.add( member_id )
+                if position == 0:
+                    role = Roles.CAPTAIN
+                elif rng.random() < first_mate_ratio:
+                    role = Roles.FIRST_MATE
+                else:
+                    role = Roles.MEMBER
+                yield TeamMembership( team_id=team_id, member_id=member_id, role=role )
+
+    membership_count = 0
+    batch = []
+    for membership in memberships():
+        batch.append( membership )
+        if len( batch ) == BATCH_SIZE:
+            TeamMembership.objects.bulk_create( batch )
+            membership_count += len( batch )
+            batch = []
+    TeamMembership.objects.bulk_create( batch )
+    membership_count += len( batch )
+    Team.objects.recount()
+
+    return Dataset( rng, user_ids, team_ids, power_user_ids, members_by_team, membership_count )
+
+
+class Dataset:
+    """What was generated, with helpers to draw request parameters from it"""
+
+    def __init__( self, rng, user_ids, team_ids, power_user_ids, members_by_team, membership_count ):
+        self.rng = rng
+        self.user_ids = user_ids
+        self.team_ids = team_ids
+        self.power_user_ids = power_user_ids
+        self.members_by_team = members_by_team
+        self.membership_count = membership_count
+        self.member_teams = [ team_id for team_id, member_ids in members_by_team.items() if len( set( member_ids ) ) > 1 ]
+        self.usernames = { user_id: f'user{number}' for number, user_id in enumerate( user_ids ) }
+        self.slugs = { team_id: f'team-{number}' for number, team_id in enumerate( team_ids ) }
+
+    def summary( self ):
+        sizes = sorted( len( set( member_ids ) ) for member_ids in self.members_by_team.values() )
+        return {
+            'users': len( self.user_ids ),
+            'teams': len( self.team_ids ),
+            'memberships': self.membership_count,
+            'power_users': len( self.power_user_ids ),
+            'largest_team': sizes[-1] if sizes else 0,
+            'median_team': sizes[len( sizes ) // 2] if sizes else 0,
+        }
+
+    def random_team( self ):
+        """A team id and one of its members"""
+        team_id = self.rng.choice( self.member_teams )
+        return team_id, self.rng.choice( self.members_by_team[team_id] )
+
+    def random_teammates( self ):
+        """Two different members of the same team"""
+        team_id = self.rng.choice( self.member_teams )
+        first, second = self.rng.sample( list( dict.fromkeys( self.members_by_team[team_id] ) ), 2 )
+        return first, second
+
+    def random_stranger( self, team_id ):
+        """A user who is not a member of the team"""
+        members = set( self.members_by_team[team_id] )
+        while True:
+            user_id = self.rng.choice( self.user_ids )
+            if user_id not in members:
+                return user_id
+
+    def random_member( self ):
+        return self.rng.choice( self.user_ids )
+
+    def random_power_user( self ):
+        return self.rng.choice( self.power_user_ids ) if self.power_user_ids else self.random_member()
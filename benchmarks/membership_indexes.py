@@ -0,0 +1,129 @@
+"""
+Lookup times on teams_membership before and after the indexes of migration 0002.
+
+Builds the table twice in a scratch SQLite database, once with the single column
+foreign key indexes of 0001 and once with the unique constraint and indexes of 0002, then times the query shapes used by the permission
+classes and the team views on the same data.
+
+Usage: python -m benchmarks.membership_indexes [--rows 1000000] [--lookups 2000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+
+BEFORE = (
+    'CREATE INDEX "teams_membership_member_id" ON "teams_membership" ("member_id")',
+    'CREATE INDEX "teams_membership_team_id" ON "teams_membership" ("team_id")',
+)
+AFTER = (
+    'CREATE UNIQUE INDEX "unique_team_member" ON "teams_membership" ("team_id", "member_id")',
+    'CREATE INDEX "membership_team_id_idx" ON "teams_membership" ("team_id", "id")',
+    'CREATE INDEX "membership_member_team_idx" ON "teams_membership" ("member_id", "team_id")',
+)
+
+QUERIES = {
+    # get_team_role()
+    'role lookup': (
+        'SELECT role FROM teams_membership WHERE team_id = ? AND member_id = ?',
+        lambda sample: ( sample['team'], sample['member'] ),
+    ),
+    # TeamList.get, first page of request.user.teams ordered by ( created, id )
+    'user teams': (
+        'SELECT teams.id FROM teams INNER JOIN teams_membership ON teams.id = teams_membership.team_id '
+        'WHERE teams_membership.member_id = ? ORDER BY teams.created, teams.id LIMIT 51',
+        lambda sample: ( sample['member'], ),
+    ),
+    # TeamDetail.get / TeamMembers.get, first page of members
+    'team members': (
+        'SELECT id, member_id, role FROM teams_membership WHERE team_id = ? ORDER BY id LIMIT 51',
+        lambda sample: ( sample['team'], ),
+    ),
+    # TeamManager.add_members, members already in the team
+    'existing members': (
+        'SELECT member_id FROM teams_membership WHERE team_id = ? AND member_id IN ( ?, ?, ? )',
+        lambda sample: ( sample['team'], sample['member'], uuid.uuid4().hex, uuid.uuid4().hex ),
+    ),
+}
+
+
+def generate_memberships( rows, seed=0 ):
+    """
+    ( team_id, member_id, role ) rows with a skewed distribution: a few huge teams and
+    power users that belong to thousands of teams, like the tenants that hurt the most.
+    """
+    rng = random.Random( seed )
+    teams = max( rows // 20, 1 )
+    users = [ uuid.UUID( int=rng.getrandbits( 128 ) ).hex for _ in range( max( rows // 5, 1 ) ) ]
+    power_users = users[:max( len( users ) // 1000, 1 )]
+
+    seen = set()
+    while len( seen ) < rows:
+        team = min( int( rng.paretovariate( 1.2 ) ), teams )
+        team = rng.randrange( 1, teams + 1 ) if rng.random() < 0.7 else team
+        member = rng.choice( power_users ) if rng.random() < 0.05 else rng.choice( users )
+        if ( team, member ) in seen:
+            continue
+        seen.add( ( team, member ) )
+        yield team, member, 'C' if len( seen ) <= teams else rng.choice( ( 'FM', 'M', 'M', 'M' ) )
+
+
+def build( path, memberships, indexes ):
+    connection = sqlite3.connect( path )
+    connection.executescript( '''
+        CREATE TABLE "teams" ( "id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "created" datetime NOT NULL );
+        CREATE TABLE "teams_membership" (
+            "id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "role" varchar(2) NOT NULL,
+            "member_id" char(32) NOT NULL, "team_id" bigint NOT NULL
+        );
+    ''' )
+    teams = max( team for team, _, _ in memberships )
+    connection.executemany( 'INSERT INTO teams ( id, created ) VALUES ( ?, ? )', ( ( team, f'2024-01-01 00:00:{team:06d}' ) for team in range( 1, teams + 1 ) ) )
+    connection.executemany( 'INSERT INTO teams_membership ( team_id, member_id, role ) VALUES ( ?, ?, ? )', memberships )
+    for statement in indexes:
+        connection.execute( statement )
+    connection.commit()
+    connection.execute( 'ANALYZE' )
+    return connection
+
+
+def time_queries( connection, samples ):
+    results = {}
+    for name, ( sql, params ) in QUERIES.items():
+        start = time.perf_counter()
+        for sample in samples:
+            connection.execute( sql, params( sample ) ).fetchall()
+        results[name] = ( time.perf_counter() - start ) / len( samples ) * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--rows', type=int, default=1_000_000 )
+    parser.add_argument( '--lookups', type=int, default=2000 )
+    args = parser.parse_args()
+
+    memberships = list( generate_memberships( args.rows ) )
+    rng = random.Random( 1 )
+    samples = [ dict( zip( ( 'team', 'member' ), rng.choice( memberships )[:2] ) ) for _ in range( args.lookups ) ]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for label, indexes in ( ( 'before', BEFORE ), ( 'after', AFTER ) ):
+            connection = build( os.path.join( directory, f'{label}.sqlite3' ), memberships, indexes )
+            results[label] = time_queries( connection, samples )
+            connection.close()
+
+    print( f'{args.rows:,} memberships, {args.lookups:,} lookups per query, mean time per query' )
+    print( f'{"query":<18}{"before (us)":>14}{"after (us)":>14}{"speedup":>10}' )
+    for name in QUERIES:
+        before, after = results['before'][name], results['after'][name]
+        print( f'{name:<18}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Cost of turning a team and its members into a JSON response body, per 1,000 members.
+
+Compares the model serializers ( TeamSerializer over Team.objects.with_members(), UserSerializer
+over User instances ) and DRF's stdlib JSONRenderer with what the workspace ( TeamList.get ) runs:
+get_members_rows(), get_workspace_members() and the row serializers of accounts.serializers over
+.values() rows, rendered by task_manager.renderers.FastJSONRenderer. The workspace embeds
+WORKSPACE_MEMBERS_PER_TEAM members per team, the cap is lifted to --members here to measure the
+cost per member. Loading is timed apart from serializing and rendering, each step is the median
+of --repeat runs.
+
+Usage: python -m benchmarks.serialization [--members 1000] [--repeat 20]
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks.common import scratch_database, setup_django
+
+
+def median_time( function, repeat ):
+    timings = []
+    for _ in range( repeat ):
+        start = time.perf_counter()
+        function()
+        timings.append( time.perf_counter() - start )
+    return statistics.median( timings )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--members', type=int, default=1000 )
+    parser.add_argument( '--repeat', type=int, default=20 )
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.test import RequestFactory
+    from rest_framework.renderers import JSONRenderer
+    from accounts.models import Team, TeamMembership
+    from accounts.serializers import TeamSerializer, UserSerializer, TeamRowSerializer, TeamMemberRowSerializer, UserRowSerializer
+    from accounts.views import get_members_rows, get_workspace_members
+    from task_manager import renderers
+
+    User = get_user_model()
+
+    with scratch_database():
+        users = User.objects.bulk_create(
+            User( username=f'user{number}', first_name='First', last_name=f'Last {number}', email=f'user{number}@example.com', password='!' )
+            for number in range( args.members )
+        )
+        team = Team.objects.create( name='Benchmark', slug='benchmark' )
+        TeamMembership.objects.bulk_create( TeamMembership( team=team, member=user ) for user in users )
+        teams = Team.objects.filter( pk=team.pk )
+
+        def model_team():
+            return list( teams.with_members() )
+
+        def row_team():
+            members = get_members_rows( [ team.pk ], TeamMemberRowSerializer(), limit=args.members )
+            return list( teams.values( *TeamRowSerializer().columns ) ), list( members )
+
+        def row_serialize():
+            member_serializer = TeamMemberRowSerializer()
+            members, members_next = get_workspace_members( request, rows, member_rows, member_serializer, limit=args.members )
+            return TeamRowSerializer().many( rows, members, members_next )
+
+        request = RequestFactory().get( '/auth/workspace' )
+        instances = model_team()
+        rows, member_rows = row_team()
+        model_data = TeamSerializer( instances, many=True ).data
+        row_data = row_serialize()
+        user_instances = list( User.objects.all() )
+        user_rows = list( User.objects.values( *UserRowSerializer().columns ) )
+
+        steps = {
+            'team: load': ( model_team, row_team ),
+            # Grouping the members by team is part of serializing them
+            'team: serialize': ( lambda: TeamSerializer( instances, many=True ).data, row_serialize ),
+            'team: render': ( lambda: JSONRenderer().render( model_data ), lambda: renderers.FastJSONRenderer().render( row_data ) ),
+            'users: serialize': ( lambda: UserSerializer( user_instances, many=True ).data, lambda: UserRowSerializer().many( user_rows ) ),
+        }
+        results = { name: [ median_time( function, args.repeat ) for function in pair ] for name, pair in steps.items() }
+
+    per_thousand = 1000 / args.members
+    print( f'{args.members} members, ms per 1,000 members, orjson {"installed" if renderers.orjson else "missing"}' )
+    print( f'{"":<20}{"before":>10}{"after":>10}{"speedup":>10}' )
+    for name, ( before, after ) in results.items():
+        print( f'{name:<20}{before * 1000 * per_thousand:>10.2f}{after * 1000 * per_thousand:>10.2f}{before / after:>9.1f}x' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Worker startup time and per-request overhead of the default and API_ONLY settings profiles.
+
+Each run is a fresh interpreter, as a new worker would be. It times importing Django and the
+settings, django.setup() ( loading the apps ), building the WSGI handler ( loading the middleware )
+and the URLconf, counts the modules imported by then, and times unauthenticated requests to
+`auth/workspace`, answered with a 401 by the JWT authentication without touching the database,
+to isolate the middleware and DRF overhead. Each figure is the median of --repeat runs.
+
+Usage: python -m benchmarks.startup [--repeat 10] [--requests 2000]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROFILES = { 'default': 'False', 'API_ONLY': 'True' }
+STEPS = ( 'import', 'setup', 'handler', 'urls' )
+
+
+def measure( requests ):
+    """Runs in the child interpreter, prints its timings as JSON"""
+
+    start = time.perf_counter()
+    import django
+    from django.conf import settings
+    settings.INSTALLED_APPS
+    timings = { 'import': time.perf_counter() - start }
+
+    django.setup()
+    timings['setup'] = time.perf_counter() - start
+
+    from django.core.wsgi import get_wsgi_application
+    get_wsgi_application()
+    timings['handler'] = time.perf_counter() - start
+
+    from django.urls import get_resolver, reverse
+    get_resolver().url_patterns
+    timings['urls'] = time.perf_counter() - start
+    modules = len( sys.modules )
+
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    client = Client()
+    url = reverse( 'workspace' )
+    for _ in range( 50 ):
+        client.get( url )
+    request_start = time.perf_counter()
+    for _ in range( requests ):
+        assert client.get( url ).status_code == 401
+    timings['request'] = ( time.perf_counter() - request_start ) / requests
+
+    print( json.dumps( { 'timings': timings, 'modules': modules } ) )
+
+
+def run_profile( api_only, requests ):
+    environment = { **os.environ, 'API_ONLY': api_only, 'DJANGO_SETTINGS_MODULE': 'task_manager.settings' }
+    output = subprocess.run(
+        [ sys.executable, '-m', 'benchmarks.startup', '--child', '--requests', str( requests ) ],
+        env=environment, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads( output.splitlines()[-1] )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--repeat', type=int, default=10 )
+    parser.add_argument( '--requests', type=int, default=2000 )
+    parser.add_argument( '--child', action='store_true', help=argparse.SUPPRESS )
+    args = parser.parse_args()
+
+    if args.child:
+        measure( args.requests )
+        return
+
+    results = {}
+    for name, api_only in PROFILES.items():
+        runs = [ run_profile( api_only, args.requests ) for _ in range( args.repeat ) ]
+        results[name] = {
+            **{ step: statistics.median( run['timings'][step] for run in runs ) for step in ( *STEPS, 'request' ) },
+            'modules': statistics.median( run['modules'] for run in runs ),
+        }
+
+    print( f'median of {args.repeat} runs, startup steps are cumulative ms' )
+    print( f'{"":<22}' + ''.join( f'{name:>12}' for name in results ) )
+    for step in STEPS:
+        print( f'{step:<22}' + ''.join( f'{result[step] * 1000:>12.1f}' for result in results.values() ) )
+    print( f'{"modules imported":<22}' + ''.join( f'{result["modules"]:>12.0f}' for result in results.values() ) )
+    print( f'{"request ( µs )":<22}' + ''.join( f'{result["request"] * 1e6:>12.1f}' for result in results.values() ) )
+
+
+if __name__ == '__main__':
+    main()
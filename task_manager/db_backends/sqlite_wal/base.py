@@ -0,0 +1,31 @@
+"""
+SQLite in WAL mode, the local stand-in for PostgreSQL.
+
+In WAL mode readers don't block the writer and the writer doesn't block readers,
+so several workers ( or test threads ) can share the database file. Writes are still
+serialized, which is why production runs on PostgreSQL.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper( base.DatabaseWrapper ):
+    # Overridable per database with a PRAGMAS dict next to ENGINE/NAME
+    pragmas = {
+        'journal_mode': 'WAL',
+        # Durable across application crashes, only an OS crash can lose the last transactions
+        'synchronous': 'NORMAL',
+        # Wait for the write lock instead of failing with "database is locked"
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+        # Negative is KiB: 64 MiB of page cache per connection
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+    }
+
+    def get_new_connection( self, conn_params ):
+        connection = super().get_new_connection( conn_params )
+        pragmas = { **self.pragmas, **self.settings_dict.get( 'PRAGMAS', {} ) }
+        for name, value in pragmas.items():
+            connection.execute( f'PRAGMA {name} = {value}' )
+        return connection
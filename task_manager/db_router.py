@@ -0,0 +1,142 @@
+"""
+Read replicas with read-your-writes.
+
+With DB_REPLICAS set, ReplicaRouter sends the reads of GET, HEAD and OPTIONS requests to one of
+the replicas, picked at random per request, and every write to the primary ( default ). Replicas
+lag behind the primary, so once a request has written, the user's reads stay on the primary for
+REPLICA_PIN_SECONDS and a member just added shows up in the very next GET. Pins are kept in the
+REPLICA_PIN_CACHE_ALIAS cache, which must be shared ( e.g. Redis ) between workers.
+
+Reads go to the primary outside of requests ( commands, the purge workers ), in other methods,
+inside transactions and within `primary()`. Use the latter for reads that are cached afterwards,
+a representation built from a lagging replica would outlive the lag.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject
+
+SAFE_METHODS = ( 'GET', 'HEAD', 'OPTIONS' )
+
+_routing = ContextVar( 'replica_routing', default=None )
+_primary_only = ContextVar( 'replica_primary_only', default=False )
+
+
+def pin_cache():
+    return caches[settings.REPLICA_PIN_CACHE_ALIAS]
+
+
+def _pin_key( user_id ):
+    return f'replica-pin:{user_id}'
+
+
+def _user_id( request ):
+    # DRF sets the user on the Django request once authenticated. Before that it is the lazy
+    # session user, which must not be evaluated here: it would query from inside the router
+    user = request.__dict__.get( 'user' )
+    if user is None or isinstance( user, SimpleLazyObject ) or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+@contextmanager
+def primary():
+    """Read from the primary within the block"""
+
+    token = _primary_only.set( True )
+    try:
+        yield
+    finally:
+        _primary_only.reset( token )
+
+
+class RequestRouting:
+    """Routing of one request: the replica it reads from, and whether it wrote"""
+
+    def __init__( self, request ):
+        self.request = request
+        replicas = settings.DATABASE_REPLICAS
+        self.replica = random.choice( replicas ) if replicas and request.method in SAFE_METHODS else None
+        self.pinned = None
+        self.wrote = False
+
+    def read_alias( self ):
+        if self.replica is None or _primary_only.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if self.pinned is None:
+            user_id = _user_id( self.request )
+            if user_id is None:
+                # Not authenticated yet, asked again once the user is known
+                return self.replica
+            self.pinned = bool( pin_cache().get( _pin_key( user_id ) ) )
+        return DEFAULT_DB_ALIAS if self.pinned else self.replica
+
+
+class ReplicaRouter:
+
+    def db_for_read( self, model, **hints ):
+        routing = _routing.get()
+        return DEFAULT_DB_ALIAS if routing is None else routing.read_alias()
+
+    def db_for_write( self, model, **hints ):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation( self, obj1, obj2, **hints ):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate( self, db, app_label, model_name=None, **hints ):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Routes the reads of each request, and pins the user to the primary after a write.
+    Async views reach the router from sync_to_async's threads, which share the request's context.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__( self, get_response ):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction( get_response )
+        if self.async_mode:
+            markcoroutinefunction( self )
+
+    def __call__( self, request ):
+        if self.async_mode:
+            return self.__acall__( request )
+        with self.route( request ) as routing:
+            response = self.get_response( request )
+
+        user_id = _user_id( request ) if routing.wrote else None
+        if user_id is not None:
+            pin_cache().set( _pin_key( user_id ), True, settings.REPLICA_PIN_SECONDS )
+        return response
+
+    async def __acall__( self, request ):
+        with self.route( request ) as routing:
+            response = await self.get_response( request )
+
+        user_id = _user_id( request ) if routing.wrote else None
+        if user_id is not None:
+            await pin_cache().aset( _pin_key( user_id ), True, settings.REPLICA_PIN_SECONDS )
+        return response
+
+    @contextmanager
+    def route( self, request ):
+        routing = RequestRouting( request )
+        token = _routing.set( routing )
+        try:
+            yield routing
+        finally:
+            _routing.reset( token )
@@ -0,0 +1,250 @@
+"""
+Per-request instrumentation: SQL query count and time, permission and serialization time.
+
+InstrumentationMiddleware measures every request, sync or async, and adds it to the process-wide
+`registry`, served in the Prometheus text format by `metrics_view`. With SERVER_TIMING on, the
+numbers are also sent back in a `Server-Timing` header, which browsers show in their network panel.
+InstrumentedViewMixin and InstrumentedSerializerMixin time the DRF parts of a request.
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import Signal, receiver
+from django.http import HttpResponse
+
+# Upper bounds of the request duration histogram, in seconds
+DURATION_BUCKETS = ( 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0 )
+
+# Sent once a request is measured, with view_name, method, status and metrics ( a RequestMetrics ).
+# See task_manager.testing.QueryBudgetMixin
+request_measured = Signal()
+
+_current_metrics = ContextVar( 'request_metrics', default=None )
+
+
+class RequestMetrics:
+    """What one request spent. `timings` holds seconds by part, e.g. permissions or serialization"""
+
+    def __init__( self ):
+        self.queries = 0
+        self.db_time = 0.0
+        self.total_time = 0.0
+        self.timings = defaultdict( float )
+        self._running = set()
+
+    def record_query( self, execute, sql, params, many, context ):
+        start = perf_counter()
+        try:
+            return execute( sql, params, many, context )
+        finally:
+            self.db_time += perf_counter() - start
+            self.queries += 1
+
+    def server_timing( self ):
+        parts = [ f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"' ]
+        parts += [ f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.timings.items() ]
+        parts.append( f'total;dur={self.total_time * 1000:.2f}' )
+        return ', '.join( parts )
+
+
+def current_metrics():
+    """RequestMetrics of the request being handled, None outside of the middleware"""
+    return _current_metrics.get()
+
+
+@contextmanager
+def timed( name ):
+    """
+    Add the time spent in the block to the current request under `name`.
+    Nested blocks with the same name are counted once, by the outermost one.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None or name in metrics._running:
+        yield
+        return
+
+    metrics._running.add( name )
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += perf_counter() - start
+        metrics._running.discard( name )
+
+
+class MetricsRegistry:
+    """In-process totals by view, method and status, thread safe"""
+
+    def __init__( self ):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe( self, view_name, method, status, metrics ):
+        key = ( view_name, method, str( status ) )
+        with self._lock:
+            series = self._series.setdefault( key, {
+                'count': 0, 'duration': 0.0, 'queries': 0, 'db': 0.0,
+                'timings': defaultdict( float ), 'buckets': [ 0 ] * len( DURATION_BUCKETS ),
+            } )
+            series['count'] += 1
+            series['duration'] += metrics.total_time
+            series['queries'] += metrics.queries
+            series['db'] += metrics.db_time
+            for name, seconds in metrics.timings.items():
+                series['timings'][name] += seconds
+            for position, bound in enumerate( DURATION_BUCKETS ):
+                if metrics.total_time <= bound:
+                    series['buckets'][position] += 1
+
+    def reset( self ):
+        with self._lock:
+            self._series.clear()
+
+    def render( self ):
+        """Prometheus text exposition format"""
+
+        with self._lock:
+            series = sorted( ( key, { **values, 'timings': dict( values['timings'] ), 'buckets': list( values['buckets'] ) } ) for key, values in self._series.items() )
+
+        lines = []
+
+        def family( name, kind, help_text, samples ):
+            lines.append( f'# HELP {name} {help_text}' )
+            lines.append( f'# TYPE {name} {kind}' )
+            lines.extend( samples )
+
+        def labels( key, **extra ):
+            view_name, method, status = key
+            pairs = { 'view': view_name, 'method': method, 'status': status, **extra }
+            return '{' + ','.join( f'{label}="{_escape( value )}"' for label, value in pairs.items() ) + '}'
+
+        family( 'http_requests_total', 'counter', 'Requests handled.', [
+            f'http_requests_total{labels( key )} {values["count"]}' for key, values in series
+        ] )
+
+        duration_samples = []
+        for key, values in series:
+            for bound, count in zip( DURATION_BUCKETS, values['buckets'] ):
+                duration_samples.append( f'http_request_duration_seconds_bucket{labels( key, le=str( bound ) )} {count}' )
+            duration_samples.append( f'http_request_duration_seconds_bucket{labels( key, le="+Inf" )} {values["count"]}' )
+            duration_samples.append( f'http_request_duration_seconds_sum{labels( key )} {values["duration"]:.6f}' )
+            duration_samples.append( f'http_request_duration_seconds_count{labels( key )} {values["count"]}' )
+        family( 'http_request_duration_seconds', 'histogram', 'Time to handle a request.', duration_samples )
+
+        family( 'db_queries_total', 'counter', 'SQL queries run by requests.', [
+            f'db_queries_total{labels( key )} {values["queries"]}' for key, values in series
+        ] )
+        family( 'db_duration_seconds_total', 'counter', 'Time spent running SQL queries.', [
+            f'db_duration_seconds_total{labels( key )} {values["db"]:.6f}' for key, values in series
+        ] )
+        family( 'view_part_duration_seconds_total', 'counter', 'Time spent in parts of the views, e.g. permissions or serialization.', [
+            f'view_part_duration_seconds_total{labels( key, part=name )} {seconds:.6f}'
+            for key, values in series for name, seconds in sorted( values['timings'].items() )
+        ] )
+        return '\n'.join( lines ) + '\n'
+
+
+def _escape( value ):
+    return str( value ).replace( '\\', '\\\\' ).replace( '"', '\\"' ).replace( '\n', '\\n' )
+
+
+registry = MetricsRegistry()
+
+
+def record_query( execute, sql, params, many, context ):
+    """Execute wrapper of every connection, counts the query for the request being handled if any"""
+
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute( sql, params, many, context )
+    return metrics.record_query( execute, sql, params, many, context )
+
+
+@receiver( connection_created )
+def instrument_connection( connection, **kwargs ):
+    """
+    Every connection keeps record_query: connections belong to threads and async views query from
+    sync_to_async's, which still see the request's metrics through the context
+    """
+    if record_query not in connection.execute_wrappers:
+        # First, an execute_wrapper() block the connect happens in pops the last one
+        connection.execute_wrappers.insert( 0, record_query )
+
+
+class InstrumentationMiddleware:
+    """Measure each request. Goes first in MIDDLEWARE so the total includes the other middleware"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__( self, get_response ):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction( get_response )
+        if self.async_mode:
+            markcoroutinefunction( self )
+        # Opened before this module was loaded
+        for connection in connections.all( initialized_only=True ):
+            instrument_connection( connection )
+
+    def __call__( self, request ):
+        if self.async_mode:
+            return self.__acall__( request )
+        metrics = RequestMetrics()
+        with self.measure( metrics ):
+            response = self.get_response( request )
+        return self.record( request, response, metrics )
+
+    async def __acall__( self, request ):
+        metrics = RequestMetrics()
+        with self.measure( metrics ):
+            response = await self.get_response( request )
+        return self.record( request, response, metrics )
+
+    @contextmanager
+    def measure( self, metrics ):
+        token = _current_metrics.set( metrics )
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            metrics.total_time = perf_counter() - start
+            _current_metrics.reset( token )
+
+    def record( self, request, response, metrics ):
+        view_name = getattr( request.resolver_match, 'view_name', None ) or 'unmatched'
+        registry.observe( view_name, request.method, response.status_code, metrics )
+        if getattr( settings, 'SERVER_TIMING', False ):
+            response['Server-Timing'] = metrics.server_timing()
+        request_measured.send( sender=self.__class__, view_name=view_name, method=request.method, status=response.status_code, metrics=metrics )
+        return response
+
+
+class InstrumentedViewMixin:
+    """Times the permission checks of a DRF view"""
+
+    def check_permissions( self, request ):
+        with timed( 'permissions' ):
+            return super().check_permissions( request )
+
+    def check_object_permissions( self, request, obj ):
+        with timed( 'permissions' ):
+            return super().check_object_permissions( request, obj )
+
+
+class InstrumentedSerializerMixin:
+    """Times turning instances into data, nested serializers included once"""
+
+    def to_representation( self, instance ):
+        with timed( 'serialization' ):
+            return super().to_representation( instance )
+
+
+def metrics_view( request ):
+    return HttpResponse( registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8' )
@@ -0,0 +1,137 @@
+"""
+Token-bucket rate limiting for the endpoints that hash passwords.
+
+Each scope of RATE_LIMITS has a bucket per client IP and one per username, e.g. '10/min' holds
+10 tokens and gets one back every 6 seconds. A request takes a token from each bucket, an empty
+bucket answers 429 with a Retry-After header. RateLimitMixin checks the buckets before DRF
+authenticates the request ( BasicAuthentication hashes the password ) and before the view runs,
+so a throttled request is turned away without hashing, querying the database or, when the IP
+bucket is empty, parsing the body. The client IP is DRF's, REMOTE_ADDR unless NUM_PROXIES says
+how many proxies' X-Forwarded-For entries to trust. Password changes take the username bucket of
+the authenticated user once authenticated instead: keyed on the URL before authentication, anyone
+could empty it and lock the user out.
+
+Buckets are kept per process ( RATE_LIMIT_BACKEND=local ) or in the RATE_LIMIT_CACHE_ALIAS cache
+( RATE_LIMIT_BACKEND=cache ), which shares them between workers. A bucket takes a few dozen bytes
+and is dropped once it would be full again, so memory follows the keys seen within the period.
+Cached buckets are read and written without a lock, concurrent requests may both take the last
+token of one: the shared limits are approximate.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = { 's': 1, 'm': 60, 'h': 3600, 'd': 86400 }
+USERNAME_MAX_LENGTH = 150
+
+
+def parse_rate( rate ):
+    """'10/min' as ( capacity, seconds to refill the whole bucket ), same format as DRF's throttle rates"""
+
+    number, period = rate.split( '/' )
+    return int( number ), PERIODS[period[0]]
+
+
+def take_token( bucket, capacity, period, now ):
+    """
+    Take a token from a ( tokens, updated ) bucket, None for a full one.
+    Returns the new bucket and the seconds to wait, 0 when the token was taken.
+    """
+
+    tokens, updated = bucket or ( capacity, now )
+    tokens = min( capacity, tokens + ( now - updated ) * capacity / period )
+    if tokens < 1:
+        return ( tokens, now ), ( 1 - tokens ) * period / capacity
+    return ( tokens - 1, now ), 0
+
+
+class LocalBuckets:
+    """Buckets of this process, by limit, least recently used first"""
+
+    def __init__( self ):
+        self.limits = {}
+        self.lock = threading.Lock()
+
+    def take( self, limit, key, capacity, period ):
+        now = time.monotonic()
+        with self.lock:
+            buckets = self.limits.setdefault( limit, OrderedDict() )
+            # A bucket untouched for a whole period is full again, it is the same as no bucket
+            while buckets:
+                oldest = next( iter( buckets.values() ) )
+                if now - oldest[1] < period:
+                    break
+                buckets.popitem( last=False )
+
+            buckets[key], wait = take_token( buckets.pop( key, None ), capacity, period, now )
+            return wait
+
+    def clear( self ):
+        with self.lock:
+            self.limits.clear()
+
+
+class CacheBuckets:
+    """Buckets in a cache shared by the workers, they expire once full again"""
+
+    def take( self, limit, key, capacity, period ):
+        cache = caches[settings.RATE_LIMIT_CACHE_ALIAS]
+        cache_key = f'ratelimit:{limit}:{hashlib.blake2b( key.encode(), digest_size=16 ).hexdigest()}'
+        # Wall clock time, the buckets are shared between machines
+        bucket, wait = take_token( cache.get( cache_key ), capacity, period, time.time() )
+        cache.set( cache_key, bucket, period )
+        return wait
+
+
+local_buckets = LocalBuckets()
+cache_buckets = CacheBuckets()
+
+
+def get_buckets():
+    return cache_buckets if settings.RATE_LIMIT_BACKEND == 'cache' else local_buckets
+
+
+def check_rate( scope, kind, value ):
+    """Take a token from the bucket of `value`, raises Throttled when it is empty"""
+
+    rate = settings.RATE_LIMITS.get( scope, {} ).get( kind )
+    if not rate or value is None:
+        return
+    capacity, period = parse_rate( rate )
+    wait = get_buckets().take( f'{scope}:{kind}', str( value )[:USERNAME_MAX_LENGTH], capacity, period )
+    if wait:
+        # Rounded up to whole seconds for Retry-After
+        raise Throttled( wait=wait )
+
+
+class RateLimitMixin:
+    """
+    APIView mixin limiting the requests of `rate_limit_methods` with the RATE_LIMITS of `rate_limit_scope`,
+    before authentication. get_rate_limit_username() gives the username the request is about.
+    With `rate_limit_authenticated`, the username bucket is the authenticated user's and is taken once
+    authentication and permissions passed, so nobody else can empty it.
+    """
+
+    rate_limit_scope = None
+    rate_limit_methods = ( 'POST', )
+    rate_limit_authenticated = False
+
+    def get_rate_limit_username( self, request, *args, **kwargs ):
+        data = request.data
+        return data.get( 'username' ) if hasattr( data, 'get' ) else None
+
+    def initial( self, request, *args, **kwargs ):
+        limited = request.method in self.rate_limit_methods
+        if limited:
+            check_rate( self.rate_limit_scope, 'ip', BaseThrottle().get_ident( request ) )
+            if not self.rate_limit_authenticated:
+                check_rate( self.rate_limit_scope, 'username', self.get_rate_limit_username( request, *args, **kwargs ) )
+        super().initial( request, *args, **kwargs )
+        if limited and self.rate_limit_authenticated and request.user.is_authenticated:
+            check_rate( self.rate_limit_scope, 'username', request.user.get_username() )
@@ -0,0 +1,59 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+orjson encodes and decodes several times faster than the json module and goes straight to
+bytes. Without it, or when indented output is asked for ( the browsable API ), both fall back to
+DRF's stdlib implementation. Output matches DRF's: datetimes, dates and times still go through
+DRF's encoder, which shortens microseconds and writes UTC as Z, and U+2028 and U+2029 are escaped.
+"""
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer( JSONRenderer ):
+
+    def render( self, data, accepted_media_type=None, renderer_context=None ):
+        if orjson is None or data is None or self.get_indent( accepted_media_type, renderer_context or {} ):
+            return super().render( data, accepted_media_type, renderer_context )
+
+        # Non string keys as the json module writes them, e.g. the indexes of ListField errors
+        rendered = orjson.dumps( data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS )
+        # Valid JSON but not valid JavaScript, escaped like DRF does
+        return rendered.replace( b'\xe2\x80\xa8', b'\\u2028' ).replace( b'\xe2\x80\xa9', b'\\u2029' )
+
+
+class FastJSONParser( JSONParser ):
+    renderer_class = FastJSONRenderer
+
+    def parse( self, stream, media_type=None, parser_context=None ):
+        if orjson is None:
+            return super().parse( stream, media_type, parser_context )
+
+        try:
+            # orjson only reads UTF-8, the only encoding JSON allows
+            return orjson.loads( stream.read() )
+        except orjson.JSONDecodeError as error:
+            raise ParseError( f'JSON parse error - {error}' )
+
+
+class EventStreamRenderer( BaseRenderer ):
+    """
+    Lets views that stream Server-Sent Events themselves accept text/event-stream.
+    Anything they answer with a Response, errors included, becomes a single `error` event.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render( self, data, accepted_media_type=None, renderer_context=None ):
+        return b'event: error\ndata: ' + FastJSONRenderer().render( data ) + b'\n\n'
@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import django
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,6 +28,10 @@ SECRET_KEY = config("SECRET_KEY")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=False, cast=bool)
 
+# API-only profile: clients authenticate with JWT, so the admin, sessions, messages, static files,
+# templates, the browsable API and their middleware are left out. Workers import and run less
+API_ONLY = config( 'API_ONLY', default=False, cast=bool )
+
 ALLOWED_HOSTS = config("ALLOWED_HOSTS", cast=lambda v: [s.strip() for s in v.split(',')])
 
 X_FRAME_OPTIONS = 'SAMEORIGIN'
@@ -62,6 +68,7 @@ INSTALLED_APPS = [
 
     'rest_framework',
     'accounts',
+    'tasks',
     'corsheaders',
 ]
 
@@ -71,11 +78,26 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'accounts.authentication.CachedJWTAuthentication',
+    ),
+    # orjson backed when it is installed, see task_manager.renderers
+    'DEFAULT_RENDERER_CLASSES': (
+        'task_manager.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'task_manager.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Proxies in front of the app that append to X-Forwarded-For. The client IP of the rate limits and throttles
+    # is the address that many hops back, with 0 X-Forwarded-For is ignored: clients set it to whatever they like
+    'NUM_PROXIES': config( 'NUM_PROXIES', default=0, cast=int ),
 }
 
 MIDDLEWARE = [
+    'task_manager.instrumentation.InstrumentationMiddleware',
+    'task_manager.db_router.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -88,6 +110,12 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'task_manager.urls'
 
+# Instrumentation, see task_manager.instrumentation
+# Query count and timings in a Server-Timing header on every response. Tells clients about the internals, keep it off in production
+SERVER_TIMING = config( 'SERVER_TIMING', default=DEBUG, cast=bool )
+# Serve the metrics in the Prometheus text format under /metrics, keep it unreachable from outside
+METRICS_ENDPOINT = config( 'METRICS_ENDPOINT', default=False, cast=bool )
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -104,19 +132,153 @@ TEMPLATES = [
     },
 ]
 
+if API_ONLY:
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS
+        if app not in ( 'django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages', 'django.contrib.staticfiles' )
+    ]
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware not in (
+            'django.contrib.sessions.middleware.SessionMiddleware',
+            'django.middleware.csrf.CsrfViewMiddleware',
+            'django.contrib.auth.middleware.AuthenticationMiddleware',
+            'django.contrib.messages.middleware.MessageMiddleware',
+            'django.middleware.clickjacking.XFrameOptionsMiddleware',
+        )
+    ]
+    TEMPLATES = []
+    REST_FRAMEWORK = {
+        **REST_FRAMEWORK,
+        'DEFAULT_AUTHENTICATION_CLASSES': ( 'accounts.authentication.CachedJWTAuthentication', ),
+        'DEFAULT_RENDERER_CLASSES': ( 'task_manager.renderers.FastJSONRenderer', ),
+    }
+
 WSGI_APPLICATION = 'task_manager.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# DB_ENGINE selects the profile:
+#   sqlite      single file, fine for development
+#   sqlite-wal  SQLite in WAL mode with tuned pragmas, the local stand-in for PostgreSQL
+#   postgresql  production, with persistent connections and optional pooling
+
+DB_ENGINE = config( 'DB_ENGINE', default='sqlite' )
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config( 'DB_NAME' ),
+            'USER': config( 'DB_USER', default='' ),
+            'PASSWORD': config( 'DB_PASSWORD', default='' ),
+            'HOST': config( 'DB_HOST', default='' ),
+            'PORT': config( 'DB_PORT', default='' ),
+            # Reuse connections across requests instead of connecting for every one
+            'CONN_MAX_AGE': config( 'DB_CONN_MAX_AGE', default=60, cast=int ),
+            # Check a reused connection is still alive before the first query of a request
+            'CONN_HEALTH_CHECKS': config( 'DB_CONN_HEALTH_CHECKS', default=True, cast=bool ),
+            # Required behind a transaction pooler such as PgBouncer
+            'DISABLE_SERVER_SIDE_CURSORS': config( 'DB_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool ),
+            'OPTIONS': {},
+        }
+    }
+
+    DB_POOL_MAX_SIZE = config( 'DB_POOL_MAX_SIZE', default=0, cast=int )
+    if DB_POOL_MAX_SIZE:
+        if django.VERSION < ( 5, 1 ):
+            raise ImproperlyConfigured( 'DB_POOL_MAX_SIZE needs Django 5.1+ and psycopg 3, use PgBouncer on older versions' )
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config( 'DB_POOL_MIN_SIZE', default=2, cast=int ),
+            'max_size': DB_POOL_MAX_SIZE,
+        }
+        # The pool owns the connections
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+
+elif DB_ENGINE in ( 'sqlite', 'sqlite-wal' ):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'task_manager.db_backends.sqlite_wal' if DB_ENGINE == 'sqlite-wal' else 'django.db.backends.sqlite3',
+            'NAME': config( 'DB_NAME', default=str( BASE_DIR / 'db.sqlite3' ) ),
+            'CONN_MAX_AGE': config( 'DB_CONN_MAX_AGE', default=0, cast=int ),
+            'TEST': {
+                # A file is needed for WAL, tests use an in-memory database otherwise
+                'NAME': config( 'DB_TEST_NAME', default=None ),
+            },
+        }
+    }
+
+else:
+    raise ImproperlyConfigured( f'Unknown DB_ENGINE {DB_ENGINE!r}, expected sqlite, sqlite-wal or postgresql' )
+
+# Read replicas, hosts for postgresql or files for sqlite, see task_manager.db_router.
+# Safe-method reads go to a replica, until the user writes: then to the primary for REPLICA_PIN_SECONDS
+DB_REPLICAS = config( 'DB_REPLICAS', default='', cast=lambda v: [ s.strip() for s in v.split( ',' ) if s.strip() ] )
+
+for number, replica in enumerate( DB_REPLICAS, start=1 ):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        ( 'HOST' if DB_ENGINE == 'postgresql' else 'NAME' ): replica,
+        # Tests have no replication, replicas read the test database
+        'TEST': { 'MIRROR': 'default' },
+    }
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DATABASE_REPLICAS = [ alias for alias in DATABASES if alias != 'default' ]
+DATABASE_ROUTERS = [ 'task_manager.db_router.ReplicaRouter' ]
+REPLICA_PIN_SECONDS = config( 'REPLICA_PIN_SECONDS', default=10, cast=int )
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory per process by default, set REDIS_URL to share the cache between workers.
+
+REDIS_URL = config( 'REDIS_URL', default='' )
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
+
+# Users authenticated by JWT are cached here, see accounts.authentication.CachedJWTAuthentication
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = config( 'AUTH_USER_CACHE_TIMEOUT', default=300, cast=int )
+# Access tokens carry the user's team roles up to this many teams, see accounts.tokens
+TOKEN_TEAM_CLAIMS_MAX = config( 'TOKEN_TEAM_CLAIMS_MAX', default=100, cast=int )
+
+# Token buckets per client IP and per username in front of the endpoints that hash passwords,
+# see task_manager.ratelimit. local keeps them per process, cache shares them through RATE_LIMIT_CACHE_ALIAS
+RATE_LIMIT_BACKEND = config( 'RATE_LIMIT_BACKEND', default='cache' if REDIS_URL else 'local' )
+RATE_LIMIT_CACHE_ALIAS = 'default'
+RATE_LIMITS = {
+    'token': { 'ip': '60/min', 'username': '10/min' },
+    'create_user': { 'ip': '20/min', 'username': '5/min' },
+    'password': { 'ip': '60/min', 'username': '10/min' },
 }
 
+# Membership change feed, see accounts.async_views.AsyncTeamChanges. The log is polled every
+# CHANGES_POLL_INTERVAL seconds while a request waits for changes
+CHANGES_POLL_INTERVAL = config( 'CHANGES_POLL_INTERVAL', default=1.0, cast=float )
+CHANGES_LONG_POLL_TIMEOUT = config( 'CHANGES_LONG_POLL_TIMEOUT', default=25, cast=int )
+# Server-Sent Events streams end after this long, EventSource reconnects from the last event
+CHANGES_STREAM_TIMEOUT = config( 'CHANGES_STREAM_TIMEOUT', default=300, cast=int )
+
+# TeamDetail.get representations, see accounts.team_cache
+TEAM_CACHE_ALIAS = 'default'
+TEAM_CACHE_TIMEOUT = config( 'TEAM_CACHE_TIMEOUT', default=600, cast=int )
+
+# Users who just wrote read from the primary, must be shared between workers with replicas
+REPLICA_PIN_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -136,6 +298,16 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hash passwords in a process pool of this size ( 0 hashes in the request thread ), see accounts.hashing
+PASSWORD_HASHING_WORKERS = config( 'PASSWORD_HASHING_WORKERS', default=0, cast=int )
+
+# Deleted teams and users are purged in the background by this many threads, see accounts.purge
+PURGE_WORKERS = config( 'PURGE_WORKERS', default=1, cast=int )
+# Rows deleted per statement and transaction
+PURGE_BATCH_SIZE = config( 'PURGE_BATCH_SIZE', default=500, cast=int )
+# Purge in the request, once its transaction commits, instead of in a worker ( tests )
+PURGE_INLINE = config( 'PURGE_INLINE', default=False, cast=bool )
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -0,0 +1,27 @@
+"""Test helpers"""
+
+from .instrumentation import request_measured
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin failing any request that runs more SQL queries than its view is allowed.
+    `query_budgets` maps a URL name, or a ( URL name, method ) pair, to the most queries a
+    request may run. Views without a budget are not checked.
+    Needs task_manager.instrumentation.InstrumentationMiddleware, which is in MIDDLEWARE.
+
+        class TeamDetailTest( QueryBudgetMixin, TestCase ):
+            query_budgets = { 'team_detail': 2, ( 'team_detail', 'POST' ): 4 }
+    """
+
+    query_budgets = {}
+
+    def setUp( self ):
+        super().setUp()
+        request_measured.connect( self._check_query_budget )
+        self.addCleanup( request_measured.disconnect, self._check_query_budget )
+
+    def _check_query_budget( self, sender, view_name, method, status, metrics, **kwargs ):
+        budget = self.query_budgets.get( ( view_name, method ), self.query_budgets.get( view_name ) )
+        if budget is not None and metrics.queries > budget:
+            self.fail( f'{method} {view_name} ran {metrics.queries} queries, over its budget of {budget}' )
@@ -0,0 +1,22 @@
+import tempfile
+from pathlib import Path
+from django.db import connection
+from django.test import SimpleTestCase
+from task_manager.db_backends.sqlite_wal.base import DatabaseWrapper
+
+
+class SQLiteWALBackendTest( SimpleTestCase ):
+    def test_pragmas_applied( self ):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper( {
+                **connection.settings_dict,
+                'NAME': str( Path( directory ) / 'wal.sqlite3' ),
+                'PRAGMAS': { 'busy_timeout': 1234 },
+            } )
+            try:
+                with wrapper.cursor() as cursor:
+                    self.assertEqual( 'wal', cursor.execute( 'PRAGMA journal_mode' ).fetchone()[0] )
+                    self.assertEqual( 1, cursor.execute( 'PRAGMA synchronous' ).fetchone()[0] )
+                    self.assertEqual( 1234, cursor.execute( 'PRAGMA busy_timeout' ).fetchone()[0] )
+            finally:
+                wrapper.close()
@@ -0,0 +1,129 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import Team
+from task_manager.db_router import ReplicaRouter, ReplicaRoutingMiddleware, RequestRouting, _routing, primary
+
+User = get_user_model()
+
+REPLICAS = [ 'replica1', 'replica2' ]
+
+
+@override_settings( DATABASE_REPLICAS=REPLICAS )
+class ReplicaRouterTest( SimpleTestCase ):
+    def route( self, method ):
+        token = _routing.set( RequestRouting( RequestFactory().generic( method, '/' ) ) )
+        self.addCleanup( _routing.reset, token )
+
+    def test_safe_methods_read_from_a_replica( self ):
+        self.route( 'GET' )
+        alias = ReplicaRouter().db_for_read( User )
+
+        self.assertIn( alias, REPLICAS )
+        # The same replica for the whole request
+        self.assertEqual( alias, ReplicaRouter().db_for_read( Team ) )
+        self.assertEqual( 'default', ReplicaRouter().db_for_write( User ) )
+
+    def test_primary_reads( self ):
+        self.assertEqual( 'default', ReplicaRouter().db_for_read( User ) )
+
+        self.route( 'POST' )
+        self.assertEqual( 'default', ReplicaRouter().db_for_read( User ) )
+
+        self.route( 'GET' )
+        with primary():
+            self.assertEqual( 'default', ReplicaRouter().db_for_read( User ) )
+
+    async def test_async_middleware( self ):
+        async def get_response( request ):
+            return HttpResponse( ReplicaRouter().db_for_read( User ) )
+
+        middleware = ReplicaRoutingMiddleware( get_response )
+        self.assertTrue( iscoroutinefunction( middleware ) )
+        response = await middleware( RequestFactory().get( '/' ) )
+        self.assertIn( response.content.decode(), REPLICAS )
+
+    def test_only_the_primary_is_migrated( self ):
+        self.assertTrue( ReplicaRouter().allow_migrate( 'default', 'accounts' ) )
+        self.assertFalse( ReplicaRouter().allow_migrate( 'replica1', 'accounts' ) )
+
+
+@override_settings( DATABASE_REPLICAS=REPLICAS, REPLICA_PIN_SECONDS=60 )
+class ReadYourWritesTest( TransactionTestCase ):
+    """Two SQLite files stand in for the replicas, they hold a copy of the primary taken in setUp"""
+
+    @classmethod
+    def setUpClass( cls ):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        for alias in REPLICAS:
+            connections.settings[alias] = { **connections['default'].settings_dict, 'NAME': str( Path( cls.directory.name ) / f'{alias}.sqlite3' ) }
+
+    @classmethod
+    def tearDownClass( cls ):
+        for alias in REPLICAS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp( self ):
+        cache.clear()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.nami = User.objects.create_user( username='nami', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.replicate()
+
+        self.client = APIClient()
+        self.client.force_authenticate( user=self.luffy )
+
+    def replicate( self ):
+        connections['default'].ensure_connection()
+        for alias in REPLICAS:
+            connections[alias].close()
+            replica = sqlite3.connect( connections.settings[alias]['NAME'] )
+            connections['default'].connection.backup( replica )
+            replica.close()
+
+    def members( self ):
+        response = self.client.get( reverse( 'team_members', args=[self.team.pk, 'straw-hat-pirates'] ) )
+        return sorted( member['username'] for member in response.json()['results'] )
+
+    def test_reads_pinned_to_the_primary_after_a_write( self ):
+        # Not replicated yet
+        self.team.members.add( self.zoro )
+        self.assertEqual( [ 'luffy' ], self.members() )
+
+        self.client.post( reverse( 'team_detail', args=[self.team.pk, 'straw-hat-pirates'] ), data={ 'username': 'nami' }, format='json' )
+        self.assertEqual( [ 'luffy', 'nami', 'zoro' ], self.members() )
+
+        # Once the pin expires, reads go back to the replicas
+        cache.clear()
+        self.assertEqual( [ 'luffy' ], self.members() )
+
+    def test_other_users_keep_reading_from_replicas( self ):
+        self.team.members.add( self.zoro )
+        self.replicate()
+        self.client.post( reverse( 'team_detail', args=[self.team.pk, 'straw-hat-pirates'] ), data={ 'username': 'nami' }, format='json' )
+
+        self.client.force_authenticate( user=self.zoro )
+        self.assertEqual( [ 'luffy', 'zoro' ], self.members() )
+
+    async def test_async_requests_pinned( self ):
+        await self.team.members.aadd( self.zoro )
+        headers = { 'Authorization': f'Bearer {AccessToken.for_user( self.luffy )}' }
+        await self.async_client.post( reverse( 'async_team_detail', args=[self.team.pk, 'straw-hat-pirates'] ), data={ 'username': 'nami' }, headers=headers )
+
+        response = await self.async_client.get( reverse( 'team_members', args=[self.team.pk, 'straw-hat-pirates'] ), headers=headers )
+        self.assertEqual( [ 'luffy', 'nami', 'zoro' ], sorted( member['username'] for member in response.json()['results'] ) )
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import Team
+from task_manager.instrumentation import InstrumentationMiddleware, metrics_view, registry
+from task_manager.testing import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class InstrumentationTest( TestCase ):
+    def setUp( self ):
+        registry.reset()
+        self.client = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.client.force_authenticate( user=self.luffy )
+        self.url = reverse( 'team_members', args=[self.team.pk, 'straw-hat-pirates'] )
+
+    @override_settings( SERVER_TIMING=True )
+    def test_server_timing_header( self ):
+        response = self.client.get( self.url )
+
+        timing = response['Server-Timing']
+        self.assertIn( 'db;dur=', timing )
+        self.assertIn( 'desc="2 queries"', timing )
+        self.assertIn( 'permissions;dur=', timing )
+        self.assertIn( 'serialization;dur=', timing )
+        self.assertIn( 'total;dur=', timing )
+
+    @override_settings( SERVER_TIMING=True )
+    async def test_async_request( self ):
+        response = await self.async_client.get( reverse( 'async_workspace' ), headers={ 'Authorization': f'Bearer {AccessToken.for_user( self.luffy )}' } )
+
+        # The user, the teams and their members, queried through sync_to_async
+        self.assertIn( 'desc="3 queries"', response['Server-Timing'] )
+        self.assertIn( 'serialization;dur=', response['Server-Timing'] )
+
+    @override_settings( SERVER_TIMING=True )
+    def test_queries_in_other_threads( self ):
+        def query():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute( 'SELECT 1' )
+            finally:
+                connections.close_all()
+
+        def get_response( request ):
+            # As sync_to_async does, another thread in the request's context
+            with ThreadPoolExecutor( 1 ) as executor:
+                executor.submit( copy_context().run, query ).result()
+            return HttpResponse()
+
+        response = InstrumentationMiddleware( get_response )( RequestFactory().get( '/' ) )
+        self.assertIn( 'desc="1 queries"', response['Server-Timing'] )
+
+    @override_settings( SERVER_TIMING=False )
+    def test_server_timing_off( self ):
+        self.assertNotIn( 'Server-Timing', self.client.get( self.url ) )
+
+    def test_metrics_in_prometheus_format( self ):
+        self.client.get( self.url )
+        self.client.get( self.url )
+
+        response = metrics_view( RequestFactory().get( '/metrics' ) )
+        body = response.content.decode()
+
+        self.assertTrue( response['Content-Type'].startswith( 'text/plain; version=0.0.4' ) )
+        self.assertIn( '# TYPE http_requests_total counter', body )
+        self.assertIn( 'http_requests_total{view="team_members",method="GET",status="200"} 2', body )
+        self.assertIn( 'db_queries_total{view="team_members",method="GET",status="200"} 4', body )
+        self.assertIn( 'http_request_duration_seconds_bucket{view="team_members",method="GET",status="200",le="+Inf"} 2', body )
+        self.assertIn( 'view_part_duration_seconds_total{view="team_members",method="GET",status="200",part="permissions"}', body )
+
+
+class QueryBudgetTest( QueryBudgetMixin, TestCase ):
+    query_budgets = { 'team_members': 2, ( 'team_members', 'DELETE' ): 1 }
+
+    def setUp( self ):
+        super().setUp()
+        self.client = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        self.client.force_authenticate( user=self.luffy )
+        self.url = reverse( 'team_members', args=[self.team.pk, 'straw-hat-pirates'] )
+
+    def test_within_budget( self ):
+        self.client.get( self.url )
+
+    def test_over_budget_fails( self ):
+        with self.assertRaisesMessage( AssertionError, 'DELETE team_members ran' ):
+            self.client.delete( self.url, { 'members': [ 'luffy' ] }, format='json' )
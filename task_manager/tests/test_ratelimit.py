@@ -0,0 +1,116 @@
+import unittest.mock as mock
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from task_manager.ratelimit import LocalBuckets, local_buckets, take_token
+
+User = get_user_model()
+
+LIMITS = {
+    'token': { 'ip': '5/min', 'username': '2/min' },
+    'create_user': { 'ip': '2/min' },
+    'password': { 'username': '1/hour' },
+}
+
+
+class TokenBucketTest( SimpleTestCase ):
+    def test_take_token( self ):
+        bucket, wait = take_token( None, 2, 60, now=100 )
+        self.assertEqual( ( ( 1, 100 ), 0 ), ( bucket, wait ) )
+        bucket, wait = take_token( bucket, 2, 60, now=100 )
+        self.assertEqual( 0, wait )
+
+        # Empty, a token comes back every 30 seconds
+        bucket, wait = take_token( bucket, 2, 60, now=110 )
+        self.assertAlmostEqual( 20, wait )
+        bucket, wait = take_token( bucket, 2, 60, now=130 )
+        self.assertEqual( 0, wait )
+
+    def test_full_buckets_dropped( self ):
+        buckets = LocalBuckets()
+        with mock.patch( 'task_manager.ratelimit.time.monotonic', return_value=0 ):
+            for number in range( 100 ):
+                buckets.take( 'token:ip', f'10.0.0.{number}', 5, 60 )
+        with mock.patch( 'task_manager.ratelimit.time.monotonic', return_value=61 ):
+            buckets.take( 'token:ip', '10.0.1.1', 5, 60 )
+
+        self.assertEqual( [ '10.0.1.1' ], list( buckets.limits['token:ip'] ) )
+
+
+@override_settings( RATE_LIMITS=LIMITS )
+class RateLimitedViewsTest( TestCase ):
+    def setUp( self ):
+        local_buckets.clear()
+        cache.clear()
+        self.client = APIClient()
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+
+    def obtain( self, username, address='10.0.0.1' ):
+        return self.client.post( reverse( 'token_obtain_pair' ), data={ 'username': username, 'password': '123' }, format='json', REMOTE_ADDR=address )
+
+    def test_token_limited_per_username_and_ip( self ):
+        self.assertEqual( 200, self.obtain( 'luffy' ).status_code )
+        self.assertEqual( 200, self.obtain( 'luffy', '10.0.0.2' ).status_code )
+
+        with mock.patch( 'rest_framework_simplejwt.serializers.authenticate' ) as authenticate:
+            response = self.obtain( 'luffy', '10.0.0.3' )
+        self.assertEqual( 429, response.status_code )
+        self.assertEqual( '30', response.headers['Retry-After'] )
+        # Turned away before the password is checked
+        authenticate.assert_not_called()
+
+        for username in ( 'zoro', 'nami', 'usopp', 'chopper' ):
+            self.assertEqual( 401, self.obtain( username ).status_code )
+        self.assertEqual( 429, self.obtain( 'sanji' ).status_code )
+
+    def test_create_user_limited_per_ip( self ):
+        url = reverse( 'create_user' )
+        for username in ( 'zoro', 'nami' ):
+            self.assertEqual( 201, self.client.post( url, data={ 'username': username, 'password': 'santoryu' }, format='json' ).status_code )
+
+        response = self.client.post( url, data={ 'username': 'usopp', 'password': 'santoryu' }, format='json' )
+        self.assertEqual( 429, response.status_code )
+        self.assertFalse( User.objects.filter( username='usopp' ).exists() )
+
+    def test_forwarded_for_ignored_without_proxies( self ):
+        url = reverse( 'create_user' )
+        for number in range( 3 ):
+            response = self.client.post( url, data={ 'username': f'pirate{number}', 'password': 'santoryu' }, format='json', HTTP_X_FORWARDED_FOR=f'10.0.1.{number}' )
+        self.assertEqual( 429, response.status_code )
+
+    def test_forwarded_for_read_behind_proxies( self ):
+        url = reverse( 'create_user' )
+
+        def create( username, forwarded_for ):
+            return self.client.post( url, data={ 'username': username, 'password': 'santoryu' }, format='json', HTTP_X_FORWARDED_FOR=forwarded_for ).status_code
+
+        with override_settings( REST_FRAMEWORK={ **settings.REST_FRAMEWORK, 'NUM_PROXIES': 1 } ):
+            # The client can prepend addresses, the proxy appends the one it saw
+            self.assertEqual( 201, create( 'zoro', '10.0.1.1, 10.0.2.1' ) )
+            self.assertEqual( 201, create( 'nami', '10.0.1.2, 10.0.2.1' ) )
+            self.assertEqual( 429, create( 'usopp', '10.0.1.3, 10.0.2.1' ) )
+            self.assertEqual( 201, create( 'usopp', '10.0.2.2' ) )
+
+    def test_password_limited_per_authenticated_user( self ):
+        url = reverse( 'user_detail', args=['luffy'] )
+        # Strangers can't empty luffy's bucket
+        for _ in range( 3 ):
+            self.assertEqual( 401, self.client.post( url, data={ 'password': 'gomu gomu' }, format='json' ).status_code )
+
+        self.client.force_authenticate( user=self.luffy )
+        self.assertEqual( 202, self.client.post( url, data={ 'password': 'gomu gomu' }, format='json' ).status_code )
+        response = self.client.post( url, data={ 'password': 'gear fifth' }, format='json' )
+        self.assertEqual( 429, response.status_code )
+        self.assertEqual( '3600', response.headers['Retry-After'] )
+        # Reading is not limited
+        self.assertEqual( 200, self.client.get( url ).status_code )
+
+    @override_settings( RATE_LIMIT_BACKEND='cache' )
+    def test_shared_cache_backend( self ):
+        self.assertEqual( 200, self.obtain( 'luffy' ).status_code )
+        self.assertEqual( 200, self.obtain( 'luffy' ).status_code )
+        self.assertEqual( 429, self.obtain( 'luffy' ).status_code )
+        self.assertEqual( {}, local_buckets.limits )
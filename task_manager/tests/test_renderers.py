@@ -0,0 +1,49 @@
+import datetime
+import decimal
+import io
+import uuid
+from unittest import mock, skipIf
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from task_manager import renderers
+from task_manager.renderers import FastJSONParser, FastJSONRenderer
+
+
+class FastJSONTest( SimpleTestCase ):
+    data = {
+        'id': uuid.UUID( '12345678-1234-5678-1234-567812345678' ),
+        'created': datetime.datetime( 2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc ),
+        'local': timezone.make_aware( datetime.datetime( 2024, 1, 2, 3, 4, 5 ), datetime.timezone( datetime.timedelta( hours=-3 ) ) ),
+        'due': datetime.date( 2024, 1, 2 ),
+        'price': decimal.Decimal( '1.50' ),
+        'message': gettext_lazy( 'This field is required.' ),
+        'name': 'Straw Hat Pirates ☠ \u2028 \u2029',
+        'members': [ { 'username': 'luffy', 'role': 'C' } ],
+        'errors': { 1: [ 'Not a valid string.' ] },
+        'next': None,
+    }
+
+    @skipIf( renderers.orjson is None, 'orjson is not installed' )
+    def test_same_output_as_stdlib( self ):
+        self.assertEqual( JSONRenderer().render( self.data ), FastJSONRenderer().render( self.data ) )
+
+    def test_falls_back_without_orjson( self ):
+        with mock.patch.object( renderers, 'orjson', None ):
+            self.assertEqual( JSONRenderer().render( self.data ), FastJSONRenderer().render( self.data ) )
+            self.assertEqual( { 'a': [ 1 ] }, FastJSONParser().parse( io.BytesIO( b'{"a": [1]}' ) ) )
+
+    def test_indented_output( self ):
+        rendered = FastJSONRenderer().render( { 'a': 1 }, 'application/json; indent=2' )
+        self.assertEqual( b'{\n  "a": 1\n}', rendered )
+
+    def test_parse( self ):
+        body = '{"username": "luffy", "members": ["zoro", {"username": "nami", "role": "FM"}], "name": "☠"}'.encode()
+        self.assertEqual( JSONParser().parse( io.BytesIO( body ) ), FastJSONParser().parse( io.BytesIO( body ) ) )
+
+    def test_parse_error( self ):
+        with self.assertRaises( ParseError ):
+            FastJSONParser().parse( io.BytesIO( b'{"username": ' ) )
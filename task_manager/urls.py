@@ -14,10 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
+from django.conf import settings
 from django.urls import path, include
+from .instrumentation import metrics_view
 
 urlpatterns = [
-    path( 'admin/', admin.site.urls ),
     path( 'auth/', include( 'accounts.urls' ) ),
+    path( 'tasks/', include( 'tasks.urls' ) ),
 ]
+
+# Left out of the API_ONLY profile
+if apps.is_installed( 'django.contrib.admin' ):
+    from django.contrib import admin
+    urlpatterns.insert( 0, path( 'admin/', admin.site.urls ) )
+
+if settings.METRICS_ENDPOINT:
+    urlpatterns.append( path( 'metrics', metrics_view, name='metrics' ) )
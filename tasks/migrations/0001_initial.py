@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-18 03:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0003_user_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('T', 'To do'), ('IP', 'In progress'), ('D', 'Done')], default='T', max_length=2)),
+                ('priority', models.PositiveSmallIntegerField(choices=[(1, 'Urgent'), (2, 'High'), (3, 'Normal'), (4, 'Low')], default=3)),
+                ('due_date', models.DateField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('is_open', models.GeneratedField(db_persist=True, expression=models.Case(models.When(status__in=('T', 'IP'), then=models.Value(True)), default=models.Value(False)), output_field=models.BooleanField())),
+                ('assignee', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tasks', to='accounts.teammembership')),
+                ('team', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='accounts.team')),
+            ],
+            options={
+                'db_table': 'tasks',
+                'indexes': [models.Index(fields=['team', 'is_open', 'priority', 'due_date', 'id'], name='task_team_queue_idx'), models.Index(fields=['team', 'status', 'priority', 'due_date', 'id'], name='task_team_status_idx'), models.Index(fields=['assignee', 'is_open', 'priority', 'due_date', 'id'], name='task_assignee_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+from django.db import models
+from accounts.models import Team, TeamMembership
+
+
+class TaskQuerySet( models.QuerySet ):
+
+    def with_role( self, user ):
+        """Annotate `role` with the user's role in the task's team, None where the user is not a member"""
+        return self.annotate(
+            user_membership=models.FilteredRelation( 'team__teammembership', condition=models.Q( team__teammembership__member=user ) ),
+            role=models.F( 'user_membership__role' ),
+        )
+
+    def for_user( self, user ):
+        """Only the tasks of the user's teams, annotated with the user's role"""
+        return self.with_role( user ).filter( role__isnull=False )
+
+    def open( self ):
+        # Value() keeps an `is_open = true` comparison, a bare boolean column is not matched to the indexes on SQLite
+        return self.filter( is_open=models.Value( True ) )
+
+
+class Task( models.Model ):
+    class Status( models.TextChoices ):
+        TODO = 'T', 'To do'
+        IN_PROGRESS = 'IP', 'In progress'
+        DONE = 'D', 'Done'
+
+    class Priority( models.IntegerChoices ):
+        URGENT = 1, 'Urgent'
+        HIGH = 2, 'High'
+        NORMAL = 3, 'Normal'
+        LOW = 4, 'Low'
+
+    OPEN_STATUSES = ( Status.TODO, Status.IN_PROGRESS )
+
+    # Tasks belong to a tenant ( team ) in the shared schema, like memberships.
+    # The single column indexes are left out, the indexes below cover them.
+    team = models.ForeignKey( Team, on_delete=models.CASCADE, related_name='tasks', db_index=False )
+    title = models.CharField( max_length=200 )
+    description = models.TextField( blank=True )
+    status = models.CharField( max_length=2, choices=Status.choices, default=Status.TODO )
+    priority = models.PositiveSmallIntegerField( choices=Priority.choices, default=Priority.NORMAL )
+    due_date = models.DateField()
+    # A membership rather than a user, so only members of the task's team can be assigned
+    # and leaving the team unassigns the member's tasks.
+    assignee = models.ForeignKey( TeamMembership, null=True, blank=True, on_delete=models.SET_NULL, related_name='tasks', db_index=False )
+    created = models.DateTimeField( auto_now_add=True )
+    # Computed by the database from status. An equality on it keeps the open queue a single
+    # index range already in ( priority, due_date ) order, where `status IN ( ... )` needs a sort
+    is_open = models.GeneratedField(
+        expression=models.Case(
+            models.When( status__in=OPEN_STATUSES, then=models.Value( True ) ),
+            default=models.Value( False ),
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'tasks'
+        indexes = [
+            # Work queue of a team: open tasks by priority then due date, read in index order
+            models.Index( fields=( 'team', 'is_open', 'priority', 'due_date', 'id' ), name='task_team_queue_idx' ),
+            # Tasks of a team in a given status, e.g. done tasks
+            models.Index( fields=( 'team', 'status', 'priority', 'due_date', 'id' ), name='task_team_status_idx' ),
+            # "My tasks": one range per membership of the user, merged by priority then due date
+            models.Index( fields=( 'assignee', 'is_open', 'priority', 'due_date', 'id' ), name='task_assignee_queue_idx' ),
+        ]
+
+    def __str__( self ):
+        return self.title
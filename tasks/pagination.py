@@ -0,0 +1,6 @@
+from accounts.pagination import KeysetPagination
+
+
+class TaskPagination( KeysetPagination ):
+    # Matches the task indexes, so a page is a range scan on the index
+    ordering = ( 'priority', 'due_date', 'id' )
@@ -0,0 +1,21 @@
+from rest_framework import permissions
+from accounts.models import TeamMembership
+from accounts.permissions import get_team_role
+
+
+class IsInTaskTeam( permissions.BasePermission ):
+    message = 'Must be in the team of the task to perform action'
+    def has_object_permission( self, request, view, task ):
+        return get_team_role( request, task.team_id ) is not None
+
+
+class IsCaptainOrFirstMateOfTaskTeam( permissions.BasePermission ):
+    message = 'Must be captain or first mate of the team to perform action'
+    def has_object_permission( self, request, view, task ):
+        return get_team_role( request, task.team_id ) in ( TeamMembership.Roles.CAPTAIN, TeamMembership.Roles.FIRST_MATE )
+
+
+class IsAssignee( permissions.BasePermission ):
+    message = 'Must be assigned to the task to perform action'
+    def has_object_permission( self, request, view, task ):
+        return task.assignee is not None and task.assignee.member_id == request.user.id
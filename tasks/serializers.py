@@ -0,0 +1,33 @@
+from rest_framework import serializers
+from accounts.models import TeamMembership
+from task_manager.instrumentation import InstrumentedSerializerMixin
+from .models import Task
+
+
+class TaskSerializer( InstrumentedSerializerMixin, serializers.ModelSerializer ):
+    # Assignees are given and shown by username, and must be members of the task's team
+    assignee = serializers.CharField( source='assignee.member.username', allow_null=True, required=False, default=None )
+
+    class Meta:
+        model = Task
+        fields = ( 'id', 'team', 'title', 'description', 'status', 'priority', 'due_date', 'assignee', 'created' )
+        read_only_fields = ( 'team', )
+
+    def validate_assignee( self, username ):
+        if username is None:
+            return None
+        team = self.instance.team if self.instance else self.context['team']
+        try:
+            return TeamMembership.objects.select_related( 'member' ).get( team=team, member__username=username )
+        except TeamMembership.DoesNotExist:
+            raise serializers.ValidationError( 'assignee must be a member of the team' )
+
+    def to_internal_value( self, data ):
+        validated = super().to_internal_value( data )
+        # The nested source gives { 'assignee': { 'member': { 'username': membership } } }, flatten it
+        if 'assignee' in validated:
+            validated['assignee'] = validated['assignee']['member']['username']
+        return validated
+
+    def create( self, validated_data ):
+        return Task.objects.create( team=self.context['team'], **validated_data )
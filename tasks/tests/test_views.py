@@ -0,0 +1,187 @@
+import datetime
+from rest_framework import status
+from django.urls import reverse
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from accounts.models import Team, TeamMembership
+from rest_framework.test import APIClient
+from task_manager.testing import QueryBudgetMixin
+from tasks.models import Task
+
+User = get_user_model()
+
+class TaskTestCase( QueryBudgetMixin, TestCase ):
+    # team with role ( or task with role ), then the page, the assignee or the write
+    query_budgets = {
+        'team_tasks': 3,
+        'my_tasks': 1,
+        'task_detail': 1,
+        ( 'task_detail', 'PATCH' ): 3,
+        ( 'task_detail', 'DELETE' ): 2,
+    }
+
+    def setUp( self ):
+        super().setUp()
+        self.client = APIClient()
+
+        self.luffy = User.objects.create_user( username='luffy', password='123' )
+        self.zoro = User.objects.create_user( username='zoro', password='123' )
+        self.usopp = User.objects.create_user( username='usopp', password='123' )
+        self.ace = User.objects.create_user( username='ace', password='123' )
+
+        self.team = Team.objects.create_team( team_name='Straw Hat Pirates', captain=self.luffy )
+        Team.objects.add_members( self.team, { self.zoro: TeamMembership.Roles.MEMBER, self.usopp: TeamMembership.Roles.MEMBER } )
+        self.other_team = Team.objects.create_team( team_name='Whitebeard Pirates', captain=self.ace )
+        Team.objects.add_members( self.other_team, { self.zoro: TeamMembership.Roles.MEMBER } )
+
+        self.today = datetime.date.today()
+
+    def create_task( self, team, title, assignee=None, **fields ):
+        membership = TeamMembership.objects.get( team=team, member=assignee ) if assignee else None
+        fields.setdefault( 'due_date', self.today )
+        return Task.objects.create( team=team, title=title, assignee=membership, **fields )
+
+
+class TeamTaskListTest( TaskTestCase ):
+
+    def test_not_a_member_forbidden( self ):
+        self.client.force_authenticate( user=self.ace )
+        url = reverse( 'team_tasks', args=[self.team.pk] )
+
+        self.assertEqual( status.HTTP_403_FORBIDDEN, self.client.get( url ).status_code )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, self.client.post( url, { 'title': 'Steal the map', 'due_date': self.today } ).status_code )
+
+    def test_create_task( self ):
+        self.client.force_authenticate( user=self.usopp )
+        url = reverse( 'team_tasks', args=[self.team.pk] )
+
+        response = self.client.post( url, { 'title': 'Repair the ship', 'due_date': self.today, 'assignee': 'zoro', 'priority': 1 } )
+
+        self.assertEqual( status.HTTP_201_CREATED, response.status_code )
+        self.assertEqual( 'zoro', response.data['assignee'] )
+        self.assertEqual( self.team.pk, response.data['team'] )
+        self.assertEqual( Task.Status.TODO, response.data['status'] )
+
+    def test_assignee_must_be_in_team( self ):
+        self.client.force_authenticate( user=self.luffy )
+        url = reverse( 'team_tasks', args=[self.team.pk] )
+
+        response = self.client.post( url, { 'title': 'Repair the ship', 'due_date': self.today, 'assignee': 'ace' } )
+
+        self.assertEqual( status.HTTP_400_BAD_REQUEST, response.status_code )
+        self.assertIn( 'assignee', response.data )
+        self.assertFalse( Task.objects.exists() )
+
+    def test_open_tasks_by_priority_then_due_date( self ):
+        later = self.today + datetime.timedelta( days=3 )
+        self.create_task( self.team, 'low', priority=Task.Priority.LOW )
+        self.create_task( self.team, 'urgent later', priority=Task.Priority.URGENT, due_date=later )
+        self.create_task( self.team, 'urgent', priority=Task.Priority.URGENT, status=Task.Status.IN_PROGRESS )
+        self.create_task( self.team, 'done', priority=Task.Priority.URGENT, status=Task.Status.DONE )
+        self.create_task( self.other_team, 'other team' )
+        self.client.force_authenticate( user=self.zoro )
+        url = reverse( 'team_tasks', args=[self.team.pk] )
+
+        response = self.client.get( url )
+
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( [ 'urgent', 'urgent later', 'low' ], [ task['title'] for task in response.data['results'] ] )
+
+        done = self.client.get( url, { 'status': Task.Status.DONE } )
+        self.assertEqual( [ 'done' ], [ task['title'] for task in done.data['results'] ] )
+
+    def test_pagination( self ):
+        for number in range( 5 ):
+            self.create_task( self.team, f'task {number}', assignee=self.zoro )
+        self.client.force_authenticate( user=self.luffy )
+
+        titles = []
+        url = reverse( 'team_tasks', args=[self.team.pk] ) + '?limit=2'
+        # role + page
+        with self.assertNumQueries( 2 ):
+            response = self.client.get( url )
+        while url:
+            response = self.client.get( url )
+            titles += [ task['title'] for task in response.data['results'] ]
+            url = response.data['next']
+
+        self.assertEqual( [ f'task {number}' for number in range( 5 ) ], titles )
+
+
+class MyTaskListTest( TaskTestCase ):
+
+    def test_tasks_assigned_across_teams( self ):
+        self.create_task( self.team, 'straw hat', assignee=self.zoro, priority=Task.Priority.HIGH )
+        self.create_task( self.other_team, 'whitebeard', assignee=self.zoro, priority=Task.Priority.URGENT )
+        self.create_task( self.team, 'done', assignee=self.zoro, status=Task.Status.DONE )
+        self.create_task( self.team, 'not mine', assignee=self.usopp )
+        self.client.force_authenticate( user=self.zoro )
+
+        response = self.client.get( reverse( 'my_tasks' ) )
+
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+        self.assertEqual( [ 'whitebeard', 'straw hat' ], [ task['title'] for task in response.data['results'] ] )
+
+    def test_leaving_team_unassigns( self ):
+        task = self.create_task( self.team, 'straw hat', assignee=self.zoro )
+        Team.objects.remove_members( self.team, [ self.zoro ] )
+
+        task.refresh_from_db()
+        self.assertIsNone( task.assignee )
+
+
+class TaskDetailTest( TaskTestCase ):
+
+    def test_fetch_and_authorize_in_one_query( self ):
+        task = self.create_task( self.team, 'Repair the ship' )
+        self.client.force_authenticate( user=self.zoro )
+
+        with self.assertNumQueries( 1 ):
+            response = self.client.get( reverse( 'task_detail', args=[task.pk] ) )
+        self.assertEqual( status.HTTP_200_OK, response.status_code )
+
+        self.assertEqual( status.HTTP_404_NOT_FOUND, self.client.get( reverse( 'task_detail', args=[task.pk + 1] ) ).status_code )
+
+    def test_missing_team_not_found( self ):
+        self.client.force_authenticate( user=self.zoro )
+        self.assertEqual( status.HTTP_404_NOT_FOUND, self.client.get( reverse( 'team_tasks', args=[self.team.pk + 100] ) ).status_code )
+
+    def test_not_a_member_forbidden( self ):
+        task = self.create_task( self.team, 'Repair the ship' )
+        self.client.force_authenticate( user=self.ace )
+        url = reverse( 'task_detail', args=[task.pk] )
+
+        self.assertEqual( status.HTTP_403_FORBIDDEN, self.client.get( url ).status_code )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, self.client.patch( url, { 'status': 'D' } ).status_code )
+        self.assertEqual( status.HTTP_403_FORBIDDEN, self.client.delete( url ).status_code )
+
+    def test_assignee_can_update( self ):
+        task = self.create_task( self.team, 'Repair the ship', assignee=self.usopp )
+        self.client.force_authenticate( user=self.usopp )
+
+        response = self.client.patch( reverse( 'task_detail', args=[task.pk] ), { 'status': Task.Status.DONE } )
+
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+        self.assertEqual( 'usopp', response.data['assignee'] )
+        task.refresh_from_db()
+        self.assertEqual( Task.Status.DONE, task.status )
+
+    def test_member_cannot_update_others_task( self ):
+        task = self.create_task( self.team, 'Repair the ship', assignee=self.usopp )
+        self.client.force_authenticate( user=self.zoro )
+
+        response = self.client.patch( reverse( 'task_detail', args=[task.pk] ), { 'status': Task.Status.DONE } )
+
+        self.assertEqual( status.HTTP_403_FORBIDDEN, response.status_code )
+
+    def test_captain_can_reassign_and_delete( self ):
+        task = self.create_task( self.team, 'Repair the ship', assignee=self.usopp )
+        self.client.force_authenticate( user=self.luffy )
+        url = reverse( 'task_detail', args=[task.pk] )
+
+        response = self.client.patch( url, { 'assignee': 'zoro' } )
+        self.assertEqual( status.HTTP_202_ACCEPTED, response.status_code )
+        self.assertEqual( 'zoro', response.data['assignee'] )
+
+        self.assertEqual( status.HTTP_202_ACCEPTED, self.client.delete( url ).status_code )
+        self.assertFalse( Task.objects.exists() )
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import TeamTaskList, MyTaskList, TaskDetail
+
+urlpatterns = [
+    path( 'team/<int:pk>', TeamTaskList.as_view(), name='team_tasks' ),
+    path( 'mine', MyTaskList.as_view(), name='my_tasks' ),
+    path( '<int:pk>', TaskDetail.as_view(), name='task_detail' ),
+]
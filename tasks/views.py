@@ -0,0 +1,121 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from django.shortcuts import get_object_or_404
+from accounts.authentication import CachedJWTAuthentication
+from accounts.permissions import IsInTeam, get_team_or_404, remember_team_role
+from task_manager.instrumentation import InstrumentedViewMixin
+from .models import Task
+from .pagination import TaskPagination
+from .permissions import IsInTaskTeam, IsCaptainOrFirstMateOfTaskTeam, IsAssignee
+from .serializers import TaskSerializer
+
+
+def get_requested_statuses( request ):
+    """Statuses listed in the `status` query parameter ( e.g. ?status=D ), or None for open tasks"""
+
+    statuses = request.query_params.get( 'status' )
+    if not statuses:
+        return None
+    return [ value for value in statuses.split( ',' ) if value in Task.Status.values ]
+
+
+def filter_by_status( tasks, request ):
+    statuses = get_requested_statuses( request )
+    if statuses is None:
+        return tasks.open()
+    return tasks.filter( status__in=statuses )
+
+
+class TeamTaskList( InstrumentedViewMixin, APIView ):
+    authentication_classes = ( CachedJWTAuthentication, )
+    permission_classes = ( IsAuthenticated, IsInTeam )
+
+    def get( self, request, pk ):
+        """
+        Work queue of the team: open tasks by priority then due date, paginated by cursor ( ?cursor=, ?limit= ).
+        Optional: ?status=D ( or a list, ?status=T,IP,D ) for tasks in other statuses
+        """
+
+        team = get_team_or_404( request, pk )
+        self.check_object_permissions( request, team )
+
+        tasks = filter_by_status( Task.objects.filter( team=team ), request ).select_related( 'assignee__member' )
+        paginator = TaskPagination()
+        page = paginator.paginate_queryset( tasks, request, self )
+        return paginator.get_paginated_response( TaskSerializer( page, many=True ).data )
+
+    def post( self, request, pk ):
+        """Create a task in the team. The assignee, if any, must be a member of the team"""
+
+        team = get_team_or_404( request, pk )
+        self.check_object_permissions( request, team )
+
+        deserialized = TaskSerializer( data=request.data, context={ 'team': team } )
+        if deserialized.is_valid():
+            deserialized.save()
+            return Response( deserialized.data, status=status.HTTP_201_CREATED )
+        return Response( deserialized.errors, status=status.HTTP_400_BAD_REQUEST )
+
+
+class MyTaskList( InstrumentedViewMixin, APIView ):
+    authentication_classes = ( CachedJWTAuthentication, )
+    permission_classes = ( IsAuthenticated, )
+
+    def get( self, request ):
+        """
+        Open tasks assigned to the user across all of their teams, by priority then due date.
+        Paginated by cursor ( ?cursor=, ?limit= ), optional ?status= as on the team list
+        """
+
+        tasks = Task.objects.filter( assignee__member=request.user, team__deleted_at__isnull=True )
+        tasks = filter_by_status( tasks, request ).select_related( 'assignee__member' )
+        paginator = TaskPagination()
+        page = paginator.paginate_queryset( tasks, request, self )
+        return paginator.get_paginated_response( TaskSerializer( page, many=True ).data )
+
+
+class TaskDetail( InstrumentedViewMixin, APIView ):
+    authentication_classes = ( CachedJWTAuthentication, )
+
+    def get_permissions( self ):
+        if self.request.method == 'PATCH':
+            self.permission_classes = ( IsAuthenticated, IsInTaskTeam, IsCaptainOrFirstMateOfTaskTeam|IsAssignee )
+        elif self.request.method == 'DELETE':
+            self.permission_classes = ( IsAuthenticated, IsInTaskTeam, IsCaptainOrFirstMateOfTaskTeam )
+        else:
+            self.permission_classes = ( IsAuthenticated, IsInTaskTeam )
+        return super( TaskDetail, self ).get_permissions()
+
+    def get_task( self, request, pk ):
+        """The task and the user's role in its team come from one query, 404 and 403 are decided from that row"""
+
+        tasks = Task.objects.with_role( request.user.id ).filter( team__deleted_at__isnull=True ).select_related( 'team', 'assignee__member' )
+        task = get_object_or_404( tasks, pk=pk )
+        remember_team_role( request, task.team_id, task.role )
+        self.check_object_permissions( request, task )
+        return task
+
+    def get( self, request, pk ):
+        """Get a task"""
+
+        return Response( TaskSerializer( self.get_task( request, pk ) ).data, status=status.HTTP_200_OK )
+
+    def patch( self, request, pk ):
+        """Edit a task ( captain, first mate or assignee )"""
+
+        task = self.get_task( request, pk )
+        deserialized = TaskSerializer( task, data=request.data, partial=True )
+        if deserialized.is_valid():
+            deserialized.save()
+            return Response( deserialized.data, status=status.HTTP_202_ACCEPTED )
+        return Response( deserialized.errors, status=status.HTTP_400_BAD_REQUEST )
+
+    def delete( self, request, pk ):
+        """Delete a task ( captain or first mate )"""
+
+        task = self.get_task( request, pk )
+        serialized = TaskSerializer( task ).data
+        task.delete()
+        return Response( serialized, status=status.HTTP_202_ACCEPTED )